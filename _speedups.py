@@ -0,0 +1,125 @@
+# 本模块为解析热点(APCI、数据单元标识符、地址、短浮点数及二进制时间)的实现,
+# 以可被mypyc或Cython(纯Python模式)直接编译的Python源码写成, 在源码目录下编译(见setup.py):
+#   python setup.py build_ext --inplace
+# 编译生成的扩展模块与本文件同名, 导入时优先于本文件被加载; 未编译时即为纯Python实现。
+# unpack模块导入时自动选择, 设置环境变量IEC104_PURE_PYTHON=1时强制使用本文件。
+# 注意: data参数可为bytes或memoryview, 故不标注类型, 以免编译后的参数类型检查拒绝memoryview
+from calendar import timegm
+from struct import unpack_from
+
+from data import U_ACTIONS
+from iec_types import COT, VSQ
+
+
+COMPILED = not __file__.endswith('.py')  # 是否为编译后的扩展模块
+
+
+################################ 数值解析 ################################
+def unpack_info_obj_addr(data) -> int:
+    """解析 地址信息"""
+    return int.from_bytes(data, 'little')
+
+
+# 7.2.6.8
+def unpack_float32(data) -> float:
+    """解析 短浮点数 (短浮点数定义于IEEE 754)"""
+    return unpack_from('<f', data)[0]
+
+
+# 7.2.6.18
+def unpack_CP56Time2a(data) -> dict:
+    """解析 七个八位位组二进制时间 该时间为增量时间信息，其增量的参考日期协商确定"""
+    return {
+        'seconds': (data[0] | data[1] << 8) / 1000,  # 单位：秒(s)
+        'minutes': data[2] & 0b111111,
+        'IV': True if data[2] & 0b10000000 else False,  # 有效无效
+        'hour': data[3] & 0b11111,
+        'st': True if data[3] & 0b10000000 else False,  # 夏季时间
+        'day': data[4] & 0b11111,
+        'weekday': data[4] >> 5,  # 1~7 星期一至星期日, 0 未用
+        'month': data[5] & 0b1111,
+        'year': data[6] & 0b1111111,
+    }
+
+
+# 7.2.6.19
+def unpack_CP24Time2a(data) -> dict:
+    """解析 三个八位位组二进制时间 该时间为增量时间信息，其增量的参考日期协商确定"""
+    return {
+        'seconds': (data[0] | data[1] << 8) / 1000,
+        'minutes': data[2] & 0b111111,
+        'IV': True if data[2] & 0b10000000 else False,
+    }
+
+
+MONTH_BASE: dict = {}  # (年, 月) -> 该月1日0时的毫秒时间戳
+
+
+def month_base(year: int, month: int) -> int:
+    """(年, 月)对应的毫秒时间戳, 计算后缓存, 月份无效时引发ValueError"""
+    if not 1 <= month <= 12:
+        raise ValueError('CP56Time2a月份无效: %s' % month)
+    base: int = timegm((2000 + year, month, 1, 0, 0, 0)) * 1000
+    MONTH_BASE[year, month] = base
+    return base
+
+
+def CP56Time2a_to_ms(data, offset: int = 0) -> int:
+    """七个八位位组二进制时间对应的毫秒时间戳(按UTC计, 年份为2000年起)
+
+    各月的起始时间戳按(年, 月)缓存, 转换时不构造datetime
+    """
+    year: int = data[offset + 6] & 0b1111111
+    month: int = data[offset + 5] & 0b1111
+    base = MONTH_BASE.get((year, month))
+    if base is None:
+        base = month_base(year, month)
+    return (base
+            + ((data[offset + 4] & 0b11111) - 1) * 86400000
+            + (data[offset + 3] & 0b11111) * 3600000
+            + (data[offset + 2] & 0b111111) * 60000
+            + (data[offset] | (data[offset + 1] << 8)))
+
+
+################################ 结构解析 ################################
+def unpack_asdu_header(data, profile) -> tuple:
+    """解析数据单元标识符, 返回(类型标识, VSQ, COT, 公共地址)"""
+    # 类型标识, 可变结构限定词, 传送原因, 源发者地址(传送原因为两个字节时才有), 公共地址
+    type_id, vsq, cot, source_addr, common_addr = profile.unpack_header(data)
+    return (
+        type_id,
+        # 可变结构限定词，描述了信息对象的个数，信息对象是否为一个序列（即同一个信息对像类型的数组）
+        VSQ(vsq & 0b1111111, (vsq & 0b10000000) >> 7),
+        # 传送原因：原因, P/N, T, (源发者地址，根据系统参数设置决定是否包含该字段)
+        COT(
+            cot & 0b111111,  # 前六位表传送原因
+            (cot & 0b1000000) >> 6,  # 第七位表肯定确认或否定确认(P/N)
+            (cot & 0b10000000) >> 7,  # 第八位表实验/未实验(T)
+            source_addr,
+        ),
+        common_addr,
+    )
+
+
+def unpack_apci(data) -> tuple:
+    """解析apci数据
+    APCI为应用协议控制信息, 表征着报文的作用, 不承载传输数据
+    第一个字节为0x68, 为IEC104报文的起始标志位, 标志着报文的开始
+    第二个字节表示了IEC104报文的长度, 即从第三个字节到结束共有多少字节
+    """
+    control: int = data[2]
+    if control & 0b1 == 0b0:
+        '''第三个字节的第一位为0则该报文为I格式
+        对于I格式的报文, 有APCI和ASDU两个部分, ASDU承载了待传输的数据'''
+        return 'I', 'TRANSMIT', (control | data[3] << 8) >> 1, (data[4] | data[5] << 8) >> 1
+    elif control & 0b11 == 0b01:
+        '''第三个字节的第一位和第二位为01则表示该报文为S格式
+        S格式的报文仅用于监视而不传输数据'''
+        return 'S', 'MONITOR', 0, (data[4] | data[5] << 8) >> 1
+    else:
+        '''第三个字节的第一位和第二位为11则表示该报文为U格式
+        U格式报文可看成一句指令, 此处第三个字节的第一位和第二位必为11, 逻辑判断省略'''
+        index: int = (control >> 2).bit_length() - 1  # 最高的功能位
+        if index < 0:
+            raise ValueError('U格式报文未置任何功能位')
+        return 'U', U_ACTIONS[index], 0, 0
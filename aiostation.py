@@ -0,0 +1,635 @@
+# 本模块基于asyncio实现站的通信过程, 多个站可共享同一个事件循环
+# 参考协议：`IEC 60870-5-104` 5.2 超时的定义
+import asyncio
+import logging
+import random
+from collections import deque
+from datetime import datetime
+
+from iec_types import *
+from filetransfer import FILE_TYPES, DirectoryRequest, FileTransfer, FileTransferError, FileTransfers
+from frametrace import FrameTrace, LazyFrame
+from metrics import ConnectionMetrics, Metrics
+from image import Deadband, ProcessImage, Subscription
+from soe import SOEBuffer
+from pack import pack_apci_into, pack_apdu_into, pack_CP56Time2a
+from station import K, W, SequenceWindow
+from unpack import APDUFramer
+
+
+# 超时时间(秒)
+T0 = 30  # 建立连接的超时
+T1 = 15  # 发送或测试APDU的超时
+T2 = 10  # 无数据报文时确认的超时, T2 < T1
+T3 = 20  # 长期空闲状态下发送测试帧的超时
+
+logger = logging.getLogger('iec104.aiostation')
+
+
+class AsyncStation(asyncio.Protocol):
+    """基于asyncio的站
+
+    报文由APDUFramer增量分帧, t1/t2/t3由事件循环的定时回调实现:
+    t1 已发送的I格式或U格式测试报文未被确认时超时, 主动关闭连接;
+    t2 收到I格式报文后未发送I格式报文时超时, 发送S格式报文确认;
+    t3 连接空闲时超时, 发送TESTFR测试帧。
+    接收w个I格式报文后立即确认; 未被确认的I格式报文达到k个时, 待发送的ASDU排队至收到确认。
+    """
+    def __init__(self, t1: float = T1, t2: float = T2, t3: float = T3, k: int = K, w: int = W, mode: str = 'raw', profile: LinkProfile = DEFAULT_PROFILE,
+                 metrics: ConnectionMetrics = None, trace: FrameTrace = None) -> None:
+        # 计数器
+        self.window = SequenceWindow(k, w)
+        self._pending = deque()  # 因发送窗口已满而排队的ASDU
+        # 超时
+        self.t1, self.t2, self.t3 = t1, t2, t3
+        self._t1_handle = self._t2_handle = self._t3_handle = None
+        self._last_recv = 0  # 最近一次接收数据的时间
+        # 连接
+        self.profile = profile  # 连接的系统参数
+        self.metrics = metrics  # 连接的运行指标, 为None时不统计
+        self.trace = trace  # 收发报文的二进制记录, 为None时不记录
+        self.framer = APDUFramer(mode=mode, profile=profile, metrics=metrics, trace=trace)
+        self._log_extra = {'station': None}  # 日志记录的附加字段, 连接建立后为对方地址
+        self.transport = None
+        self.loop = None
+        self.connected = None  # 连接建立后完成的future
+        self.closed = None  # 连接关闭后完成的future
+        self._buf = bytearray(255)
+        self._waiters = []  # (判定函数, future), 收到满足判定函数的APDU时完成future
+
+
+    ################################ asyncio.Protocol ################################
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+        self.loop = asyncio.get_running_loop()
+        self._log_extra = {'station': transport.get_extra_info('peername')}
+        logger.info('连接建立', extra=self._log_extra)
+        if self.connected is None:
+            self.connected = self.loop.create_future()
+        if self.closed is None:
+            self.closed = self.loop.create_future()
+        self.connected.set_result(True)
+        self._last_recv = self.loop.time()
+        self._t3_handle = self.loop.call_later(self.t3, self._on_t3)
+
+
+    def data_received(self, data: bytes) -> None:
+        self._last_recv = self.loop.time()
+        if self.metrics is not None:
+            self.metrics.bytes_in += len(data)
+        debug = logger.isEnabledFor(logging.DEBUG)
+        for apdu in self.framer.feed(data):
+            if debug:
+                logger.debug('接收: %s', apdu, extra=self._log_extra)
+            self.apdu_received(apdu)
+            if self.transport is None:
+                break
+
+
+    def connection_lost(self, exc) -> None:
+        for handle in (self._t1_handle, self._t2_handle, self._t3_handle):
+            if handle is not None:
+                handle.cancel()
+        self._t1_handle = self._t2_handle = self._t3_handle = None
+        self.transport = None
+        logger.info('连接关闭: %s', exc, extra=self._log_extra)
+        for _, future in self._waiters:
+            if not future.done():
+                future.set_exception(ConnectionError('连接已关闭'))
+        self._waiters.clear()
+        self._pending.clear()
+        if self.closed is not None and not self.closed.done():
+            self.closed.set_result(exc)
+
+
+    ################################ 接收 ################################
+    def apdu_received(self, apdu: APDU) -> None:
+        """处理接收到的APDU, 更新站状态信息"""
+        if apdu.format == 'I':
+            if not self.window.on_recv(apdu.send) or not self._update_ack(apdu.recv):
+                self._sequence_error()
+                return
+            if self.window.need_ack():
+                self.send_s()
+            elif self._t2_handle is None:
+                self._t2_handle = self.loop.call_later(self.t2, self._on_t2)
+            self.asdu_received(apdu.asdu)
+
+        elif apdu.format == 'S':
+            if not self._update_ack(apdu.recv):
+                self._sequence_error()
+                return
+
+        elif apdu.action == 'STARTDT ACTIVATE':
+            self.send_u('STARTDT ACK')
+        elif apdu.action == 'STOPDT ACTIVATE':
+            self.send_u('STOPDT ACK')
+        elif apdu.action == 'TESTFR ACTIVATE':
+            self.send_u('TESTFR ACK')
+        elif apdu.action in ('STARTDT ACK', 'STOPDT ACK', 'TESTFR ACK'):
+            # U格式报文已被确认, 仍有未被确认的I格式报文时重新计时
+            self._stop_t1()
+            if self.window.outstanding:
+                self._start_t1()
+
+        self._notify(apdu)
+
+
+    def asdu_received(self, asdu: ASDU) -> None:
+        """收到I格式报文的ASDU, 由子类实现具体的应用功能"""
+        pass
+
+
+    def _sequence_error(self) -> None:
+        """顺序错误, 主动关闭"""
+        if self.metrics is not None:
+            self.metrics.seq_errors += 1
+        logger.warning('顺序错误, 主动关闭: vr=%d vs=%d ack=%d', self.window.vr, self.window.vs, self.window.ack,
+                       extra=self._log_extra)
+        self.close()
+
+
+    def _update_ack(self, recv: int) -> bool:
+        """对方确认了recv之前的全部I格式报文, 发送排队中的ASDU; 确认序号不在发送窗口内时返回False"""
+        if not self.window.on_ack(recv):
+            return False
+        self._stop_t1()
+        if self.window.outstanding:
+            self._start_t1()  # 仍有未被确认的I格式报文, 重新计时
+        while self._pending and self.window.can_send() and self.transport is not None:
+            self._send_asdu(self._pending.popleft())
+        return True
+
+
+    def _notify(self, apdu: APDU) -> None:
+        if not self._waiters:
+            return
+        waiters = []
+        for predicate, future in self._waiters:
+            if future.done():
+                continue
+            if predicate(apdu):
+                future.set_result(apdu)
+            else:
+                waiters.append((predicate, future))
+        self._waiters = waiters
+
+
+    def expect(self, predicate) -> asyncio.Future:
+        """返回一个future, 接收到满足predicate的APDU时完成"""
+        future = self.loop.create_future()
+        self._waiters.append((predicate, future))
+        return future
+
+
+    async def wait_for(self, predicate, timeout: float = None) -> APDU:
+        """等待接收到满足predicate的APDU"""
+        return await asyncio.wait_for(self.expect(predicate), timeout if timeout is not None else self.t1)
+
+
+    ################################ 发送 ################################
+    def send_u(self, action: str) -> None:
+        self._write(pack_apci_into(self._buf, 0, 'U', action))
+        if action in ('STARTDT ACTIVATE', 'STOPDT ACTIVATE', 'TESTFR ACTIVATE'):
+            self._start_t1()
+
+
+    def send_s(self) -> None:
+        self._write(pack_apci_into(self._buf, 0, 'S', recv=self.window.vr))
+        self.window.acked()
+        self._stop_t2()
+
+
+    def send_asdu(self, asdu: ASDU) -> None:
+        """以I格式报文发送ASDU, 同时确认已接收的I格式报文; 发送窗口已满时排队, 连接已关闭时引发ConnectionError"""
+        if self.transport is None:
+            raise ConnectionError('连接已关闭')
+        if self._pending or not self.window.can_send():
+            self._pending.append(asdu)
+        else:
+            self._send_asdu(asdu)
+
+
+    def _send_asdu(self, asdu: ASDU) -> None:
+        self._write(pack_apdu_into(self._buf, 0, APDU('I', 'TRANSMIT', self.window.vs, self.window.vr, asdu), self.profile))
+        self.window.on_send()
+        self._stop_t2()
+        self._start_t1()
+
+
+    def _write(self, end: int) -> None:
+        """发送发送缓冲区中已写入的end个字节"""
+        if self.transport is None:
+            raise ConnectionError('连接已关闭')
+        data = bytes(self._buf[:end])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('发送: %s', LazyFrame(data, self.profile), extra=self._log_extra)
+        self.transport.write(data)
+        if self.metrics is not None:
+            self.metrics.sent(end)
+        if self.trace is not None:
+            self.trace.sent(data)
+
+
+    def close(self) -> None:
+        """关闭连接; 立即视为已断开, 同一次接收中其后的报文不再处理, 也不再发送"""
+        transport, self.transport = self.transport, None
+        if transport is not None:
+            transport.close()
+
+
+    ################################ 超时 ################################
+    def _start_t1(self) -> None:
+        if self._t1_handle is None:
+            self._t1_handle = self.loop.call_later(self.t1, self._on_t1)
+
+
+    def _stop_t1(self) -> None:
+        if self._t1_handle is not None:
+            self._t1_handle.cancel()
+            self._t1_handle = None
+
+
+    def _stop_t2(self) -> None:
+        if self._t2_handle is not None:
+            self._t2_handle.cancel()
+            self._t2_handle = None
+
+
+    def _on_t1(self) -> None:
+        self._t1_handle = None
+        logger.warning('t1超时, 主动关闭', extra=self._log_extra)
+        self.close()
+
+
+    def _on_t2(self) -> None:
+        self._t2_handle = None
+        if self.window.unacked_recv and self.transport is not None:
+            self.send_s()
+
+
+    def _on_t3(self) -> None:
+        if self.transport is None:
+            return
+        # 每次接收数据都重设定时器代价较高, 改为到期时检查最近一次接收的时间
+        idle = self.loop.time() - self._last_recv
+        if idle < self.t3:
+            self._t3_handle = self.loop.call_later(self.t3 - idle, self._on_t3)
+            return
+        self._t3_handle = self.loop.call_later(self.t3, self._on_t3)
+        self.send_u('TESTFR ACTIVATE')
+
+
+class AsyncControlStation(AsyncStation):
+    """控制站，又称主站, 接收的ASDU更新过程映像及事件顺序记录
+
+    过程映像、事件顺序记录及文件传输均基于原始数值, 解析模式只能为'raw', 否则构造时引发ValueError。
+    """
+    def __init__(self, *args, image: ProcessImage = None, soe: SOEBuffer = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        if self.framer.mode != 'raw':
+            raise ValueError("控制站的解析模式只能为'raw'")
+        self.image = ProcessImage() if image is None else image  # 过程映像, 站池中可由多个站共用
+        self.soe = soe  # 事件顺序记录, 站池中可由多个站共用
+        self.soe_key = None  # 本站在事件顺序记录中的标识, 默认为对端地址
+        self._collectors = []  # 正在进行的召唤, 收集响应的ASDU
+        self.files = FileTransfers()  # 正在进行的文件传输
+
+
+    def connection_made(self, transport) -> None:
+        super().connection_made(transport)
+        if self.soe_key is None:
+            self.soe_key = transport.get_extra_info('peername')
+
+
+    def connection_lost(self, exc) -> None:
+        self.files.abort_all('连接已关闭')
+        super().connection_lost(exc)
+
+
+    def asdu_received(self, asdu: ASDU) -> None:
+        if asdu.type_id in FILE_TYPES:
+            for response in self.files.asdu_received(asdu):
+                self.send_asdu(response)
+            return
+        self.image.update(asdu)
+        if self.soe is not None:
+            self.soe.push(self.soe_key, asdu)
+        for collector in self._collectors:
+            collector(asdu)
+
+
+    def subscribe(self, callback, type_ids=None, common_addrs=None, deadband: Deadband = Deadband(), type_deadbands: dict = None) -> Subscription:
+        """订阅信息点的显著变化, 见ProcessImage.subscribe"""
+        return self.image.subscribe(callback, type_ids, common_addrs, deadband, type_deadbands)
+
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.image.unsubscribe(subscription)
+
+
+    async def startdt(self) -> None:
+        """启动数据传输"""
+        self.send_u('STARTDT ACTIVATE')
+        await self.wait_for(lambda apdu: apdu.action == 'STARTDT ACK')
+
+
+    async def interrogate(self, common_addr: int, qoi: int = 20, timeout: float = None) -> list:
+        """总召唤(或分组召唤), 返回响应召唤的全部ASDU"""
+        responses = []
+        def collector(asdu):
+            if asdu.common_addr == common_addr and 20 <= asdu.trans_cause.cause <= 36:
+                responses.append(asdu)
+        self._collectors.append(collector)
+        try:
+            await self._activate(ASDU(C__IC__NA__1, VSQ(1, 0), COT(6, 0, 0, 0), common_addr, [InfoObj(0, (qoi, ))], 'raw'), timeout, terminate=True)
+        finally:
+            self._collectors.remove(collector)
+        return responses
+
+
+    async def clock_sync(self, common_addr: int, time: datetime = None, timeout: float = None) -> ASDU:
+        """时钟同步, 返回激活确认的ASDU"""
+        cp56time = pack_CP56Time2a(time or datetime.now())
+        return await self._activate(ASDU(C_CS_NA_1, VSQ(1, 0), COT(6, 0, 0, 0), common_addr, [InfoObj(0, (cp56time, ))], 'raw'), timeout)
+
+
+    async def command(self, common_addr: int, type_id: int, addr: int, fields: tuple, timeout: float = None) -> ASDU:
+        """命令传输(单命令、双命令、设定命令等), fields为信息元素集的原始数值, 返回激活确认的ASDU"""
+        return await self._activate(ASDU(type_id, VSQ(1, 0), COT(6, 0, 0, 0), common_addr, [InfoObj(addr, fields)], 'raw'), timeout)
+
+
+    ################################ 文件传输 ################################
+    async def read_directory(self, common_addr: int, addr: int = 0, timeout: float = None) -> list:
+        """召唤目录, 返回DirectoryEntry列表"""
+        finished = self.loop.create_future()
+        request = DirectoryRequest(common_addr, addr, callback=finished.set_result)
+        self._start(request)
+        try:
+            await asyncio.wait_for(finished, timeout if timeout is not None else self.t1)
+        finally:
+            self.files.directories.pop(common_addr, None)
+        return request.entries
+
+
+    async def read_file(self, common_addr: int, addr: int, nof: int, sink, timeout: float = None) -> FileTransfer:
+        """召唤文件, 段直接写入sink(文件路径、具有write方法的对象或可调用对象), 返回完成的传输
+
+        timeout为传输无进展的超时, 缺省为t1; 失败时引发FileTransferError
+        """
+        finished = self.loop.create_future()
+        transfer = FileTransfer(common_addr, addr, nof, sink, callback=lambda transfer: finished.done() or finished.set_result(None))
+        self._start(transfer)
+        await self._watch(transfer, finished, timeout)
+        return transfer
+
+
+    async def iter_file(self, common_addr: int, addr: int, nof: int, timeout: float = None, limit: int = 256):
+        """召唤文件, 以异步迭代器逐段生成文件内容
+
+        未取出的段达到limit个时暂缓召唤下一节, 取出过半后恢复; 失败时引发FileTransferError
+        """
+        segments = deque()
+        arrived = self.loop.create_future()
+        def write(segment):
+            segments.append(segment)
+            if not arrived.done():
+                arrived.set_result(None)
+            if len(segments) >= limit:
+                transfer.pause()
+        def finish(transfer):
+            if not arrived.done():
+                arrived.set_result(None)
+        transfer = FileTransfer(common_addr, addr, nof, write, callback=finish)
+        self._start(transfer)
+        try:
+            while True:
+                while segments:
+                    yield segments.popleft()
+                    if transfer.paused and len(segments) <= limit // 2:
+                        for asdu in transfer.resume():
+                            self.send_asdu(asdu)
+                if transfer.finished:
+                    break
+                await self._watch(transfer, arrived, timeout)
+                arrived = self.loop.create_future()
+        finally:
+            if not transfer.finished:
+                self._abort(transfer, '传输被取消')
+        if transfer.error is not None:
+            raise FileTransferError(transfer.error)
+
+
+    def _start(self, transfer) -> None:
+        """登记并开始文件传输或目录召唤, 连接已关闭时引发ConnectionError"""
+        if self.transport is None:
+            raise ConnectionError('连接已关闭')
+        for asdu in self.files.start(transfer):
+            self.send_asdu(asdu)
+
+
+    async def _watch(self, transfer: FileTransfer, future: asyncio.Future, timeout: float = None) -> None:
+        """等待future完成, 传输在timeout内无进展时中止; 传输失败时引发FileTransferError"""
+        timeout = timeout if timeout is not None else self.t1
+        while not future.done():
+            progress = transfer.progress
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                if transfer.progress == progress and not transfer.paused:
+                    self._abort(transfer, '传输超时')
+                    raise
+        if transfer.error is not None:
+            raise FileTransferError(transfer.error)
+
+
+    def _abort(self, transfer: FileTransfer, reason: str) -> None:
+        responses = self.files.abort(transfer, reason)
+        if self.transport is not None:
+            for asdu in responses:
+                self.send_asdu(asdu)
+
+
+    async def _activate(self, asdu: ASDU, timeout: float = None, terminate: bool = False) -> ASDU:
+        """发送激活命令, 等待激活确认(及激活终止)"""
+        def matches(cause):
+            return lambda apdu: (
+                apdu.format == 'I' and apdu.asdu.type_id == asdu.type_id
+                and apdu.asdu.common_addr == asdu.common_addr and apdu.asdu.trans_cause.cause == cause)
+        timeout = timeout if timeout is not None else self.t1
+        confirm = self.expect(matches(7))
+        finish = self.expect(matches(10)) if terminate else None
+        try:
+            self.send_asdu(asdu)
+            result = (await asyncio.wait_for(confirm, timeout)).asdu
+            if result.trans_cause.pn:
+                raise RuntimeError('否定确认: %s' % TYPE_DESC.get(asdu.type_id, asdu.type_id))
+            if finish is not None:
+                await asyncio.wait_for(finish, timeout)
+        finally:
+            for future in (confirm, finish):
+                if future is not None and not future.done():
+                    future.cancel()
+        return result
+
+
+async def connect(host: str, port: int = 2404, station_class: type = AsyncControlStation, **kwargs) -> AsyncStation:
+    """建立连接, 返回已连接的站"""
+    loop = asyncio.get_running_loop()
+    _, station = await asyncio.wait_for(loop.create_connection(lambda: station_class(**kwargs), host, port), T0)
+    return station
+
+
+################################ 多连接主站池 ################################
+class RTU:
+    """站池中一个被控站连接的监管记录
+
+    接收到的ASDU放入队列, 队列达到queue_size时暂停读取该连接(背压),
+    消费至一半以下时恢复读取。暂停时已读入的数据仍会入队,
+    因此队列长度至多超出一次读取所含的帧数。重连后队列仍在queue_size以上时新连接同样暂停读取。
+    """
+    def __init__(self, name: str, host: str, port: int = 2404, common_addr: int = 1, queue_size: int = 1024, profile: LinkProfile = None) -> None:
+        self.name = name
+        self.host = host
+        self.port = port
+        self.common_addr = common_addr
+        self.profile = profile  # 该被控站的系统参数, 为None时使用站池的默认参数
+        self.queue_size = queue_size
+        self.queue = asyncio.Queue()
+        self.station = None  # 当前连接, 断开时为None
+        self.paused = False  # 是否因队列已满而暂停读取
+        # 统计
+        self.connects = 0
+        self.frames = 0
+        self.points = 0
+        self._last_points = 0
+        self._last_time = None
+
+
+    def attach(self, station: 'PooledStation') -> None:
+        """切换至新建立的连接, 断开时station为None"""
+        self.station = station
+        self.paused = False
+        if station is not None and station.transport is not None and self.queue.qsize() >= self.queue_size:
+            station.transport.pause_reading()
+            self.paused = True
+
+
+    def put(self, asdu: ASDU) -> None:
+        self.frames += 1
+        self.points += asdu.vsq.info_objs_total_number
+        self.queue.put_nowait(asdu)
+        if self.queue.qsize() >= self.queue_size and not self.paused and self.station is not None and self.station.transport is not None:
+            self.station.transport.pause_reading()
+            self.paused = True
+
+
+    async def get(self) -> ASDU:
+        """取出一个接收到的ASDU"""
+        asdu = await self.queue.get()
+        if self.paused and self.queue.qsize() <= self.queue_size // 2:
+            self.paused = False
+            if self.station is not None and self.station.transport is not None:
+                self.station.transport.resume_reading()
+        return asdu
+
+
+    def stats(self, now: float) -> dict:
+        """自上次统计以来的信息点速率等统计信息"""
+        elapsed = now - self._last_time if self._last_time is not None else 0
+        rate = (self.points - self._last_points) / elapsed if elapsed > 0 else 0.0
+        self._last_points, self._last_time = self.points, now
+        return {
+            'connected': self.station is not None, 
+            'connects': self.connects, 
+            'frames': self.frames, 
+            'points': self.points, 
+            'points_per_second': rate, 
+            'queued': self.queue.qsize(), 
+            'paused': self.paused, 
+        }
+
+
+class PooledStation(AsyncControlStation):
+    """站池中的主站连接, 接收的ASDU转交给所属RTU"""
+    def __init__(self, rtu: RTU, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.rtu = rtu
+        self.soe_key = rtu.name
+
+
+    def asdu_received(self, asdu: ASDU) -> None:
+        super().asdu_received(asdu)
+        self.rtu.put(asdu)
+
+
+class StationPool:
+    """多连接主站池
+
+    在同一事件循环中监管多个被控站连接: 断线后按指数退避重连,
+    每次连接建立后启动数据传输并进行总召唤。
+    """
+    def __init__(self, backoff_min: float = 1, backoff_max: float = 60, interrogate: bool = True, metrics: Metrics = None, **station_kwargs) -> None:
+        self.rtus = {}
+        self.metrics = metrics  # 运行指标, 各RTU的连接计数以RTU名称登记
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.interrogate = interrogate
+        self.station_kwargs = station_kwargs  # 传递给PooledStation的参数, 如t1/t2/t3及共用的image/soe
+        self._tasks = []
+        self._running = False
+
+
+    def add(self, name: str, host: str, port: int = 2404, common_addr: int = 1, queue_size: int = 1024, profile: LinkProfile = None) -> RTU:
+        rtu = self.rtus[name] = RTU(name, host, port, common_addr, queue_size, profile)
+        if self._running:
+            self._tasks.append(asyncio.ensure_future(self._supervise(rtu)))
+        return rtu
+
+
+    async def start(self) -> None:
+        self._running = True
+        self._tasks = [asyncio.ensure_future(self._supervise(rtu)) for rtu in self.rtus.values()]
+
+
+    async def stop(self) -> None:
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+    def stats(self) -> dict:
+        """各RTU的统计信息"""
+        now = asyncio.get_running_loop().time()
+        return {name: rtu.stats(now) for name, rtu in self.rtus.items()}
+
+
+    async def _supervise(self, rtu: RTU) -> None:
+        delay = self.backoff_min
+        station_kwargs = dict(self.station_kwargs)
+        if rtu.profile is not None:
+            station_kwargs['profile'] = rtu.profile
+        if self.metrics is not None:
+            station_kwargs['metrics'] = self.metrics.connection(rtu.name)
+        while self._running:
+            try:
+                station = await connect(rtu.host, rtu.port, station_class=lambda **kwargs: PooledStation(rtu, **kwargs), **station_kwargs)
+                rtu.attach(station)
+                rtu.connects += 1
+                await station.startdt()
+                delay = self.backoff_min
+                if self.interrogate:
+                    await station.interrogate(rtu.common_addr)
+                await station.closed
+            except (OSError, asyncio.TimeoutError, RuntimeError) as exc:  # ConnectionError为OSError的子类
+                logger.info('RTU %s 连接失败或中断: %r', rtu.name, exc)
+            finally:
+                if rtu.station is not None:
+                    rtu.station.close()
+                    rtu.attach(None)
+            if not self._running:
+                break
+            await asyncio.sleep(delay * random.uniform(0.5, 1))
+            delay = min(delay * 2, self.backoff_max)
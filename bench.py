@@ -0,0 +1,1119 @@
+# 本模块为性能基准测试, 直接运行即可: python bench.py, 只运行回归基准: python bench.py --suite
+import time
+from timeit import timeit
+
+from data import *
+from unpack import *
+
+
+def bench_framer():
+    """分帧器在多兆字节拼接数据上的扩展性, 耗时应随数据量线性增长"""
+    from unpack import APDUFramer
+    s_frame = b'h\x04\x01\x00\x02\x00'
+    u_frame = b'h\x04\x0b\x00\x00\x00'
+    unit = s_frame + u_frame
+    for mb in (1, 2, 4, 8):
+        data = unit * (mb * 1024 * 1024 // len(unit))
+        start = time.perf_counter()
+        count = sum(1 for _ in APDUFramer().feed(data))
+        elapsed = time.perf_counter() - start
+        print('framer %2d MB: %8d frames %7.3f s %10.0f frames/s' % (mb, count, elapsed, count / elapsed))
+
+
+def legacy_unpack_info_elems(type_id: int, data: bytes):
+    """原 if/elif 分支链实现, 仅作为基准测试的对照"""
+    ############## 在监视方向过程信息的应用服务数据单元 ##############
+    if type_id == M_SP_NA_1:
+        # 7.3.1.1 单点信息
+        return unpack_SIQ(data[0])
+
+    elif type_id == M__SP__TA__1:
+        # 7.3.1.2 带时标的单点信息
+        return unpack_SIQ(data[0]), unpack_CP24Time2a(data[1:4])
+
+    elif type_id == M__DP__NA__1:
+        # 7.3.1.3 不带时标的双点信息
+        return unpack_DIQ(data[0])
+
+    elif type_id == M__DP__TA__1:
+        # # 7.3.1.4 带时标的双点信息
+        return unpack_DIQ(data[0]), unpack_CP24Time2a(data[1:4])
+
+    elif type_id == M__ST__NA__1:
+        # 7.3.1.5 不带时标的步位置信息
+        return unpack_VTI(data[0]), unpack_QDS(data[1])
+
+    elif type_id == M__ST__TA__1:
+        # 7.3.1.6 带时标的步位置信息
+        return unpack_VTI(data[0]), unpack_QDS(data[1]), unpack_CP24Time2a(data[2:5])
+
+    elif type_id == M__BO__NA__1:
+        # 7.3.1.7 32比特串
+        return unpack_BSI(data[0:4]), unpack_QDS(data[4])
+    
+    elif type_id == M__BO__TA__1:
+        # 7.3.1.8 带时标的32比特串
+        return unpack_BSI(data[0:4]), unpack_QDS(data[4]), unpack_CP24Time2a(data[5:8])
+    
+    elif type_id == M__ME__NA__1:
+        # 7.3.1.9 测量值，规一化值
+        return unpack_NVA(data[0:2]), unpack_QDS(data[2])
+    
+    elif type_id == M__ME__TA__1:
+        # 7.3.1.10 测量值，带时标的规一化值
+        return unpack_NVA(data[0:2]), unpack_QDS(data[2]), unpack_CP24Time2a(data[3:6])
+    
+    elif type_id == M__ME__NB__1:
+        # 7.3.1.11 测量值，标度化值
+        return unpack_SVA(data[0:2]), unpack_QDS(data[2])
+    
+    elif type_id == M__ME__TB__1:
+        # 7.3.1.12 测量值，带时标的标度化值
+        return unpack_SVA(data[0:2]), unpack_QDS(data[2]), unpack_CP24Time2a(data[3:6])
+
+    elif type_id == M__ME__NC__1:
+        # 7.3.1.13 测量值，短浮点数
+        return unpack_float32(data[:4]), unpack_QDS(data[4])
+    
+    elif type_id == M__ME__TC__1:
+        # 7.3.1.14 测量值，带时标短浮点数
+        return unpack_float32(data[:4]), unpack_QDS(data[4]), unpack_CP24Time2a(data[5:8])
+    
+    elif type_id == M__IT__NA__1:
+        # 7.3.1.15 累计量
+        return unpack_BCR(data[:5])
+    
+    elif type_id == M__IT__TA__1:
+        # 7.3.1.16 带时标的累计量
+        return unpack_BCR(data[:5]), unpack_CP24Time2a(data[5:8])
+    
+    elif type_id == M__EP__TA__1:
+        # 7.3.1.17 带时标的继电保护设备事件
+        return unpack_SEP(data[0]), unpack_CP16Time2a(data[1:3]), unpack_CP24Time2a(data[3:6])
+    
+    elif type_id == M__EP__TB__1:
+        # 7.3.1.18 带时标的继电保护设备成组启动事件
+        return unpack_SPE(data[0]), unpack_QDP(data[1]), unpack_CP16Time2a(data[2:4]), unpack_CP24Time2a(data[4:7])
+    
+    elif type_id == M__EP__TC__1:
+        # 7.3.1.19 带时标的继电保护设备成组输出电路信息
+        return unpack_OCI(data[0]), unpack_QDP(data[1]), unpack_CP16Time2a(data[2:4]), unpack_CP24Time2a(data[4:7])
+    
+    elif type_id == M__PS__NA__1:
+        # 7.3.1.20 带变位检出的成组单点信息
+        return unpack_SCD(data[0:4]), unpack_QDS(data[4])
+    
+    elif type_id == M__ME__ND__1:
+        # 7.3.1.21 测量值，不带品质描述词的规一化值
+        return unpack_NVA(data[0:2])
+    
+    elif type_id == M__SP__TB__1:
+        # 7.3.1.22 带时标CP56Time2a的单点信息
+        return unpack_SIQ(data[0]), unpack_CP56Time2a(data[1:8])
+    
+    elif type_id == M__DP__TB__1:
+        # 7.3.1.23 带时标CP56Time2a的双点信息
+        return unpack_DIQ(data[0]), unpack_CP56Time2a(data[1:8])
+    
+    elif type_id == M__ST__TB__1:
+        # 7.3.1.24 带时标的步位置信息
+        return unpack_VTI(data[0]), unpack_QDS(data[1]), unpack_CP56Time2a(data[2:9])
+    
+    elif type_id == M__BO__TB__1:
+        # 7.3.1.25 带时标CP56Time2a的32比特串
+        return unpack_BSI(data[0:4]), unpack_QDS(data[4]), unpack_CP56Time2a(data[5:12])
+    
+    elif type_id == M__ME__TD__1:
+        # 7.3.1.26 测量值，带时标CP56Time2a的规一化值
+        return unpack_NVA(data[0:2]), unpack_QDS(data[2]), unpack_CP56Time2a(data[3:10])
+    
+    elif type_id == M__ME__TE__1:
+        # 7.3.1.27 测量值，带时标CP56Time2a的标度化值
+        return unpack_SVA(data[0:2]), unpack_QDS(data[2]), unpack_CP56Time2a(data[3:10])
+    
+    elif type_id == M__ME__TF__1:
+        # 7.3.1.28 测量值，带时标CP56Time2a的短浮点数
+        return unpack_float32(data[0:4]), unpack_QDS(data[4]), unpack_CP56Time2a(data[5:12])
+    
+    elif type_id == M__IT__TB__1:
+        # 7.3.1.29 带时标CP56Time2a的累计量
+        return unpack_BCR(data[0:5]), unpack_CP56Time2a(data[5:12])
+    
+    elif type_id == M__EP__TD__1:
+        # 7.3.1.30 带时标CP56Time2a的继电保护设备事件
+        return unpack_SEP(data[0]), unpack_CP16Time2a(data[1:3]), unpack_CP56Time2a(data[3:10])
+    
+    elif type_id == M__EP__TE__1:
+        # 7.3.1.31 带时标CP56Time2a的继电保护设备成组启动事件
+        return unpack_SPE(data[0]), unpack_QDP(data[1]), unpack_CP16Time2a(data[2:4]), unpack_CP56Time2a(data[4:11])
+    
+    elif type_id == M__EP__TF__1:
+        # 7.3.1.32 带时标CP56Time2a的继电保护设备成组输出电路信息
+        return unpack_OCI(data[0]), unpack_QDP(data[1]), unpack_CP16Time2a(data[2:4]), unpack_CP56Time2a(data[4:11])
+    
+    ############## 在控制方向过程信息的应用服务数据单元 ##############
+    elif type_id == C__SC__NA__1:
+        # 7.3.2.1 单命令
+        return unpack_SCO(data[0])
+
+    elif type_id == C__DC__NA__1:
+        # 7.3.2.2 双命令
+        return unpack_DCO(data[0])
+    
+    elif type_id == C__RC__NA__1:
+        # 7.3.2.3 步调节命令
+        return unpack_RCO(data[0])
+    
+    elif type_id == C__SE__NA__1:
+        # 7.3.2.4 设定命令，规一化值
+        return unpack_NVA(data[0:2]), unpack_QOS(data[2])
+    
+    elif type_id == C__SE__NB__1:
+        # 7.3.2.5 设定命令，标度化值
+        return unpack_SVA(data[0:2]), unpack_QOS(data[2])
+    
+    elif type_id == C__SE__NC__1:
+        # 7.3.2.6 设定命令，短浮点数
+        return unpack_float32(data[0:4]), unpack_QOS(data[4])
+    
+    elif type_id == C__BO__NA__1:
+        # 7.3.2.7 32比特串
+        return unpack_BSI(data[0:4])
+
+    ############## 在控制方向过程信息的应用服务数据单元 ##############
+    elif type_id == M__EI__NA__1:
+        # 7.3.3 初始化结束
+        return unpack_COI(data[0])
+
+    ############## 在控制方向系统信息的应用服务数据单元 ##############
+    elif type_id == C__IC__NA__1:
+        # 7.3.4.1 召唤命令
+        return unpack_QOI(data[0])
+    
+    elif type_id == C__CI__NA__1:
+        # 7.3.4.2 计数量召唤命令
+        return unpack_QCC(data[0])
+    
+    elif type_id == C_RD_NA_1:
+        # 7.3.4.3 读命令
+        return
+    
+    elif type_id == C_CS_NA_1:
+        # 7.3.4.4 时钟同步命令
+        return unpack_CP56Time2a(data[0:7])
+
+    elif type_id == C_TS_NA_1:
+        # 7.3.4.5 测试命令
+        return unpack_FBP(data[0:2])
+    
+    elif type_id == C_RP_NA_1:
+        # 7.3.4.6 复位进程命令
+        return unpack_QRP(data[0])
+    
+    elif type_id == C_CD_NA_1:
+        # 7.3.4.7 延时获得命令
+        return unpack_CP16Time2a(data[0:2])
+    
+    ############## 在控制方向参数的应用服务数据单元 ##############
+    elif type_id == P_ME_NA_1:
+        # 7.3.5.1 测量值参数，规一化值
+        return unpack_NVA(data[0:2]), unpack_QPM(data[2])
+
+    elif type_id == P_ME_NB_1:
+        # 7.3.5.2 测试值参数，标度化值
+        return unpack_SVA(data[0:2]), unpack_QPM(data[2])
+
+    elif type_id == P_ME_NC_1:
+        # 7.3.5.3 测量值参数，短浮点数
+        return unpack_float32(data[0:4]), unpack_QPM(data[4])
+    
+    elif type_id == P_AC_NA_1:
+        # 7.3.5.4 参数激活
+        return unpack_QPA(data[0])
+
+    elif type_id == F_FR_NA_1:
+        # 7.3.6.1 文件准备就绪
+        return unpack_NOF(data[0]), unpack_LOF(data[1]), unpack_FRQ(data[2])
+
+    elif type_id == F_SR_NA_1:
+        # 7.3.6.2 节准备就绪
+        return unpack_NOF(data[0]), unpack_NOS(data[1]), unpack_LOS(data[2]), unpack_SRQ(data[3])
+
+    elif type_id == F_SC_NA_1:
+        # 7.3.6.3 召唤目录，选择文件，召唤文件，召唤节
+        return unpack_NOF(data[0]), unpack_NOS(data[1]), unpack_SCQ(data[2])
+    
+    elif type_id == F_LS_NA_1:
+        # 7.3.6.4 最后的节，最后的段
+        return unpack_NOF(data[0]), unpack_NOS(data[1]), unpack_LSQ(data[2]), unpack_CHS(data[3])
+
+    elif type_id == F_AF_NA_1:
+        # 7.3.6.5 认可文件，认可节
+        return unpack_NOF(data[0]), unpack_NOS(data[1]), unpack_AFQ(data[2])
+
+    elif type_id == F_SG_NA_1:
+        # 7.3.6.6 段
+        return unpack_NOF(data[0]), unpack_NOS(data[1]), unpack_LOS(data[2]), bytes(data[3:])
+
+    elif type_id == F_DR_TA_1:
+        # 7.3.6.7 目录
+        return unpack_NOF(data[0]), unpack_LOF(data[1]), unpack_SOF(data[2]), unpack_CP56Time2a(data[3:10])
+
+
+def bench_info_elems(number: int = 20000):
+    """逐类型比较查表解析与原分支链解析的耗时"""
+    from unpack import INFO_ELEM_LAYOUTS, unpack_info_elems
+    data = bytes(range(1, 17))
+    print('%8s %12s %12s %8s' % ('type_id', 'chain(us)', 'table(us)', 'speedup'))
+    for type_id in sorted(INFO_ELEM_LAYOUTS):
+        try:
+            legacy_unpack_info_elems(type_id, data)
+        except Exception:
+            continue  # 原实现无法解析的类型不作比较
+        chain = timeit(lambda: legacy_unpack_info_elems(type_id, data), number=number) / number * 1e6
+        table = timeit(lambda: unpack_info_elems(type_id, data), number=number) / number * 1e6
+        print('%8d %12.3f %12.3f %7.2fx' % (type_id, chain, table, chain / table))
+
+
+def bench_columnar(number: int = 2000):
+    """单帧可容纳的最长短浮点数序列(48个), 比较逐对象解析与按列解析"""
+    from struct import pack
+    from unpack import unpack_asdu
+    body = b''.join([pack('<fB', i * 0.5, 0) for i in range(48)])
+    asdu = bytes([M__ME__NC__1, 0x80 | 48, 20, 0, 1, 0, 1, 0x40, 0]) + body
+    rows = timeit(lambda: unpack_asdu(asdu), number=number) / number * 1e6
+    columns = timeit(lambda: unpack_asdu(asdu, columnar=True), number=number) / number * 1e6
+    print('sq asdu x48: rows %.1f us, columnar %.1f us (numpy: %s)' % (rows, columns, numpy is not None))
+
+
+def _capture(frames: int = 400, common_addrs: int = 1) -> bytes:
+    """生成一段录波数据: 短浮点数序列与单点信息集合交替出现"""
+    from struct import pack
+    chunks = []
+    for n in range(frames):
+        if n % 2:
+            body = b''.join([pack('<fB', i * 0.5, 0x80 if i % 7 == 0 else 0) for i in range(48)])
+            asdu = bytes([M__ME__NC__1, 0x80 | 48, 20, 0, n % common_addrs + 1, 0]) + (0x4001).to_bytes(3, 'little') + body
+        else:
+            body = b''.join([(i + 1).to_bytes(3, 'little') + bytes([i & 1]) for i in range(60)])
+            asdu = bytes([M_SP_NA_1, 60, 3, 0, n % common_addrs + 1, 0]) + body
+        chunks.append(bytes([0x68, len(asdu) + 4]) + pack('<HH', n << 1, 0) + asdu)
+    return b''.join(chunks)
+
+
+################################ 原解析实现(对照) ################################
+# 以下为重构前的解析路径(字典 + 品质描述词字符串列表 + 带实例字典的APDU/ASDU), 只保留录波数据用到的类型,
+# 用于统计原实现解析结果的内存占用。与原实现的差异: 修正了集合中信息对象地址的切片
+# (原为data[i:INFO_ADDR_SIZE], 除第一个外地址均解析为0, 会低估原实现的占用), 分帧改为循环以免递归过深。
+class _LegacyASDU:
+    def __init__(self, type_id: int, vsq: dict, trans_cause: dict, common_addr: int, info_objs: list) -> None:
+        self.type_id = type_id
+        self.vsq = vsq
+        self.trans_cause = trans_cause
+        self.common_addr = common_addr
+        self.info_objs = info_objs
+
+
+class _LegacyAPDU:
+    def __init__(self, format: str, action: str, send: int = 0, recv: int = 0, asdu: _LegacyASDU = None) -> None:
+        self.format = format
+        self.action = action
+        self.send = send
+        self.recv = recv
+        self.asdu = asdu
+
+
+def _legacy_unpack_Q(data: int) -> list:
+    qual = []
+    if data & 0b10000:
+        qual.append('BL')
+    if data & 0b100000:
+        qual.append('SB')
+    if data & 0b1000000:
+        qual.append('NT')
+    if data & 0b10000000:
+        qual.append('IV')
+    return qual
+
+
+def _legacy_unpack_info_elems(type_id: int, data: bytes):
+    from struct import unpack
+    if type_id == M_SP_NA_1:
+        SIQ = _legacy_unpack_Q(data[0])
+        if data[0] & 0b1:
+            SIQ.append('SPI')
+        return SIQ
+    elif type_id == M__ME__NC__1:
+        QDS = _legacy_unpack_Q(data[4])
+        if data[4] & 0b1:
+            QDS.append('OV')
+        return unpack('<f', data[:4])[0], QDS
+    raise ValueError('对照实现不支持的类型标识: %s' % type_id)
+
+
+def _legacy_unpack_info_objs(type_id: int, total: int, is_sq: int, data: bytes) -> list:
+    from struct import unpack
+    def addr(data):
+        return unpack('<I', data + (4 - len(data)) * b'\x00')[0]
+    info_objs = []
+    if is_sq:
+        base = addr(data[:INFO_ADDR_SIZE])
+        size = (len(data) - INFO_ADDR_SIZE) // total
+        for counter, i in enumerate(range(INFO_ADDR_SIZE, len(data), size)):
+            info_objs.append({'addr': base + counter, 'elems': _legacy_unpack_info_elems(type_id, data[i:i + size])})
+    else:
+        size = len(data) // total
+        for i in range(0, len(data), size):
+            info_objs.append({
+                'addr': addr(data[i:i + INFO_ADDR_SIZE]), 
+                'elems': _legacy_unpack_info_elems(type_id, data[i + INFO_ADDR_SIZE:i + size]), 
+            })
+    return info_objs
+
+
+def _legacy_unpack_asdu(data: bytes) -> _LegacyASDU:
+    from struct import unpack
+    type_id = data[0]
+    vsq = {
+        'info_objs_total_number': data[1] & 0b1111111, 
+        'is_sq': (data[1] & 0b10000000) >> 7
+    }
+    trans_cause = {
+        'cause': TRANS_CAUSE_DESC.get(data[2] & 0b111111, ''), 
+        'P/N': (data[2] & 0b1000000) >> 6, 
+        'T': (data[2] & 0b10000000) >> 7, 
+    }
+    if TRANS_CAUSE_SIZE == 2:
+        trans_cause['source_addr'] = data[3]
+    common_addr = unpack('<H', data[2 + TRANS_CAUSE_SIZE:2 + TRANS_CAUSE_SIZE + COMMON_ADDR_SIZE])[0]
+    info_objs = _legacy_unpack_info_objs(type_id, vsq['info_objs_total_number'], vsq['is_sq'], data[2 + TRANS_CAUSE_SIZE + COMMON_ADDR_SIZE:])
+    return _LegacyASDU(type_id, vsq, trans_cause, common_addr, info_objs)
+
+
+def _legacy_from_bytes_to_apdus(data: bytes) -> list:
+    """原解析路径, 只解析I格式报文"""
+    from struct import unpack
+    apdus = []
+    offset = 0
+    while offset < len(data):
+        pack_size = data[offset + 1] + 2
+        frame = data[offset:offset + pack_size]
+        apdus.append(_LegacyAPDU('I', 'TRANSMIT', unpack('<H', frame[2:4])[0] >> 1, unpack('<H', frame[4:6])[0] >> 1,
+                                 _legacy_unpack_asdu(frame[APCI_SIZE:])))
+        offset += pack_size
+    return apdus
+
+
+def bench_memory():
+    """解析一段录波数据并保留全部结果, 统计原解析路径与当前解析路径每个信息点占用的字节数"""
+    import tracemalloc
+    from unpack import from_bytes_to_apdus
+    data = _capture()
+    results = {}
+    for name, decode in (('legacy', _legacy_from_bytes_to_apdus), ('compact', from_bytes_to_apdus)):
+        decode(data)  # 预热, 排除首次调用的缓存(如查表)分配
+        tracemalloc.start()
+        apdus = decode(data)
+        results[name] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        points = sum(len(apdu.asdu.info_objs) for apdu in apdus)
+        del apdus
+    print('memory: %d points, legacy %.1f bytes/point, compact %.1f bytes/point (%.1fx)' % (
+        points, results['legacy'] / points, results['compact'] / points, results['legacy'] / results['compact']))
+
+
+def bench_lazy():
+    """按公共地址过滤的网关: 丢弃90%的帧, 比较立即解析与延迟解析"""
+    from unpack import APDUFramer
+    data = _capture(2000, common_addrs=10)
+    for lazy in (False, True):
+        start = time.perf_counter()
+        points = 0
+        for apdu in APDUFramer(lazy=lazy).feed(data):
+            if apdu.asdu.common_addr == 1:
+                points += len(apdu.asdu.info_objs)
+        elapsed = time.perf_counter() - start
+        print('filter lazy=%-5s: %.3f s (%d points kept)' % (lazy, elapsed, points))
+
+
+def bench_raw_mode(number: int = 20000):
+    """逐类型比较可读解析('full')与原始数值解析('raw')的耗时"""
+    from unpack import INFO_ELEM_LAYOUTS, unpack_info_elems
+    data = bytes(range(1, 40))
+    print('%8s %12s %12s %8s' % ('type_id', 'full(us)', 'raw(us)', 'speedup'))
+    for type_id in sorted(INFO_ELEM_LAYOUTS):
+        try:
+            unpack_info_elems(type_id, data)
+        except Exception:
+            continue
+        full = timeit(lambda: unpack_info_elems(type_id, data), number=number) / number * 1e6
+        raw = timeit(lambda: unpack_info_elems(type_id, data, mode='raw'), number=number) / number * 1e6
+        print('%8d %12.3f %12.3f %7.2fx' % (type_id, full, raw, full / raw))
+
+
+def bench_pack(number: int = 20000):
+    """打包127个单点信息的突发序列ASDU至预先分配的缓冲区"""
+    from iec_types import APDU, ASDU, COT, InfoObj, VSQ
+    from pack import pack_apdu_into
+    info_objs = [InfoObj(0x100 + i, (i & 1, )) for i in range(127)]
+    apdu = APDU('I', 'TRANSMIT', 0, 0, ASDU(M_SP_NA_1, VSQ(127, 1), COT(3, 0, 0, 0), 1, info_objs, 'raw'))
+    buf = bytearray(255)
+    start = time.perf_counter()
+    for _ in range(number):
+        pack_apdu_into(buf, 0, apdu)
+    elapsed = time.perf_counter() - start
+    print('pack sq x127: %.0f frames/s, %.0f points/s' % (number / elapsed, number * 127 / elapsed))
+
+
+def _bench_database():
+    """基准测试用的信息点数据库: 任意公共地址下48个地址连续的短浮点数, 总召唤时以一帧序列上送"""
+    from simulator import PointDatabase
+    database = PointDatabase()
+    for i in range(48):
+        database.add(None, M__ME__NC__1, 0x4001 + i, (i * 0.5, 0))
+    return database
+
+
+def bench_asyncio_stations(stations: int = 500, rounds: int = 5):
+    """同一事件循环中的500个主站-被控站回环连接, 并发总召唤"""
+    import asyncio
+    from aiostation import connect
+    from simulator import Simulator
+
+    async def main():
+        simulator = Simulator(_bench_database())
+        await simulator.start()
+        masters = await asyncio.gather(*[connect('127.0.0.1', simulator.port) for _ in range(stations)])
+        await asyncio.gather(*[master.startdt() for master in masters])
+        start = time.perf_counter()
+        points = 0
+        for _ in range(rounds):
+            results = await asyncio.gather(*[master.interrogate(i + 1) for i, master in enumerate(masters)])
+            points += sum(len(asdu.info_objs) for responses in results for asdu in responses)
+        elapsed = time.perf_counter() - start
+        for master in masters:
+            master.close()
+        await simulator.stop()
+        print('asyncio %d stations: %d interrogations in %.3f s, %.0f points/s' % (
+            stations, stations * rounds, elapsed, points / elapsed))
+
+    asyncio.run(main())
+
+
+def bench_simulator(points: int = 10000, rate: int = 50000, seconds: float = 2):
+    """被控站模拟器以设定速率突发短浮点数, 主站实际收到的信息点速率"""
+    import asyncio
+    from aiostation import connect
+    from simulator import PointDatabase, Simulator
+
+    async def main():
+        database = PointDatabase()
+        database.add_range(1, M__ME__NC__1, 0x4001, points)
+        async with Simulator(database, {M__ME__NC__1: rate}) as simulator:
+            master = await connect('127.0.0.1', simulator.port)
+            await master.startdt()
+            start, before = time.perf_counter(), master.image.updates
+            await asyncio.sleep(seconds)
+            received = master.image.updates - before
+            elapsed = time.perf_counter() - start
+            dropped = sum(station.dropped for station in simulator.stations)
+            master.close()
+        print('simulator at %d points/s: master received %.0f points/s, %d ASDUs dropped' % (
+            rate, received / elapsed, dropped))
+
+    asyncio.run(main())
+
+
+def bench_infer(number: int = 20000):
+    """系统参数推断每帧的耗时, 分为判定前与判定后(漂移检测)"""
+    from infer import LinkAnalyzer, candidate_mask
+    data = _capture(200)
+    asdus = []
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        end = offset + view[offset + 1] + 2
+        asdus.append(view[offset + 6:end])
+        offset = end
+    def deciding():
+        analyzer = LinkAnalyzer(frames=len(asdus) + 1)
+        for asdu in asdus:
+            analyzer.feed_asdu(asdu)
+    analyzer = LinkAnalyzer(frames=1)
+    def decided():
+        for asdu in asdus:
+            analyzer.feed_asdu(asdu)
+    repeat = number // len(asdus)
+    mask = timeit(lambda: [candidate_mask(asdu) for asdu in asdus], number=repeat) / (repeat * len(asdus)) * 1e6
+    undecided = timeit(deciding, number=repeat) / (repeat * len(asdus)) * 1e6
+    drift = timeit(decided, number=repeat) / (repeat * len(asdus)) * 1e6
+    print('infer: candidate_mask %.2f us/frame, undecided %.2f us/frame, decided %.2f us/frame' % (mask, undecided, drift))
+
+
+def _tcp_packet(src: str, sport: int, dst: str, dport: int, seq: int, payload: bytes, flags: int = 0x18) -> bytes:
+    """以太网 + IPv4 + TCP 数据包"""
+    from socket import inet_aton
+    from struct import pack
+    tcp = pack('!HHIIBBHHH', sport, dport, seq, 0, 5 << 4, flags, 65535, 0, 0) + payload
+    ip = pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp), 0, 0x4000, 64, 6, 0, inet_aton(src), inet_aton(dst))
+    return b'\x00' * 12 + b'\x08\x00' + ip + tcp
+
+
+def _write_pcap(f, packets: list, ng: bool = False) -> None:
+    """将(时间戳, 数据包)列表写为pcap或pcapng文件"""
+    from struct import pack
+    if not ng:
+        f.write(pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for ts, packet in packets:
+            f.write(pack('<IIII', int(ts), round(ts % 1 * 1e6), len(packet), len(packet)) + packet)
+        return
+    f.write(pack('<IIIHHqI', 0x0A0D0D0A, 28, 0x1A2B3C4D, 1, 0, -1, 28))
+    f.write(pack('<IIHHIHHBxxxHHI', 1, 32, 1, 0, 65535, 9, 1, 9, 0, 0, 32))  # 纳秒时间戳
+    for ts, packet in packets:
+        padded = packet + b'\x00' * (-len(packet) % 4)
+        ns = round(ts * 1e9)
+        f.write(pack('<IIIIIII', 6, 32 + len(padded), 0, ns >> 32, ns & 0xffffffff, len(packet), len(packet)) + padded + pack('<I', 32 + len(padded)))
+
+
+def _capture_packets(connections: int = 4, frames: int = 400, segment: int = 1400) -> list:
+    """多个连接的录波数据包, 每个连接的比特流按segment字节切分为TCP分段"""
+    packets = []
+    ts = 1700000000.0
+    for n in range(connections):
+        stream = _capture(frames, common_addrs=3)
+        master, rtu = '10.0.0.1', '10.0.1.%d' % (n + 1)
+        seq = 1000 * n
+        packets.append((ts, _tcp_packet(rtu, 2404, master, 40000 + n, seq, b'', 0x12)))
+        seq += 1
+        for i in range(0, len(stream), segment):
+            ts += 0.001
+            packets.append((ts, _tcp_packet(rtu, 2404, master, 40000 + n, seq, stream[i:i + segment])))
+            seq += len(stream[i:i + segment])
+    return packets
+
+
+def bench_capture(connections: int = 16, frames: int = 1000):
+    """录波文件解析的吞吐量随进程数的变化"""
+    import io
+    import os
+    import tempfile
+    from capture import decode_capture
+    path = os.path.join(tempfile.mkdtemp(), 'bench.pcap')
+    with open(path, 'wb') as f:
+        _write_pcap(f, _capture_packets(connections, frames))
+    size = os.path.getsize(path)
+    for workers in (0, 1, 2, 4, 8):
+        if workers > (os.cpu_count() or 1):
+            break
+        start = time.perf_counter()
+        _, count = decode_capture(path, io.StringIO(), workers=workers, chunk_size=256 * 1024)
+        elapsed = time.perf_counter() - start
+        print('capture %d workers: %.1f MB/s %10.0f frames/s' % (workers, size / elapsed / 1e6, count / elapsed))
+    os.remove(path)
+
+
+def bench_replay(mb: int = 64):
+    """原始比特流回放: 索引生成速度、定位耗时及与整体读入的内存对比"""
+    import os
+    import subprocess
+    import sys
+    import tempfile
+    from replay import DumpReader
+    path = os.path.join(tempfile.mkdtemp(), 'dump.bin')
+    unit = _capture(400)
+    with open(path, 'wb') as f:
+        for _ in range(mb * 1024 * 1024 // len(unit)):
+            f.write(unit)
+    size = os.path.getsize(path)
+    with DumpReader(path) as reader:
+        start = time.perf_counter()
+        reader.build_index()
+        elapsed = time.perf_counter() - start
+        print('replay index: %.1f MB/s, %d frames' % (size / elapsed / 1e6, len(reader)))
+        number = 1000
+        seek = timeit(lambda: reader[len(reader) // 2], number=number) / number * 1e6
+        print('replay seek frame: %.1f us' % seek)
+    # 在子进程中分别测量两种方式遍历全部帧后的匿名内存(不含文件映射的页)
+    rss_anon = "print([line.split()[1] for line in open('/proc/self/status') if line.startswith('RssAnon')][0])"
+    for name, code in (
+            ('mmap', 'from replay import DumpReader\nwith DumpReader(%r) as r:\n    for a in r: pass\n    %s' % (path, rss_anon)), 
+            ('read', 'from unpack import APDUFramer\ndata = open(%r, "rb").read()\nfor a in APDUFramer(lazy=True, mode="raw").feed(data): pass\n%s' % (path, rss_anon))):
+        out = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)), 
+                             check=True, stdout=subprocess.PIPE, text=True).stdout
+        print('replay %s %d MB dump: anonymous RSS %d MB' % (name, mb, int(out) // 1024))
+    os.remove(path)
+    os.remove(path + '.idx')
+
+
+def bench_image(number: int = 200):
+    """过程映像的更新及读取速度"""
+    import random
+    from image import ProcessImage
+    frames = [apdu.asdu for apdu in APDUFramer(mode='raw').feed(_capture(400, common_addrs=8)) if apdu.asdu is not None]
+    columns = [apdu.asdu for apdu in APDUFramer(columnar=True, mode='raw').feed(_capture(400, common_addrs=8)) if apdu.asdu is not None]
+    for name, asdus in (('rows', frames), ('columns', columns)):
+        image = ProcessImage()
+        points = sum(image.update(asdu) for asdu in asdus)
+        elapsed = timeit(lambda: [image.update(asdu, 0) for asdu in asdus], number=number)
+        print('image update (%s): %.0f points/s' % (name, points * number / elapsed))
+    keys = random.Random(0).choices([(key >> 24, key & 0xffffff) for key in image.index], k=100000)
+    get = image.get
+    elapsed = timeit(lambda: [get(ca, ioa) for ca, ioa in keys], number=10)
+    print('image get: %.0f points/s, %d points' % (len(keys) * 10 / elapsed, len(image)))
+
+
+def bench_deadband(frames: int = 2000):
+    """带噪声的测量值经死区过滤后的上报量及每个ASDU的耗时"""
+    import random
+    from image import Deadband, ProcessImage
+    from pack import pack_asdu
+    from iec_types import ASDU, COT, InfoObj, VSQ
+    rng = random.Random(0)
+    levels = [rng.uniform(100, 1000) for _ in range(48)]
+    asdus = []
+    for n in range(frames):
+        levels = [level + rng.gauss(0, 0.5) for level in levels]  # 缓慢漂移的噪声
+        data = pack_asdu(ASDU(M__ME__NC__1, VSQ(48, 1), COT(3, 0, 0, 0), 1, [InfoObj(0x4001 + i, (level, 0)) for i, level in enumerate(levels)], 'raw'))
+        asdus.append(unpack_asdu(data, columnar=True, mode='raw'))
+    for deadband in (None, Deadband(), Deadband(percent=1)):
+        image = ProcessImage()
+        reported = []
+        if deadband is not None:
+            image.subscribe(lambda type_id, changes: reported.append(len(changes)), deadband=deadband)
+        start = time.perf_counter()
+        for asdu in asdus:
+            image.update(asdu, 0)
+        elapsed = time.perf_counter() - start
+        print('deadband %-40s %6.1f us/ASDU, %d of %d points reported' % (
+            deadband, elapsed / frames * 1e6, sum(reported), frames * 48))
+
+
+async def _delayed_link(port: int, delay: float):
+    """在127.0.0.1上建立一个单向延时delay秒的TCP代理, 返回(代理服务, 代理端口)"""
+    import asyncio
+    loop = asyncio.get_running_loop()
+
+    async def pipe(reader, writer):
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                loop.call_later(delay, writer.write, data)
+        finally:
+            loop.call_later(delay, writer.close)
+
+    async def handle(reader, writer):
+        upstream_reader, upstream_writer = await asyncio.open_connection('127.0.0.1', port)
+        await asyncio.gather(pipe(reader, upstream_writer), pipe(upstream_reader, writer), return_exceptions=True)
+
+    proxy = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return proxy, proxy.sockets[0].getsockname()[1]
+
+
+async def _stream_over_delayed_link(frames: int, delay: float, k: int = 12, w: int = 8) -> tuple:
+    """被控站经延时链路连续发送frames个突发ASDU, 返回(主站收到的帧数, 主站发送的S格式报文数, 耗时)"""
+    import asyncio
+    from aiostation import AsyncControlStation, AsyncStation, connect
+    from iec_types import ASDU, COT, InfoObj, VSQ
+    loop = asyncio.get_running_loop()
+    outstations = []
+
+    def outstation():
+        station = AsyncStation(k=k, w=w)
+        outstations.append(station)
+        return station
+
+    class CountingMaster(AsyncControlStation):
+        received = s_frames = 0
+        def asdu_received(self, asdu):
+            self.received += 1
+            if self.received == frames:
+                done.set_result(None)
+        def send_s(self):
+            self.s_frames += 1
+            super().send_s()
+
+    done = loop.create_future()
+    server = await loop.create_server(outstation, '127.0.0.1', 0)
+    proxy, port = await _delayed_link(server.sockets[0].getsockname()[1], delay)
+    master = await connect('127.0.0.1', port, station_class=CountingMaster, k=k, w=w)
+    await master.startdt()
+    start = time.perf_counter()
+    asdu = ASDU(M_SP_NA_1, VSQ(1, 0), COT(3, 0, 0, 0), 1, [InfoObj(1, (1, ))], 'raw')
+    for _ in range(frames):
+        outstations[0].send_asdu(asdu)
+    await asyncio.wait_for(done, 60)
+    elapsed = time.perf_counter() - start
+    master.close()
+    await asyncio.sleep(delay * 4 + 0.01)  # 等待代理两侧依次关闭
+    for item in (proxy, server):
+        item.close()
+    return master.received, master.s_frames, elapsed
+
+
+def bench_soe(rtus: int = 8, events: int = 50000, jitter: int = 50):
+    """故障后的事件突发: 多个被控站交错上送且时标略有乱序, 对比全部收齐后排序与SOE多路归并"""
+    import random
+    from datetime import datetime, timedelta
+    from pack import pack_CP56Time2a
+    from soe import SOEBuffer
+    from iec_types import ASDU, COT, InfoObj, VSQ
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    asdus = []
+    for n in range(0, events, 30):
+        offsets = sorted(n + i + rng.randrange(jitter) for i in range(30))
+        rng.shuffle(offsets)
+        asdus.append((n // 30 % rtus, ASDU(M__SP__TB__1, VSQ(30, 0), COT(3, 0, 0, 0), 1, [
+            InfoObj(i, (0x01, pack_CP56Time2a(start + timedelta(milliseconds=offset)))) for i, offset in enumerate(offsets)], 'raw')))
+
+    def post_sort():
+        from operator import attrgetter
+        from soe import Event
+        from unpack import CP56Time2a_to_ms
+        collected = [Event(CP56Time2a_to_ms(fields[-1]), rtu, asdu.common_addr, addr, asdu.type_id, fields[0] & 0b1, fields[0] & 0b11110000)
+                     for rtu, asdu in asdus for addr, fields in asdu.info_objs]
+        return sorted(collected, key=attrgetter('time'))
+
+    def merge():
+        soe = SOEBuffer(horizon=jitter * 2)
+        for rtu, asdu in asdus:
+            soe.push(rtu, asdu)
+        soe.flush()
+        return soe.drain()
+
+    for name, run in (('post-sort', post_sort), ('soe', merge)):
+        elapsed = min(timeit(run, number=1) for _ in range(3))
+        print('soe burst (%s): %.0f events/s, %d events' % (name, len(run()) / elapsed, len(run())))
+
+
+def bench_cp56(count: int = 100000):
+    """CP56Time2a转换为毫秒时间戳: 构造datetime, 缓存月份起始时间, 批量转换"""
+    import random
+    from datetime import datetime, timedelta, timezone
+    from pack import pack_CP56Time2a
+    from unpack import CP56Time2a_to_ms, CP56Time2a_to_ms_array
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    data = b''.join(pack_CP56Time2a(start + timedelta(milliseconds=rng.randrange(90 * 86400000))) for _ in range(count))
+
+    def by_datetime():
+        for offset in range(0, len(data), 7):
+            ms = data[offset] | data[offset + 1] << 8
+            datetime(2000 + (data[offset + 6] & 0x7f), data[offset + 5] & 0x0f, data[offset + 4] & 0x1f,
+                     data[offset + 3] & 0x1f, data[offset + 2] & 0x3f, ms // 1000, ms % 1000 * 1000, timezone.utc).timestamp()
+
+    for name, convert in (
+        ('datetime', by_datetime),
+        ('cached', lambda: [CP56Time2a_to_ms(data, offset) for offset in range(0, len(data), 7)]),
+        ('array', lambda: CP56Time2a_to_ms_array(data)),
+    ):
+        elapsed = min(timeit(convert, number=1) for _ in range(3))
+        print('cp56 to ms (%s): %.0f stamps/s' % (name, count / elapsed))
+
+
+def bench_metrics(number: int = 20):
+    """分帧器不统计与统计运行指标时的吞吐量"""
+    from metrics import Metrics
+    data = _capture(400)
+    for name, metrics in (('disabled', None), ('enabled', Metrics().connection('bench'))):
+        framer = APDUFramer(mode='raw', metrics=metrics)
+        elapsed = min(timeit(lambda: sum(1 for _ in framer.feed(data)), number=number) for _ in range(3))
+        print('metrics %-8s: %.0f frames/s' % (name, 400 * number / elapsed))
+
+
+def bench_trace(number: int = 20):
+    """分帧器不记录、以二进制记录报文及逐帧生成文本描述(原print的开销)时的吞吐量"""
+    import os
+    import tempfile
+    from frametrace import FrameTrace
+    data = _capture(400)
+    with tempfile.TemporaryDirectory() as tmp, FrameTrace(os.path.join(tmp, 'bench.trace'), slots=4096) as ring:
+        for name, trace, text in (('disabled', None, False), ('trace', ring, False), ('text', None, True)):
+            framer = APDUFramer(mode='raw', trace=trace)
+            run = (lambda: sum(len(str(apdu)) for apdu in framer.feed(data))) if text else (lambda: sum(1 for _ in framer.feed(data)))
+            elapsed = min(timeit(run, number=number) for _ in range(3))
+            print('trace %-8s: %.0f frames/s' % (name, 400 * number / elapsed))
+
+
+def bench_speedups(number: int = 200):
+    """纯Python实现与当前选用的解析热点实现(编译时为扩展模块)在同一语料上的耗时"""
+    import unpack as module
+    frames = corpus() + corpus(sq=True)
+    times = [frame[-7:] for frame in frames]
+    profile = module.DEFAULT_PROFILE
+    for name, speedups in (('pure', module._load_speedups(pure=True)), ('selected', module._speedups)):
+        unpack_apci, unpack_asdu_header, unpack_CP56Time2a = speedups.unpack_apci, speedups.unpack_asdu_header, speedups.unpack_CP56Time2a
+        def run():
+            for frame in frames:
+                unpack_apci(frame)
+                unpack_asdu_header(frame[6:], profile)
+            for data in times:
+                unpack_CP56Time2a(data)
+        elapsed = min(timeit(run, number=number) for _ in range(3))
+        print('speedups %-8s (compiled=%s): %.0f frames/s' % (name, speedups.COMPILED, len(frames) * number / elapsed))
+
+
+def bench_file_transfer(sizes: tuple = (1 << 20, 8 << 20)):
+    """经模拟器召唤文件并写入磁盘的吞吐量, 及传输期间主站一侧的内存峰值(应与文件大小无关)"""
+    import asyncio
+    import os
+    import tempfile
+    import tracemalloc
+    from aiostation import connect
+    from simulator import Simulator
+    async def run(tmp, size):
+        path = os.path.join(tmp, 'source.dat')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        async with Simulator(_bench_database(), files={(1, 1): path}) as simulator:
+            master = await connect('127.0.0.1', simulator.port, t2=0.01)
+            tracemalloc.start()
+            start = time.perf_counter()
+            await master.read_file(1, 1, 1, os.path.join(tmp, 'copy.dat'), timeout=10)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            master.close()
+        return elapsed, peak
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            elapsed, peak = asyncio.run(run(tmp, size))
+            print('file transfer %5d KiB: %.1f MiB/s, peak %d KiB (master and simulator)' % (size >> 10, size / elapsed / (1 << 20), peak >> 10))
+
+
+def bench_window(frames: int = 2000, delay: float = 0.005):
+    """延时链路上不同k值的吞吐量, 吞吐量上限约为 k / 往返时延"""
+    import asyncio
+    for k in (1, 4, 12, 32):
+        received, s_frames, elapsed = asyncio.run(_stream_over_delayed_link(frames, delay, k=k, w=max(1, k * 2 // 3)))
+        print('window k=%2d over %d ms link: %.0f frames/s, %d S frames' % (k, delay * 1000, received / elapsed, s_frames))
+
+
+################################ 回归基准 ################################
+# 以生成的语料覆盖TYPE_DESC中的全部类型标识(信息对象集合及序列)及S/U/I混合报文流,
+# 记录每项的 帧/秒、信息点/秒、每帧保留的内存块数及单次调用耗时的p99, 可保存为基线并比较:
+#   python bench.py --suite --save baseline.json
+#   python bench.py --suite --compare baseline.json
+_SAMPLE_FIELDS = {'B': 1, 'H': 2, 'h': -3, 'I': 4, 'f': 1.5}
+_S_FRAME = b'h\x04\x01\x00\x02\x00'
+_U_FRAMES = (b'h\x04\x43\x00\x00\x00', b'h\x04\x83\x00\x00\x00')  # TESTFR ACTIVATE, TESTFR ACK
+
+
+def _sample_fields(type_id: int, i: int) -> tuple:
+    """按信息元素集的结构生成'raw'模式的原始数值元组"""
+    from datetime import datetime
+    from pack import pack_CP56Time2a
+    layout = INFO_ELEM_LAYOUTS[type_id]
+    if layout.struct is None:
+        return (1, 1, 4, bytes(range(i & 0xf, (i & 0xf) + 4)))  # 段
+    fmt = layout.struct.format.lstrip('<')
+    fields = []
+    j = 0
+    while j < len(fmt):
+        if fmt[j].isdigit():
+            size = int(fmt[j])
+            j += 2
+            if size == 5:
+                fields.append(bytes((i & 0xff, 0, 0, 0, i & 0b11111)))  # 二进制计数器读数
+            else:
+                fields.append(pack_CP56Time2a(datetime(2024, 1, 2, 3, 4, i % 60, i * 1000 % 1000000))[:size])
+        else:
+            fields.append(_SAMPLE_FIELDS[fmt[j]])
+            j += 1
+    return tuple(fields)
+
+
+def corpus(sq: bool = False, number: int = 8) -> list:
+    """TYPE_DESC中每个类型标识一帧, 每帧number个信息对象(长度可变的段为1个)"""
+    from iec_types import APDU, ASDU, COT, InfoObj, VSQ
+    from pack import pack_apdu
+    frames = []
+    for n, type_id in enumerate(sorted(TYPE_DESC)):
+        count = 1 if INFO_ELEM_LAYOUTS[type_id].size is None else number
+        info_objs = [InfoObj(0x100 + i, _sample_fields(type_id, i)) for i in range(count)]
+        asdu = ASDU(type_id, VSQ(count, 1 if sq else 0), COT(3, 0, 0, 0), 1, info_objs, 'raw')
+        frames.append(pack_apdu(APDU('I', 'TRANSMIT', n, 0, asdu)))
+    return frames
+
+
+def mixed_stream(frames: list) -> bytes:
+    """I格式报文间插入S格式及U格式报文"""
+    chunks = []
+    for n, frame in enumerate(frames):
+        chunks.append(frame)
+        if n % 4 == 3:
+            chunks.append(_S_FRAME)
+        if n % 8 == 7:
+            chunks.extend(_U_FRAMES)
+    return b''.join(chunks)
+
+
+def _measure(call, inputs: list, frames: int, points: int, repeat: int) -> dict:
+    """对inputs中每个输入调用call repeat轮, frames及points为一轮的帧数及信息点数
+
+    吞吐量取最快一轮, 以减少调度噪声; p99取全部调用的耗时。
+    """
+    import sys
+    perf_counter_ns = time.perf_counter_ns
+    latencies = []
+    best = None
+    for _ in range(repeat):
+        total = 0
+        for data in inputs:
+            start = perf_counter_ns()
+            call(data)
+            elapsed = perf_counter_ns() - start
+            latencies.append(elapsed)
+            total += elapsed
+        best = total if best is None else min(best, total)
+    blocks = sys.getallocatedblocks()
+    results = [call(data) for data in inputs]  # 保留结果, 统计每帧新增的内存块
+    blocks = sys.getallocatedblocks() - blocks
+    del results
+    return {
+        'frames_per_s': frames / best * 1e9,
+        'points_per_s': points / best * 1e9,
+        'blocks_per_frame': blocks / frames,
+        'p99_us': _p99(latencies) / 1000,
+    }
+
+
+def _p99(latencies: list) -> float:
+    from math import ceil
+    latencies = sorted(latencies)
+    return latencies[ceil(len(latencies) * 0.99) - 1]
+
+
+def _decodes(frames: list, mode: str) -> tuple:
+    """语料中可以解析的帧及无法解析的类型标识"""
+    ok, errors = [], []
+    for frame in frames:
+        try:
+            unpack_apdu(frame, mode=mode)
+        except Exception:
+            errors.append(frame[6])
+        else:
+            ok.append(frame)
+    return ok, errors
+
+
+async def _station_session(rounds: int) -> tuple:
+    """回环连接上的总召唤, 返回(每轮耗时(ns), 每轮帧数, 每轮信息点数)"""
+    from aiostation import connect
+    from simulator import MONITOR_TYPES, PointDatabase, Simulator
+    database = PointDatabase()
+    for type_id in MONITOR_TYPES:
+        database.add_range(1, type_id, 0x1000 * type_id, 64)
+    async with Simulator(database) as simulator:
+        master = await connect('127.0.0.1', simulator.port)
+        await master.startdt()
+        latencies = []
+        for _ in range(rounds):
+            start = time.perf_counter_ns()
+            responses = await master.interrogate(1, timeout=10)
+            latencies.append(time.perf_counter_ns() - start)
+        master.close()
+    return latencies, len(responses) + 2, sum(asdu.vsq.info_objs_total_number for asdu in responses)
+
+
+def suite(repeat: int = 20, rounds: int = 50) -> dict:
+    """运行回归基准, 返回 项目 -> 指标"""
+    import asyncio
+    import gc
+    from pack import pack_apdu_into
+    results = {}
+    gc.collect()
+    for sq in (False, True):
+        frames = corpus(sq)
+        kind = 'sq' if sq else 'set'
+        for mode in ('raw', 'full'):
+            ok, errors = _decodes(frames, mode)
+            points = sum(frame[7] & 0x7f for frame in ok)
+            streams = [mixed_stream(ok[i:i + 8]) for i in range(0, len(ok), 8)]  # 每次调用8个I格式报文
+            total = sum(len(from_bytes_to_apdus(stream, mode='raw')) for stream in streams)
+            results['from_bytes_to_apdus/%s/%s' % (mode, kind)] = _measure(
+                lambda data: from_bytes_to_apdus(data, mode=mode), streams, total, points, repeat)
+            results['unpack_asdu/%s/%s' % (mode, kind)] = dict(_measure(
+                lambda data: unpack_asdu(data, mode=mode), [frame[6:] for frame in ok], len(ok), points, repeat),
+                errors=sorted(errors))
+        apdus = [unpack_apdu(frame, mode='raw') for frame in frames]
+        buf = bytearray(255)
+        results['pack_apdu_into/%s' % kind] = _measure(
+            lambda apdu: pack_apdu_into(buf, 0, apdu), apdus, len(apdus), sum(frame[7] & 0x7f for frame in frames), repeat)
+    latencies, frames, points = asyncio.run(_station_session(rounds))
+    best = min(latencies) / 1e9
+    results['station/interrogation'] = {
+        'frames_per_s': frames / best,
+        'points_per_s': points / best,
+        'p99_us': _p99(latencies) / 1000,
+    }
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.2) -> list:
+    """与基线比较, 返回退化项(项目, 指标, 基线值, 当前值)
+
+    吞吐量下降或每帧内存块增加超过tolerance即为退化; p99受调度噪声影响较大, 容差加倍;
+    出现基线中没有的解析错误也视为退化。
+    """
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key, value in metrics.items():
+            if key not in base or key == 'errors':
+                continue
+            if key.endswith('_per_s'):
+                worse = value < base[key] * (1 - tolerance)
+            elif key == 'blocks_per_frame':
+                worse = value > base[key] * (1 + tolerance) + 0.5
+            else:
+                worse = value > base[key] * (1 + tolerance * 2)
+            if worse:
+                regressions.append((name, key, base[key], value))
+        if set(metrics.get('errors', ())) - set(base.get('errors', ())):
+            regressions.append((name, 'errors', base.get('errors'), metrics['errors']))
+    return regressions
+
+
+def print_suite(results: dict) -> None:
+    for name, metrics in results.items():
+        print('%-32s %10.0f frames/s %12.0f points/s %8s blocks/frame %9.1f us p99%s' % (
+            name, metrics['frames_per_s'], metrics['points_per_s'],
+            '%.1f' % metrics['blocks_per_frame'] if 'blocks_per_frame' in metrics else '-', metrics['p99_us'],
+            '  decode errors: %s' % metrics['errors'] if metrics.get('errors') else ''))
+
+
+def main(argv: list = None) -> int:
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description='性能基准测试, 缺省运行全部基准')
+    parser.add_argument('--suite', action='store_true', help='只运行回归基准')
+    parser.add_argument('--save', help='将回归基准结果保存为JSON基线')
+    parser.add_argument('--compare', help='与JSON基线比较, 有退化时返回1')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+    if not args.suite:
+        for bench in (bench_framer, bench_info_elems, bench_columnar, bench_memory, bench_lazy, bench_raw_mode,
+                      bench_pack, bench_asyncio_stations, bench_simulator, bench_infer, bench_capture, bench_replay,
+                      bench_image, bench_deadband, bench_cp56, bench_soe, bench_metrics, bench_trace, bench_speedups, bench_file_transfer, bench_window):
+            bench()
+    results = suite()
+    print_suite(results)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, key, base, value in regressions:
+            print('REGRESSION %s %s: %s -> %s' % (name, key, base, value))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
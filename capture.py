@@ -0,0 +1,463 @@
+# 本模块离线解析pcap/pcapng录波文件中的IEC104报文, 可直接运行:
+#   python capture.py traffic.pcapng -o traffic.jsonl --workers 8
+# 主进程读取数据包并按连接重组TCP字节流, 在报文边界处切分为工作单元,
+# 由进程池并行解析, 结果按输入顺序以JSON Lines或Parquet格式输出。
+import argparse
+import json
+import mmap
+import os
+import sys
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from struct import Struct, error as StructError
+
+from data import *
+from iec_types import *
+from infer import LinkAnalyzer
+from unpack import unpack_apdu
+
+
+CHUNK_SIZE = 1 << 20  # 工作单元的字节数
+PORT = 2404
+
+_PCAP_HEADER = Struct('IHHiIII')
+_PCAP_RECORD = Struct('IIII')
+_BLOCK_HEAD = Struct('II')
+_EPB = Struct('IIIII')
+_IPV4 = Struct('!BBHHHBBH4s4s')
+_IPV6 = Struct('!IHBB16s16s')
+_TCP = Struct('!HHIIBB')
+
+
+################################ 文件读取 ################################
+def read_pcap(buf) -> iter:
+    """逐个生成pcap文件中的(时间戳, 链路类型, 数据包)"""
+    magic = int.from_bytes(buf[:4], 'little')
+    if magic in (0xa1b2c3d4, 0xa1b23c4d):
+        order = '<'
+    elif magic in (0xd4c3b2a1, 0x4d3cb2a1):
+        order = '>'
+    else:
+        raise ValueError('不是pcap文件')
+    scale = 1e-9 if magic in (0xa1b23c4d, 0x4d3cb2a1) else 1e-6
+    linktype = Struct(order + _PCAP_HEADER.format).unpack_from(buf)[6]
+    record = Struct(order + _PCAP_RECORD.format)
+    offset, end = _PCAP_HEADER.size, len(buf)
+    while offset + record.size <= end:
+        sec, frac, caplen, _ = record.unpack_from(buf, offset)
+        offset += record.size
+        yield sec + frac * scale, linktype, buf[offset:offset + caplen]
+        offset += caplen
+
+
+def read_pcapng(buf) -> iter:
+    """逐个生成pcapng文件中的(时间戳, 链路类型, 数据包)"""
+    offset, end = 0, len(buf)
+    head, epb = _BLOCK_HEAD, _EPB
+    interfaces = []  # (链路类型, 时间戳单位)
+    while offset + 12 <= end:
+        block_type = int.from_bytes(buf[offset:offset + 4], 'little')
+        if block_type == 0x0A0D0D0A:
+            # 节头块, 由字节序标记确定本节的字节序
+            order = '<' if int.from_bytes(buf[offset + 8:offset + 12], 'little') == 0x1A2B3C4D else '>'
+            head, epb = Struct(order + _BLOCK_HEAD.format), Struct(order + _EPB.format)
+            interfaces = []
+        block_type, length = head.unpack_from(buf, offset)
+        if length < 12:
+            raise ValueError('pcapng块长度错误')
+        body = offset + 8
+        if block_type == 1:
+            # 接口描述块: 链路类型及选项中的时间戳精度
+            linktype = Struct(head.format[0] + 'H').unpack_from(buf, body)[0]
+            interfaces.append((linktype, _tsresol(buf, body + 8, offset + length - 4, head.format[0])))
+        elif block_type == 6:
+            # 增强数据包块
+            interface, high, low, caplen, _ = epb.unpack_from(buf, body)
+            linktype, scale = interfaces[interface]
+            yield ((high << 32) | low) * scale, linktype, buf[body + 20:body + 20 + caplen]
+        elif block_type == 3:
+            # 简单数据包块, 无时间戳
+            caplen = min(Struct(head.format[0] + 'I').unpack_from(buf, body)[0], length - 16)
+            yield 0.0, interfaces[0][0], buf[body + 4:body + 4 + caplen]
+        offset += length
+
+
+def _tsresol(buf, offset: int, end: int, order: str) -> float:
+    """解析接口描述块选项中的if_tsresol, 缺省为微秒"""
+    option = Struct(order + 'HH')
+    while offset + 4 <= end:
+        code, length = option.unpack_from(buf, offset)
+        if code == 0:
+            break
+        if code == 9:
+            value = buf[offset + 4]
+            return 2.0 ** -(value & 0x7f) if value & 0x80 else 10.0 ** -value
+        offset += 4 + (length + 3) // 4 * 4
+    return 1e-6
+
+
+def read_packets(buf) -> iter:
+    """按文件格式读取pcap或pcapng"""
+    if int.from_bytes(buf[:4], 'little') == 0x0A0D0D0A:
+        return read_pcapng(buf)
+    return read_pcap(buf)
+
+
+################################ 协议解析 ################################
+def parse_tcp(linktype: int, packet) -> tuple:
+    """解析链路层至TCP层, 返回(源地址, 源端口, 目的地址, 目的端口, 序号, 标志, 载荷), 非TCP数据包返回None"""
+    if linktype == 1:  # Ethernet
+        ethertype, offset = int.from_bytes(packet[12:14], 'big'), 14
+        while ethertype in (0x8100, 0x88a8):  # VLAN
+            ethertype, offset = int.from_bytes(packet[offset + 2:offset + 4], 'big'), offset + 4
+    elif linktype == 113:  # Linux cooked capture
+        ethertype, offset = int.from_bytes(packet[14:16], 'big'), 16
+    elif linktype == 276:  # Linux cooked capture v2
+        ethertype, offset = int.from_bytes(packet[0:2], 'big'), 20
+    elif linktype == 0:  # BSD loopback
+        ethertype, offset = (0x86dd if packet[0] in (24, 28, 30) or packet[3] in (24, 28, 30) else 0x800), 4
+    elif linktype in (101, 228, 229):  # Raw IP
+        ethertype, offset = (0x86dd if packet[0] >> 4 == 6 else 0x800), 0
+    else:
+        return None
+
+    if ethertype == 0x800 and len(packet) >= offset + _IPV4.size:
+        version_ihl, _, total, _, fragment, _, proto, _, src, dst = _IPV4.unpack_from(packet, offset)
+        if proto != 6 or fragment & 0x1fff:
+            return None
+        end = offset + total
+        offset += (version_ihl & 0xf) * 4
+    elif ethertype == 0x86dd and len(packet) >= offset + _IPV6.size:
+        _, payload, proto, _, src, dst = _IPV6.unpack_from(packet, offset)
+        if proto != 6:
+            return None
+        offset += _IPV6.size
+        end = offset + payload
+    else:
+        return None
+
+    if len(packet) < offset + _TCP.size:
+        return None
+    sport, dport, seq, _, data_offset, flags = _TCP.unpack_from(packet, offset)
+    return src, sport, dst, dport, seq, flags, packet[offset + (data_offset >> 4) * 4:min(end, len(packet))]
+
+
+def _addr(ip: bytes, port: int) -> str:
+    if len(ip) == 4:
+        return '%d.%d.%d.%d:%d' % (*ip, port)
+    return '[%s]:%d' % (':'.join(ip[i:i + 2].hex() for i in range(0, 16, 2)), port)
+
+
+class TCPStream:
+    """单方向TCP字节流的重组
+
+    按序号拼接载荷: 重传部分被裁掉, 乱序到达的分段暂存至缺口被填补,
+    暂存过多时认为缺口已丢失, 从最早的暂存分段继续。
+    """
+    MAX_PENDING = 64
+
+    def __init__(self, src: str, dst: str) -> None:
+        self.src = src
+        self.dst = dst
+        self.next_seq = None
+        self.pending = {}  # 序号 -> (时间戳, 载荷)
+        self.data = bytearray()  # 尚未切分为工作单元的字节
+        self.starts = []  # 各分段在data中的起始位置
+        self.times = []  # 各分段的时间戳
+        self.analyzer = LinkAnalyzer()
+        self.gaps = 0  # 丢失的缺口数
+
+
+    def add(self, ts: float, seq: int, flags: int, payload) -> None:
+        if flags & 0x02:  # SYN
+            self.next_seq = (seq + 1) & 0xffffffff
+            return
+        if not payload:
+            return
+        if self.next_seq is None:
+            self.next_seq = seq  # 录波始于连接建立之后
+        diff = (seq - self.next_seq) & 0xffffffff
+        if diff >= 1 << 31:
+            # 重传: 裁掉已接收的部分
+            skip = (self.next_seq - seq) & 0xffffffff
+            if skip >= len(payload):
+                return
+            payload = payload[skip:]
+        elif diff:
+            self.pending[seq] = (ts, payload)
+            if len(self.pending) > self.MAX_PENDING:
+                self.gaps += 1
+                self.next_seq = min(self.pending, key=lambda seq: (seq - self.next_seq) & 0xffffffff)
+                self._drain()
+            return
+        self._append(ts, payload)
+        self._drain()
+
+
+    def _append(self, ts: float, payload) -> None:
+        self.starts.append(len(self.data))
+        self.times.append(ts)
+        self.data += payload
+        self.next_seq = (self.next_seq + len(payload)) & 0xffffffff
+
+
+    def _drain(self) -> None:
+        while self.pending:
+            for seq in list(self.pending):
+                diff = (seq - self.next_seq) & 0xffffffff
+                if diff == 0 or diff >= 1 << 31:
+                    ts, payload = self.pending.pop(seq)
+                    skip = (self.next_seq - seq) & 0xffffffff
+                    if skip < len(payload):
+                        self._append(ts, payload[skip:])
+                    break
+            else:
+                return
+
+
+    def split(self, final: bool = False):
+        """切出以完整报文结尾的工作单元数据(数据, 分段起始位置, 时间戳), 不足时返回None"""
+        data = self.data
+        if final:
+            cut = len(data)
+        else:
+            # 沿长度字节跳至最后一个完整报文的结尾
+            offset, end = 0, len(data)
+            while offset + 2 <= end:
+                if data[offset] != 0x68:
+                    offset += 1
+                    continue
+                pack_end = offset + data[offset + 1] + 2
+                if pack_end > end:
+                    break
+                offset = pack_end
+            cut = offset
+        if not cut:
+            return None
+        if self.analyzer.profile is None:
+            self.analyzer.feed(data[:cut])
+        index = bisect_left(self.starts, cut)
+        chunk = bytes(data[:cut]), self.starts[:index], self.times[:index]
+        # 被切开的分段在剩余数据中保留原时间戳
+        if index and (index == len(self.starts) or self.starts[index] != cut) and cut < len(data):
+            self.starts = [0] + [start - cut for start in self.starts[index:]]
+            self.times = self.times[index - 1:index] + self.times[index:]
+        else:
+            self.starts = [start - cut for start in self.starts[index:]]
+            self.times = self.times[index:]
+        del data[:cut]
+        return chunk
+
+
+################################ 解析工作单元 ################################
+def _json_default(obj):
+    if isinstance(obj, (bytes, memoryview)):
+        return bytes(obj).hex()
+    if isinstance(obj, InfoObjColumns):
+        return [obj.addr, list(obj.values), list(obj.quality)]
+    raise TypeError(type(obj).__name__)
+
+
+def decode_chunk(unit: tuple) -> tuple:
+    """解析一个工作单元, 返回(帧数, JSON Lines文本或记录列表)
+
+    unit为(源, 目的, 系统参数字节数, 数据, 分段起始位置, 分段时间戳, 输出格式),
+    报文时间取其最后一个字节所在分段的时间戳。
+    无法解析的报文(如TCP缺失数据后误以载荷中的0x68为起始)记为format为'malformed'的记录,
+    含错误及原始字节, 不计入帧数, 其后自下一字节起重新寻找报文起始
+    """
+    src, dst, sizes, data, starts, times, fmt = unit
+    profile = LinkProfile(*sizes)
+    view = memoryview(data)
+    records = []
+    malformed = 0
+    offset, end = 0, len(view)
+    while offset + 2 <= end:
+        if view[offset] != 0x68:
+            offset += 1
+            continue
+        pack_end = offset + view[offset + 1] + 2
+        if pack_end > end:
+            break
+        try:
+            apdu = unpack_apdu(view[offset:pack_end], mode='raw', profile=profile)
+        except (StructError, ValueError, IndexError) as exc:
+            records.append({
+                'ts': times[bisect_right(starts, pack_end - 1) - 1], 
+                'src': src, 
+                'dst': dst, 
+                'format': 'malformed', 
+                'error': '%s: %s' % (type(exc).__name__, exc), 
+                'raw': bytes(view[offset:pack_end]).hex(), 
+            })
+            malformed += 1
+            offset += 1
+            continue
+        record = {
+            'ts': times[bisect_right(starts, pack_end - 1) - 1], 
+            'src': src, 
+            'dst': dst, 
+            'format': apdu.format, 
+            'action': apdu.action, 
+            'send': apdu.send, 
+            'recv': apdu.recv, 
+        }
+        asdu = apdu.asdu
+        if asdu is not None:
+            cot = asdu.trans_cause
+            record.update(
+                type_id=asdu.type_id, 
+                sq=asdu.vsq.is_sq, 
+                cause=cot.cause, 
+                pn=cot.pn, 
+                test=cot.t, 
+                source_addr=cot.source_addr, 
+                common_addr=asdu.common_addr, 
+                objs=[[obj.addr, obj.elems] for obj in asdu.info_objs])
+        records.append(record)
+        offset = pack_end
+    frames = len(records) - malformed
+    if fmt == 'jsonl':
+        return frames, ''.join([json.dumps(record, ensure_ascii=False, default=_json_default) + '\n' for record in records])
+    for record in records:
+        if 'objs' in record:
+            record['objs'] = json.dumps(record['objs'], default=_json_default)
+    return frames, records
+
+
+################################ 调度与输出 ################################
+def iter_units(buf, port: int = PORT, chunk_size: int = CHUNK_SIZE, fmt: str = 'jsonl', profile: LinkProfile = None) -> iter:
+    """读取录波数据, 按连接方向重组TCP字节流并逐个生成工作单元
+
+    profile为None时由各方向前若干个I格式报文推断系统参数
+    """
+    streams = {}
+    for ts, linktype, packet in read_packets(buf):
+        parsed = parse_tcp(linktype, packet)
+        if parsed is None:
+            continue
+        src, sport, dst, dport, seq, flags, payload = parsed
+        if port not in (sport, dport):
+            continue
+        key = (src, sport, dst, dport)
+        stream = streams.get(key)
+        if stream is None:
+            stream = streams[key] = TCPStream(_addr(src, sport), _addr(dst, dport))
+        stream.add(ts, seq, flags, payload)
+        if len(stream.data) >= chunk_size:
+            chunk = stream.split()
+            if chunk is not None:
+                yield _unit(stream, chunk, fmt, profile)
+    for stream in streams.values():
+        chunk = stream.split(final=True)
+        if chunk is not None:
+            yield _unit(stream, chunk, fmt, profile)
+
+
+def _unit(stream: TCPStream, chunk: tuple, fmt: str, profile: LinkProfile) -> tuple:
+    if profile is None:
+        profile = stream.analyzer.profile or stream.analyzer.best() or DEFAULT_PROFILE
+    return (stream.src, stream.dst, (profile.cot_size, profile.ca_size, profile.ioa_size), *chunk, fmt)
+
+
+def _parquet_schema():
+    import pyarrow
+    return pyarrow.schema([
+        ('ts', pyarrow.float64()), 
+        ('src', pyarrow.string()), 
+        ('dst', pyarrow.string()), 
+        ('format', pyarrow.string()), 
+        ('action', pyarrow.string()), 
+        ('send', pyarrow.int32()), 
+        ('recv', pyarrow.int32()), 
+        ('type_id', pyarrow.int16()), 
+        ('sq', pyarrow.int8()), 
+        ('cause', pyarrow.int8()), 
+        ('pn', pyarrow.int8()), 
+        ('test', pyarrow.int8()), 
+        ('source_addr', pyarrow.int16()), 
+        ('common_addr', pyarrow.int32()), 
+        ('objs', pyarrow.string()),  # 信息对象的JSON文本
+        ('error', pyarrow.string()),  # 无法解析的报文的错误
+        ('raw', pyarrow.string()),  # 无法解析的报文的十六进制原始字节
+    ])
+
+
+def decode_capture(path: str, out, fmt: str = 'jsonl', workers: int = None, chunk_size: int = CHUNK_SIZE, port: int = PORT, profile: LinkProfile = None) -> tuple:
+    """解析录波文件并将结果写入out, 返回(文件字节数, 帧数)
+
+    fmt为'jsonl'时out为文本文件对象, 为'parquet'时out为文件路径(须安装pyarrow);
+    workers为0时在当前进程中解析, 为None时使用全部CPU
+    """
+    writer = None
+    if fmt == 'parquet':
+        import pyarrow
+        import pyarrow.parquet
+        schema = _parquet_schema()
+        writer = pyarrow.parquet.ParquetWriter(out, schema)
+    elif fmt != 'jsonl':
+        raise ValueError('未知的输出格式: %s' % fmt)
+
+    def write(result):
+        frames, payload = result
+        if writer is None:
+            out.write(payload)
+        elif payload:
+            writer.write_table(pyarrow.Table.from_pylist(payload, schema=schema))
+        return frames
+
+    frames = 0
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        units = iter_units(buf, port, chunk_size, fmt, profile)
+        if workers == 0:
+            for unit in units:
+                frames += write(decode_chunk(unit))
+        else:
+            workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(workers) as executor:
+                # 限制在途工作单元数, 结果按提交顺序写出
+                limit = workers * 2
+                futures = deque()
+                for unit in units:
+                    futures.append(executor.submit(decode_chunk, unit))
+                    if len(futures) >= limit:
+                        frames += write(futures.popleft().result())
+                while futures:
+                    frames += write(futures.popleft().result())
+        size = len(buf)
+    if writer is not None:
+        writer.close()
+    return size, frames
+
+
+def main(argv: list = None) -> None:
+    parser = argparse.ArgumentParser(description='解析pcap/pcapng录波文件中的IEC104报文')
+    parser.add_argument('capture', help='pcap或pcapng文件')
+    parser.add_argument('-o', '--output', help='输出文件, 缺省为标准输出(仅JSON Lines)')
+    parser.add_argument('-f', '--format', choices=('jsonl', 'parquet'), default='jsonl')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='解析进程数, 0为不启用进程池, 缺省为CPU数')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='工作单元的字节数')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--profile', help='系统参数"传送原因,公共地址,信息对象地址"的字节数, 如2,2,3; 缺省自动推断')
+    args = parser.parse_args(argv)
+
+    profile = LinkProfile(*map(int, args.profile.split(','))) if args.profile else None
+    if args.format == 'parquet':
+        if not args.output:
+            parser.error('Parquet格式须指定输出文件')
+        try:
+            import pyarrow
+        except ImportError:
+            parser.error('Parquet格式须安装pyarrow')
+        size, frames = decode_capture(args.capture, args.output, 'parquet', args.workers, args.chunk_size, args.port, profile)
+    elif args.output:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            size, frames = decode_capture(args.capture, out, 'jsonl', args.workers, args.chunk_size, args.port, profile)
+    else:
+        size, frames = decode_capture(args.capture, sys.stdout, 'jsonl', args.workers, args.chunk_size, args.port, profile)
+    print('%d bytes, %d frames' % (size, frames), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -188,10 +188,10 @@ TRANS_CAUSE_DESC = {
     47: '未知的信息对象地址', 
 }
 
-TRANS_CAUSE_SIZE = 2  # TODO: 系统参数自适应功能未开发完成
+TRANS_CAUSE_SIZE = 2  # 默认值, 各连接的系统参数见iec_types.LinkProfile
 
 """公共地址的字节数(1 or 2)"""
-COMMON_ADDR_SIZE = 2  # TODO: 系统参数自适应功能未开发完成
+COMMON_ADDR_SIZE = 2  # 默认值, 各连接的系统参数见iec_types.LinkProfile
 
 """信息对象地址的字节数(1 or 2 or 3)"""
-INFO_ADDR_SIZE = 3  # TODO: 系统参数自适应功能未开发完成
+INFO_ADDR_SIZE = 3  # 默认值, 各连接的系统参数见iec_types.LinkProfile
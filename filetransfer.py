@@ -0,0 +1,431 @@
+# 本模块为监视方向的文件传输(GB/T 18657.4-2002 7.3.6), 如从继电保护装置召唤录波文件(COMTRADE):
+#   主站 F_SC 选择文件 -> 子站 F_FR 文件准备就绪 -> 主站 F_SC 召唤文件
+#   -> 子站 F_SR 节准备就绪 -> 主站 F_SC 召唤节 -> 子站 F_SG 段 ... F_LS 最后的段(节校验和)
+#   -> 主站 F_AF 认可节 -> (下一节) ... -> 子站 F_LS 最后的节(文件校验和) -> 主站 F_AF 认可文件
+# 段收到后直接写入输出端, 校验和逐段累加, 占用的内存与文件大小无关;
+# 同一连接上的传输以(公共地址, 信息对象地址, 文件名称)区分, 可同时进行多个。
+# 状态机不涉及IO: 输入收到的ASDU, 返回待发送的ASDU, 由各站及模拟器负责收发。
+import os
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from data import *
+from iec_types import *
+from pack import pack_CP56Time2a
+from unpack import SEGMENT_HEAD, CP56Time2a_to_ms
+
+
+"""文件传输的类型标识"""
+FILE_TYPES = frozenset((F_FR_NA_1, F_SR_NA_1, F_SC_NA_1, F_LS_NA_1, F_AF_NA_1, F_SG_NA_1, F_DR_TA_1))
+
+COT_REQUEST = 5  # 请求或被请求, 用于召唤目录
+COT_FILE = 13  # 文件传输
+
+# 选择和召唤限定词(SCQ)
+SCQ_DIRECTORY = 0  # 缺省, 与传送原因5一起表示召唤目录
+SCQ_SELECT_FILE = 1
+SCQ_CALL_FILE = 2
+SCQ_DEACTIVATE_FILE = 3
+SCQ_CALL_SECTION = 6
+# 最后的节和段的限定词(LSQ)
+LSQ_FILE = 1  # 不带停止激活的文件传输
+LSQ_SECTION = 3  # 不带停止激活的节传输
+# 文件认可或节认可限定词(AFQ)
+AFQ_FILE_OK = 1
+AFQ_FILE_FAIL = 2
+AFQ_SECTION_OK = 3
+AFQ_SECTION_FAIL = 4
+# 文件状态(SOF)
+SOF_LFD = 0b100000  # 最后目录文件
+
+SECTION_SIZE = 1 << 16  # 被控站一侧节的缺省长度
+MAX_ASDU_SIZE = 249  # APDU最大长度253减去控制域
+
+
+def checksum(data, initial: int = 0) -> int:
+    """校验和: 全部八位位组的算术和模256, initial为之前各部分的校验和"""
+    return (initial + sum(data)) & 0xff
+
+
+def segment_size(profile: LinkProfile = DEFAULT_PROFILE) -> int:
+    """一个段可容纳的最大字节数"""
+    return MAX_ASDU_SIZE - profile.header.size - profile.ioa_size - SEGMENT_HEAD.size
+
+
+def _asdu(type_id: int, common_addr: int, addr: int, fields: tuple, cause: int = COT_FILE) -> ASDU:
+    return ASDU(type_id, VSQ(1, 0), COT(cause, 0, 0, 0), common_addr, [InfoObj(addr, fields)], 'raw')
+
+
+class FileTransferError(Exception):
+    pass
+
+
+class DirectoryEntry(NamedTuple):
+    """目录中的一个文件"""
+    addr: int  # 信息对象地址
+    nof: int  # 文件名称
+    length: int  # 文件长度
+    sof: int  # 文件状态
+    time: int  # 文件的CP56Time2a时标(毫秒), 时标无效(如全为0)时为None
+
+
+################################ 控制站 ################################
+class FileTransfer:
+    """从被控站召唤一个文件
+
+    sink为输出端: 文件路径(由传输打开并关闭), 具有write方法的对象, 或以段为参数的可调用对象。
+    节校验和错误时, 输出端可定位(seekable)则回退至节的起始处并重新召唤该节, 至多retries次,
+    否则传输失败。传输结束(完成或失败)后调用callback(transfer), 失败原因见error。
+    """
+    def __init__(self, common_addr: int, addr: int, nof: int, sink, retries: int = 3, callback=None) -> None:
+        self.common_addr = common_addr
+        self.addr = addr
+        self.nof = nof
+        self.retries = retries
+        self.callback = callback
+        self._owned = isinstance(sink, (str, os.PathLike))
+        if self._owned:
+            sink = open(sink, 'w+b')
+        self.sink = sink
+        self._write = sink if callable(sink) else sink.write
+        self.state = 'idle'  # idle, select, file, section, finished, failed
+        self.length = None  # 文件长度, 文件准备就绪后得到
+        self.received = 0  # 已接收的字节数
+        self.section = None  # 正在接收的节名称
+        self.sections = []  # 已认可的节: (节名称, 长度, 校验和)
+        self.progress = 0  # 已处理的ASDU数, 用于判断传输是否停滞
+        self.error = None
+        self.paused = False
+        self._deferred = []  # 暂停期间推迟发送的ASDU
+        self._section_length = None
+        self._section_start = 0
+        self._section_sum = 0
+        self._file_sum = 0
+
+
+    @property
+    def key(self) -> tuple:
+        return self.common_addr, self.addr, self.nof
+
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ('finished', 'failed')
+
+
+    def start(self) -> list:
+        """开始传输, 返回待发送的ASDU(选择文件)"""
+        self.state = 'select'
+        return [self._scq(0, SCQ_SELECT_FILE)]
+
+
+    def asdu_received(self, asdu: ASDU, fields: tuple) -> list:
+        """处理属于本传输的一个信息对象, fields为其原始数值元组, 返回待发送的ASDU"""
+        if self.finished:
+            return []
+        self.progress += 1
+        type_id = asdu.type_id
+        if asdu.trans_cause.pn:
+            return self._fail('否定确认: %s' % TYPE_DESC.get(type_id, type_id), deactivate=False)
+        if type_id == F_SG_NA_1:
+            _, nos, _, segment = fields
+            if self.state == 'section' and nos == self.section:
+                self._write(segment)
+                self._section_sum = checksum(segment, self._section_sum)
+                self.received += len(segment)
+            return []
+        if type_id == F_FR_NA_1:
+            _, lof, frq = fields
+            if frq & 0b10000000:
+                return self._fail('文件未准备就绪', deactivate=False)
+            self.length = int.from_bytes(lof, 'little')
+            self.state = 'file'
+            return [self._scq(0, SCQ_CALL_FILE)]
+        if type_id == F_SR_NA_1:
+            _, nos, lof, srq = fields
+            if srq & 0b10000000:
+                return self._fail('节%d未准备就绪' % nos)
+            self.state = 'section'
+            self.section = nos
+            self._section_length = int.from_bytes(lof, 'little')
+            self._section_start = self.received
+            self._section_sum = 0
+            return self._send([self._scq(nos, SCQ_CALL_SECTION)])
+        if type_id == F_LS_NA_1:
+            _, nos, lsq, chs = fields
+            if lsq in (LSQ_SECTION, LSQ_SECTION + 1):
+                return self._section_done(nos, chs)
+            return self._file_done(chs)
+        return []
+
+
+    def _section_done(self, nos: int, chs: int) -> list:
+        length = self.received - self._section_start
+        if chs == self._section_sum and length == self._section_length:
+            self.sections.append((nos, length, chs))
+            self._file_sum = (self._file_sum + chs) & 0xff
+            return [self._afq(nos, AFQ_SECTION_OK)]
+        seekable = not callable(self.sink) and getattr(self.sink, 'seekable', lambda: False)()
+        if self.retries <= 0 or not seekable:
+            return [self._afq(nos, AFQ_SECTION_FAIL)] + self._fail('节%d校验和错误' % nos)
+        # 回退输出端, 重新召唤该节
+        self.retries -= 1
+        self.sink.seek(self._section_start)
+        self.sink.truncate()
+        self.received = self._section_start
+        self._section_sum = 0
+        return [self._afq(nos, AFQ_SECTION_FAIL), self._scq(nos, SCQ_CALL_SECTION)]
+
+
+    def _file_done(self, chs: int) -> list:
+        if chs != self._file_sum or (self.length is not None and self.received != self.length):
+            return [self._afq(0, AFQ_FILE_FAIL)] + self._fail('文件校验和错误', deactivate=False)
+        self.state = 'finished'
+        self._close()
+        return [self._afq(0, AFQ_FILE_OK)]
+
+
+    def abort(self, reason: str = '传输中止') -> list:
+        """中止传输, 返回待发送的ASDU(停止激活文件)"""
+        if self.finished:
+            return []
+        return self._fail(reason, deactivate=self.state != 'idle')
+
+
+    def _fail(self, reason: str, deactivate: bool = True) -> list:
+        self.state = 'failed'
+        self.error = reason
+        self._close()
+        return [self._scq(0, SCQ_DEACTIVATE_FILE)] if deactivate else []
+
+
+    def _close(self) -> None:
+        self._deferred.clear()
+        if self._owned:
+            self.sink.close()
+        if self.callback is not None:
+            self.callback(self)
+
+
+    ################################ 流量控制 ################################
+    def pause(self) -> None:
+        """暂缓召唤下一节, 用于输出端来不及处理时; 正在接收的节不受影响"""
+        self.paused = True
+
+
+    def resume(self) -> list:
+        """恢复召唤, 返回暂停期间推迟发送的ASDU"""
+        self.paused = False
+        deferred, self._deferred = self._deferred, []
+        return deferred
+
+
+    def _send(self, asdus: list) -> list:
+        if self.paused:
+            self._deferred.extend(asdus)
+            return []
+        return asdus
+
+
+    def _scq(self, nos: int, scq: int) -> ASDU:
+        return _asdu(F_SC_NA_1, self.common_addr, self.addr, (self.nof, nos, scq))
+
+
+    def _afq(self, nos: int, afq: int) -> ASDU:
+        return _asdu(F_AF_NA_1, self.common_addr, self.addr, (self.nof, nos, afq))
+
+
+class DirectoryRequest:
+    """召唤目录, 收到文件状态为最后目录文件的目录项后结束"""
+    def __init__(self, common_addr: int, addr: int = 0, callback=None) -> None:
+        self.common_addr = common_addr
+        self.addr = addr
+        self.callback = callback
+        self.entries = []
+        self.finished = False
+
+
+    def start(self) -> list:
+        return [_asdu(F_SC_NA_1, self.common_addr, self.addr, (0, 0, SCQ_DIRECTORY), COT_REQUEST)]
+
+
+    def asdu_received(self, asdu: ASDU) -> None:
+        for obj in asdu.info_objs:
+            nof, lof, sof, cp56time = obj.elems
+            try:
+                ms = CP56Time2a_to_ms(cp56time)
+            except ValueError:
+                ms = None
+            self.entries.append(DirectoryEntry(obj.addr, nof, int.from_bytes(lof, 'little'), sof, ms))
+            if sof & SOF_LFD:
+                self.finished = True
+        if self.finished and self.callback is not None:
+            self.callback(self)
+
+
+class FileTransfers:
+    """一个连接上进行中的文件传输及目录召唤, 分派收到的文件传输ASDU"""
+    def __init__(self) -> None:
+        self.transfers = {}  # (公共地址, 信息对象地址, 文件名称) -> FileTransfer
+        self.directories = {}  # 公共地址 -> DirectoryRequest
+
+
+    def start(self, transfer) -> list:
+        """登记并开始文件传输或目录召唤, 返回待发送的ASDU"""
+        if isinstance(transfer, DirectoryRequest):
+            registry, key = self.directories, transfer.common_addr
+        else:
+            registry, key = self.transfers, transfer.key
+        if key in registry:
+            raise FileTransferError('传输已在进行: %s' % (key, ))
+        registry[key] = transfer
+        return transfer.start()
+
+
+    def asdu_received(self, asdu: ASDU) -> list:
+        """处理收到的文件传输ASDU, 返回待发送的ASDU; 不属于任何传输的被忽略"""
+        if asdu.type_id == F_DR_TA_1:
+            directory = self.directories.get(asdu.common_addr)
+            if directory is not None:
+                directory.asdu_received(asdu)
+                if directory.finished:
+                    del self.directories[asdu.common_addr]
+            return []
+        responses = []
+        transfers = self.transfers
+        for obj in asdu.info_objs:
+            key = (asdu.common_addr, obj.addr, obj.elems[0])
+            transfer = transfers.get(key)
+            if transfer is not None:
+                responses += transfer.asdu_received(asdu, obj.elems)
+                if transfer.finished:
+                    del transfers[key]
+        return responses
+
+
+    def abort(self, transfer: FileTransfer, reason: str = '传输中止') -> list:
+        self.transfers.pop(transfer.key, None)
+        return transfer.abort(reason)
+
+
+    def abort_all(self, reason: str) -> None:
+        """连接断开时中止全部传输"""
+        for transfer in list(self.transfers.values()):
+            transfer.abort(reason)
+        self.transfers.clear()
+        self.directories.clear()
+
+
+################################ 被控站 ################################
+class _Reading:
+    """被控站一侧一个文件的发送状态"""
+    __slots__ = ('source', 'length', 'sections', 'sums', 'file_sum')
+
+    def __init__(self, source, length: int, section_size: int) -> None:
+        self.source = source  # 文件路径或bytes
+        self.length = length
+        # 节名称1~255, 节数超过255时加大节的长度
+        section_size = max(section_size, -(-length // 255))
+        self.sections = [(start, min(section_size, length - start)) for start in range(0, length, section_size)] or [(0, 0)]
+        self.sums = {}  # 节名称 -> 已发送的节的校验和
+        self.file_sum = 0
+
+
+class FileServer:
+    """被控站一侧的文件服务, 响应目录召唤及文件召唤
+
+    files为 (信息对象地址, 文件名称) -> 文件路径或bytes; 按节读取文件并分段,
+    占用的内存与节的长度有关, 与文件大小无关。
+    """
+    def __init__(self, files: dict, section_size: int = SECTION_SIZE, profile: LinkProfile = DEFAULT_PROFILE) -> None:
+        self.files = files
+        self.section_size = section_size
+        self.profile = profile
+        self.segment_size = segment_size(profile)
+        self.readings = {}  # (公共地址, 信息对象地址, 文件名称) -> _Reading
+
+
+    def _length(self, source) -> int:
+        return os.path.getsize(source) if isinstance(source, (str, os.PathLike)) else len(source)
+
+
+    def _read(self, source, start: int, size: int) -> bytes:
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                f.seek(start)
+                return f.read(size)
+        return bytes(source[start:start + size])
+
+
+    def directory(self, common_addr: int, addr: int) -> list:
+        """目录, 每个ASDU至多容纳的目录项数由ASDU的最大长度决定"""
+        items = sorted(self.files.items())
+        infos = []
+        for n, ((file_addr, nof), source) in enumerate(items):
+            if isinstance(source, (str, os.PathLike)):
+                mtime = datetime.fromtimestamp(os.path.getmtime(source), timezone.utc)
+            else:
+                mtime = datetime.now(timezone.utc)
+            sof = SOF_LFD if n == len(items) - 1 else 0
+            infos.append(InfoObj(file_addr, (nof, self._length(source).to_bytes(3, 'little'), sof, pack_CP56Time2a(mtime))))
+        if not infos:
+            return []
+        per_asdu = (MAX_ASDU_SIZE - self.profile.header.size) // (self.profile.ioa_size + 13)
+        return [ASDU(F_DR_TA_1, VSQ(len(chunk), 0), COT(COT_REQUEST, 0, 0, 0), common_addr, chunk, 'raw')
+                for chunk in (infos[i:i + per_asdu] for i in range(0, len(infos), per_asdu))]
+
+
+    def asdu_received(self, asdu: ASDU) -> list:
+        """处理收到的文件传输ASDU, 返回待发送的ASDU"""
+        obj = asdu.info_objs[0]
+        ca, addr = asdu.common_addr, obj.addr
+        if asdu.type_id == F_SC_NA_1:
+            nof, nos, scq = obj.elems
+            key = (ca, addr, nof)
+            if scq == SCQ_DIRECTORY and asdu.trans_cause.cause == COT_REQUEST:
+                return self.directory(ca, addr)
+            if scq == SCQ_SELECT_FILE:
+                source = self.files.get((addr, nof))
+                if source is None:
+                    return [_asdu(F_FR_NA_1, ca, addr, (nof, bytes(3), 0b10000000))]  # 否定确认
+                reading = self.readings[key] = _Reading(source, self._length(source), self.section_size)
+                return [_asdu(F_FR_NA_1, ca, addr, (nof, reading.length.to_bytes(3, 'little'), 0))]
+            reading = self.readings.get(key)
+            if reading is None:
+                return []
+            if scq == SCQ_CALL_FILE:
+                return [self._section_ready(ca, addr, nof, reading, 1)]
+            if scq == SCQ_CALL_SECTION and 1 <= nos <= len(reading.sections):
+                return self._segments(ca, addr, nof, reading, nos)
+            if scq == SCQ_DEACTIVATE_FILE:
+                del self.readings[key]
+            return []
+        if asdu.type_id == F_AF_NA_1:
+            nof, nos, afq = obj.elems
+            key = (ca, addr, nof)
+            reading = self.readings.get(key)
+            if reading is None:
+                return []
+            if afq & 0b1111 == AFQ_SECTION_OK:
+                reading.file_sum = (reading.file_sum + reading.sums.get(nos, 0)) & 0xff
+                if nos < len(reading.sections):
+                    return [self._section_ready(ca, addr, nof, reading, nos + 1)]
+                return [_asdu(F_LS_NA_1, ca, addr, (nof, nos, LSQ_FILE, reading.file_sum))]
+            if afq & 0b1111 in (AFQ_FILE_OK, AFQ_FILE_FAIL):
+                del self.readings[key]
+        return []
+
+
+    def _section_ready(self, ca: int, addr: int, nof: int, reading: _Reading, nos: int) -> ASDU:
+        return _asdu(F_SR_NA_1, ca, addr, (nof, nos, reading.sections[nos - 1][1].to_bytes(3, 'little'), 0))
+
+
+    def _segments(self, ca: int, addr: int, nof: int, reading: _Reading, nos: int) -> list:
+        start, size = reading.sections[nos - 1]
+        data = self._read(reading.source, start, size)
+        step = self.segment_size
+        asdus = [_asdu(F_SG_NA_1, ca, addr, (nof, nos, len(segment), segment))
+                 for segment in (data[i:i + step] for i in range(0, len(data), step))]
+        chs = reading.sums[nos] = checksum(data)
+        asdus.append(_asdu(F_LS_NA_1, ca, addr, (nof, nos, LSQ_SECTION, chs)))
+        return asdus
@@ -0,0 +1,130 @@
+# 本模块将收发的原始报文以二进制记录写入环形缓冲文件, 用于事后分析, 可直接运行查看:
+#   python frametrace.py station.trace
+# 文件由文件头及固定大小的槽组成, 以mmap写入, 写满后覆盖最早的记录;
+# 进程异常退出时已写入映射内存的记录仍保留在文件中。
+import mmap
+import os
+import time
+from datetime import datetime
+from struct import Struct
+
+from iec_types import *
+
+
+SLOTS = 1 << 16  # 缺省槽数
+IN, OUT = 0, 1  # 接收, 发送
+DIRECTIONS = ('<-', '->')
+
+_MAGIC = b'I104TRC1'
+_HEAD = Struct('<8sIIQ')  # 标志, 槽大小, 槽数, 已写入的记录总数
+_RECORD = Struct('<qBH')  # 时间(ns), 方向, 报文长度
+SLOT_SIZE = _RECORD.size + 255  # 报文最长255字节, 更长的数据被截断
+
+
+class FrameTrace:
+    """报文记录的环形缓冲文件
+
+    文件已存在且槽数相同时接续写入, 否则重新创建。
+    """
+    def __init__(self, path: str, slots: int = SLOTS) -> None:
+        self.path = path
+        self.slots = slots
+        size = _HEAD.size + slots * SLOT_SIZE
+        self._file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        resume = os.fstat(self._file.fileno()).st_size == size
+        if not resume:
+            self._file.truncate(size)
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        magic, slot_size, count, written = _HEAD.unpack_from(self._mmap)
+        if not resume or (magic, slot_size, count) != (_MAGIC, SLOT_SIZE, slots):
+            written = 0
+            _HEAD.pack_into(self._mmap, 0, _MAGIC, SLOT_SIZE, slots, 0)
+        self.written = written  # 已写入的记录总数
+
+
+    def write(self, direction: int, frame) -> None:
+        """写入一条记录, frame为一个完整报文"""
+        offset = _HEAD.size + self.written % self.slots * SLOT_SIZE
+        length = len(frame)
+        _RECORD.pack_into(self._mmap, offset, time.time_ns(), direction, length)
+        offset += _RECORD.size
+        if length > 255:
+            frame, length = frame[:255], 255
+        self._mmap[offset:offset + length] = frame
+        self.written += 1
+        _HEAD.pack_into(self._mmap, 0, _MAGIC, SLOT_SIZE, self.slots, self.written)
+
+
+    def received(self, frame) -> None:
+        self.write(IN, frame)
+
+
+    def sent(self, frame) -> None:
+        self.write(OUT, frame)
+
+
+    def flush(self) -> None:
+        self._mmap.flush()
+
+
+    def close(self) -> None:
+        if not self._mmap.closed:
+            self._mmap.close()
+        self._file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_trace(path: str) -> iter:
+    """自最早至最新逐个生成记录的(时间(ns), 方向, 报文)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, slot_size, slots, written = _HEAD.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError('不是报文记录文件')
+    first = max(written - slots, 0)
+    for n in range(first, written):
+        offset = _HEAD.size + n % slots * slot_size
+        ns, direction, length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        yield ns, direction, data[offset:offset + min(length, slot_size - _RECORD.size)]
+
+
+class LazyFrame:
+    """报文的可读描述, 仅在格式化为字符串时才解析, 用于日志参数"""
+    __slots__ = ('data', 'profile')
+
+    def __init__(self, data, profile: LinkProfile = DEFAULT_PROFILE) -> None:
+        self.data = data
+        self.profile = profile
+
+
+    def __str__(self) -> str:
+        from unpack import unpack_apdu
+        try:
+            return str(unpack_apdu(bytes(self.data), profile=self.profile))
+        except Exception as exc:  # 记录日志时不因报文错误而中断
+            return '%s (%s: %r)' % (bytes(self.data).hex(' '), type(exc).__name__, exc)
+
+
+def main(argv: list = None) -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description='查看报文记录文件')
+    parser.add_argument('trace')
+    parser.add_argument('--raw', action='store_true', help='只输出十六进制报文, 不解析')
+    parser.add_argument('--profile', default='2,2,3', help='系统参数"传送原因,公共地址,信息对象地址"的字节数')
+    args = parser.parse_args(argv)
+    profile = LinkProfile(*map(int, args.profile.split(',')))
+    for ns, direction, frame in read_trace(args.trace):
+        stamp = datetime.fromtimestamp(ns / 1e9).isoformat(timespec='microseconds')
+        print(stamp, DIRECTIONS[direction], frame.hex(' ') if args.raw else LazyFrame(frame, profile))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,181 @@
 # 本模块定义了远动设备系统传输协议集各个层次数据的一般抽象
+from enum import IntFlag
+from struct import Struct
+from typing import NamedTuple
+
 from data import *
 
 
+################################ 品质描述词 ################################
+# 品质描述词以整型位域保存, 各位含义见GB/T 18657.4-2002 7.2.6
+class SIQ(IntFlag):
+    """带品质描述词的单点信息"""
+    SPI = 0b1
+    BL = 0b10000
+    SB = 0b100000
+    NT = 0b1000000
+    IV = 0b10000000
+
+
+class DIQ(IntFlag):
+    """带品质描述词的双点信息, DPI: 0/3 不确定, 1 确定状态开, 2 确定状态合"""
+    DPI_OFF = 0b1
+    DPI_ON = 0b10
+    BL = 0b10000
+    SB = 0b100000
+    NT = 0b1000000
+    IV = 0b10000000
+
+
+class QDS(IntFlag):
+    """品质描述词"""
+    OV = 0b1
+    BL = 0b10000
+    SB = 0b100000
+    NT = 0b1000000
+    IV = 0b10000000
+
+
+class QDP(IntFlag):
+    """继电保护设备事件的品质描述词"""
+    EI = 0b1000
+    BL = 0b10000
+    SB = 0b100000
+    NT = 0b1000000
+    IV = 0b10000000
+
+
+class SEP(IntFlag):
+    """继电保护设备单个事件, ES: 0/3 不确定, 1 确定状态开, 2 确定状态合"""
+    ES_OFF = 0b1
+    ES_ON = 0b10
+    EI = 0b1000
+    BL = 0b10000
+    SB = 0b100000
+    NT = 0b1000000
+    IV = 0b10000000
+
+
+################################ 系统参数 ################################
+class LinkProfile:
+    """一条连接的系统参数: 传送原因、公共地址及信息对象地址的字节数
+
+    数据单元标识符的预编译结构在构造时一次生成, 解析与打包时无须再按字节数分支,
+    不同参数的连接可在同一进程中同时解析。
+    """
+    __slots__ = ('cot_size', 'ca_size', 'ioa_size', 'header', 'unpack_header', 'pack_header_into')
+
+    def __init__(self, cot_size: int = TRANS_CAUSE_SIZE, ca_size: int = COMMON_ADDR_SIZE, ioa_size: int = INFO_ADDR_SIZE) -> None:
+        if cot_size not in (1, 2) or ca_size not in (1, 2) or ioa_size not in (1, 2, 3):
+            raise ValueError('不支持的系统参数: COT %s, CA %s, IOA %s' % (cot_size, ca_size, ioa_size))
+        self.cot_size = cot_size  # 传送原因的字节数
+        self.ca_size = ca_size  # 公共地址的字节数
+        self.ioa_size = ioa_size  # 信息对象地址的字节数
+        # 数据单元标识符: 类型标识, 可变结构限定词, 传送原因, (源发者地址), 公共地址
+        header = self.header = Struct('<BBB' + ('B' if cot_size == 2 else '') + ('H' if ca_size == 2 else 'B'))
+        unpack_from, pack_into, size = header.unpack_from, header.pack_into, header.size
+        # unpack_header(data, offset) -> (类型标识, 可变结构限定词, 传送原因, 源发者地址, 公共地址)
+        # pack_header_into(buf, offset, 类型标识, 可变结构限定词, 传送原因, 源发者地址, 公共地址) -> 写入后的偏移量
+        if cot_size == 2:
+            def pack_header_into(buf, offset, type_id, vsq, cot, source_addr, common_addr):
+                pack_into(buf, offset, type_id, vsq, cot, source_addr or 0, common_addr)
+                return offset + size
+            self.unpack_header = unpack_from
+        else:
+            def pack_header_into(buf, offset, type_id, vsq, cot, source_addr, common_addr):
+                pack_into(buf, offset, type_id, vsq, cot, common_addr)
+                return offset + size
+            def unpack_header(data, offset=0):
+                type_id, vsq, cot, common_addr = unpack_from(data, offset)
+                return type_id, vsq, cot, None, common_addr  # 无源发者地址
+            self.unpack_header = unpack_header
+        self.pack_header_into = pack_header_into
+
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, LinkProfile) and (self.cot_size, self.ca_size, self.ioa_size) == (other.cot_size, other.ca_size, other.ioa_size)
+
+
+    def __hash__(self) -> int:
+        return hash((self.cot_size, self.ca_size, self.ioa_size))
+
+
+    def __repr__(self) -> str:
+        return 'LinkProfile(cot_size=%s, ca_size=%s, ioa_size=%s)' % (self.cot_size, self.ca_size, self.ioa_size)
+
+
+DEFAULT_PROFILE = LinkProfile()  # 由data模块中的默认系统参数生成
+
+
+################################ 数据单元 ################################
+class VSQ(NamedTuple):
+    """Variable Structure Qualifier"""
+    info_objs_total_number: int  # 信息对象个数
+    is_sq: int  # 信息对象是否为序列
+
+
+class COT(NamedTuple):
+    """Cause of Transmission"""
+    cause: int  # 传送原因
+    pn: int  # 肯定确认(0)或否定确认(1)
+    t: int  # 未实验(0)或实验(1)
+    source_addr: int = None  # 源发者地址, 仅当传送原因为两个字节时存在
+
+
+    @property
+    def desc(self) -> str:
+        return TRANS_CAUSE_DESC.get(self.cause, '')
+
+
+class InfoObj(NamedTuple):
+    """Information object"""
+    addr: int  # 信息对象地址
+    elems: object  # 信息元素集
+
+
+class InfoObjColumns:
+    """按列存储的信息对象序列: 基地址及连续的值数组与品质描述词数组"""
+    __slots__ = ('addr', 'values', 'quality')
+
+    def __init__(self, addr: int, values, quality) -> None:
+        self.addr = addr  # 信息对象地址（基地址）
+        self.values = values  # 值数组
+        self.quality = quality  # 品质描述词数组(QDS原始字节)
+
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+    def __repr__(self) -> str:
+        return 'InfoObjColumns(addr=%s, n=%s)' % (self.addr, len(self.values))
+
+
 class ASDU:
     """Application Service Data Unit"""
-    def __init__(self, type_id: int, vsq: dict, trans_cause: dict, common_addr: int, info_objs: list) -> None:
+    __slots__ = ('type_id', 'vsq', 'trans_cause', 'common_addr', 'info_objs', 'mode')
+
+    def __init__(self, type_id: int, vsq: VSQ, trans_cause: COT, common_addr: int, info_objs: list, mode: str = 'full') -> None:
         self.type_id = type_id  # Type identification
         self.vsq = vsq  # Variable Structure Qualifier
         self.trans_cause = trans_cause  # Cause of Transmission
         self.common_addr = common_addr  # Common address
         self.info_objs = info_objs  # Information objects
+        self.mode = mode  # 信息元素解析模式: 'full' 可读描述, 'raw' 原始数值
+
+
+    def describe(self):
+        """信息对象的可读描述, 'raw'模式下在此时才生成"""
+        if self.mode != 'raw' or isinstance(self.info_objs, InfoObjColumns):
+            return self.info_objs
+        from unpack import describe_info_elems
+        return [InfoObj(obj.addr, describe_info_elems(self.type_id, obj.elems)) for obj in self.info_objs]
 
 
 class APDU:
     """Application Protocol Data Unit"""
+    __slots__ = ('format', 'action', 'send', 'recv', 'asdu')
+
     def __init__(self, format: str, action: str, send: int = 0, recv: int = 0, asdu: ASDU or None = None) -> None:
         assert format in ('I', 'S', 'U')
         assert action in (U_ACTIONS + ('TRANSMIT', 'MONITOR'))
@@ -29,17 +191,17 @@ class APDU:
     def __str__(self) -> str:
         if self.format == 'I':
             if self.asdu.info_objs:
-                return 'I(%s, %s): \nTYPE: %s\nVSQ : %s\nCOT : %s\nOBJS: %s\n' % (
-                    self.send, 
-                    self.recv, 
-                    TYPE_DESC[self.asdu.type_id], 
-                    self.asdu.vsq, 
-                    self.asdu.trans_cause, 
-                    self.asdu.info_objs)
+                return 'I(%s, %s): \nTYPE: %s\nVSQ : %s\nCOT : %s %s\nOBJS: %s\n' % (
+                    self.send,
+                    self.recv,
+                    TYPE_DESC[self.asdu.type_id],
+                    self.asdu.vsq,
+                    self.asdu.trans_cause.desc,
+                    self.asdu.trans_cause,
+                    self.asdu.describe())
             else:
                 return 'I(%s, %s)' % (self.send, self.recv)
         elif self.format == 'S':
             return 'S(%s)' % self.recv
         elif self.format == 'U':
             return 'U(%s)' % self.action
-
@@ -0,0 +1,371 @@
+# 本模块为过程映像: 保存每个信息点(公共地址, 信息对象地址)最新的值、品质描述词及时间,
+# 按类型族以连续数组存储, 以字典索引信息点所在的槽位, 更新时就地写入数组。
+import time
+from array import array
+from math import isnan
+from operator import itemgetter
+from typing import NamedTuple
+
+try:
+    import numpy
+except ImportError:  # numpy为可选依赖, 缺失时死区比较退化为逐点循环
+    numpy = None
+
+from data import *
+from iec_types import *
+from unpack import CP56Time2a_to_ms
+
+
+class Family:
+    """一个类型族的信息点存储: 值数组、品质描述词数组及时间数组共用槽位"""
+    __slots__ = ('name', 'values', 'quality', 'times', 'keys')
+
+    def __init__(self, name: str, typecode: str) -> None:
+        self.name = name
+        self.values = array(typecode)  # 值
+        self.quality = array('B')  # 品质描述词(原始字节)
+        self.times = array('q')  # 时标或接收时间(毫秒)
+        self.keys = array('Q')  # 槽位 -> 信息点键
+
+
+    def allocate(self, key: int) -> int:
+        """为新的信息点分配槽位"""
+        self.values.append(0)
+        self.quality.append(0)
+        self.times.append(0)
+        self.keys.append(key)
+        return len(self.keys) - 1
+
+
+    def snapshot(self) -> 'Family':
+        """全部数组的副本"""
+        copy = Family(self.name, self.values.typecode)
+        copy.values, copy.quality, copy.times, copy.keys = self.values[:], self.quality[:], self.times[:], self.keys[:]
+        return copy
+
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+def _sign7(data: int) -> int:
+    """带瞬变状态指示的值: 七位有符号整型"""
+    return (data & 0b111111) - (data & 0b1000000)
+
+
+def _bcr_value(data: bytes) -> int:
+    return int.from_bytes(data[:4], 'little', signed=True)
+
+
+def _bcr_quality(data: bytes) -> int:
+    """二进制计数器读数的进位(CY)、计数量被调整(CA)及无效(IV)位, 不含每次读数都变化的顺序号"""
+    return data[4] & 0b11100000
+
+
+def _nva(fields: tuple) -> float:
+    return fields[0] / 32768
+
+
+_first = itemgetter(0)
+_second = itemgetter(1)
+_zero = lambda fields: 0
+
+
+"""类型族 -> 值数组的类型码"""
+FAMILIES = {
+    'SP': 'b',  # 单点信息
+    'DP': 'b',  # 双点信息
+    'ST': 'b',  # 步位置信息
+    'BO': 'L',  # 32比特串
+    'ME': 'd',  # 测量值
+    'IT': 'q',  # 累计量
+}
+
+"""类型标识 -> (类型族, 值, 品质描述词, CP56Time2a时标的序号), 值与品质描述词由'raw'模式的原始数值元组求得"""
+POINT_TYPES = {
+    M_SP_NA_1: ('SP', lambda fields: fields[0] & 0b1, lambda fields: fields[0] & 0b11110000, None),
+    M__SP__TA__1: ('SP', lambda fields: fields[0] & 0b1, lambda fields: fields[0] & 0b11110000, None),
+    M__SP__TB__1: ('SP', lambda fields: fields[0] & 0b1, lambda fields: fields[0] & 0b11110000, 1),
+    M__DP__NA__1: ('DP', lambda fields: fields[0] & 0b11, lambda fields: fields[0] & 0b11110000, None),
+    M__DP__TA__1: ('DP', lambda fields: fields[0] & 0b11, lambda fields: fields[0] & 0b11110000, None),
+    M__DP__TB__1: ('DP', lambda fields: fields[0] & 0b11, lambda fields: fields[0] & 0b11110000, 1),
+    # 步位置的瞬变状态记入品质描述词的第2位(QDS中该位保留)
+    M__ST__NA__1: ('ST', lambda fields: _sign7(fields[0]), lambda fields: fields[1] | (fields[0] & 0b10000000) >> 6, None),
+    M__ST__TA__1: ('ST', lambda fields: _sign7(fields[0]), lambda fields: fields[1] | (fields[0] & 0b10000000) >> 6, None),
+    M__ST__TB__1: ('ST', lambda fields: _sign7(fields[0]), lambda fields: fields[1] | (fields[0] & 0b10000000) >> 6, 2),
+    M__BO__NA__1: ('BO', _first, _second, None),
+    M__BO__TA__1: ('BO', _first, _second, None),
+    M__BO__TB__1: ('BO', _first, _second, 2),
+    M__ME__NA__1: ('ME', _nva, _second, None),
+    M__ME__TA__1: ('ME', _nva, _second, None),
+    M__ME__TD__1: ('ME', _nva, _second, 2),
+    M__ME__NB__1: ('ME', _first, _second, None),
+    M__ME__TB__1: ('ME', _first, _second, None),
+    M__ME__TE__1: ('ME', _first, _second, 2),
+    M__ME__NC__1: ('ME', _first, _second, None),
+    M__ME__TC__1: ('ME', _first, _second, None),
+    M__ME__TF__1: ('ME', _first, _second, 2),
+    M__ME__ND__1: ('ME', _nva, _zero, None),
+    M__IT__NA__1: ('IT', lambda fields: _bcr_value(fields[0]), lambda fields: _bcr_quality(fields[0]), None),
+    M__IT__TA__1: ('IT', lambda fields: _bcr_value(fields[0]), lambda fields: _bcr_quality(fields[0]), None),
+    M__IT__TB__1: ('IT', lambda fields: _bcr_value(fields[0]), lambda fields: _bcr_quality(fields[0]), 1),
+}
+
+
+################################ 变化订阅 ################################
+class Deadband(NamedTuple):
+    """死区: 值的变化须超出绝对死区及上次上报值的百分比死区才上报, 均为0时任何变化都上报"""
+    absolute: float = 0.0
+    percent: float = 0.0
+
+
+class Change(NamedTuple):
+    """上报的信息点变化"""
+    common_addr: int
+    addr: int
+    value: object
+    quality: int
+    time: int
+
+
+class _SubscriptionState:
+    """一个订阅在一个类型族上的状态, 与类型族共用槽位"""
+    __slots__ = ('reported', 'reported_quality', 'absolute', 'percent')
+
+    def __init__(self) -> None:
+        self.reported = array('d')  # 上次上报的值
+        self.reported_quality = array('h')  # 上次上报的品质描述词, -1为尚未上报
+        self.absolute = array('d')  # 逐点绝对死区, NaN为采用类型死区
+        self.percent = array('d')  # 逐点百分比死区, NaN为采用类型死区
+
+
+    def grow(self, size: int) -> None:
+        missing = size - len(self.reported)
+        if missing > 0:
+            self.reported.extend(array('d', bytes(8 * missing)))
+            self.reported_quality.extend(array('h', [-1]) * missing)
+            self.absolute.extend(array('d', [float('nan')]) * missing)
+            self.percent.extend(array('d', [float('nan')]) * missing)
+
+
+class Subscription:
+    """变化订阅
+
+    每个ASDU更新过程映像后, 将其中各信息点的值与上次上报值比较,
+    仅品质描述词变化或值的变化超出死区的信息点被上报, 一个ASDU至多回调一次:
+    callback(type_id, changes), changes为Change列表。
+    安装numpy时一个ASDU的死区比较以数组运算完成。
+    """
+    def __init__(self, image: 'ProcessImage', callback, type_ids=None, common_addrs=None,
+                 deadband: Deadband = Deadband(), type_deadbands: dict = None) -> None:
+        self.image = image
+        self.callback = callback
+        self.type_ids = None if type_ids is None else frozenset(type_ids)  # 订阅的类型标识, None为全部
+        self.common_addrs = None if common_addrs is None else frozenset(common_addrs)  # 订阅的公共地址, None为全部
+        self.deadband = deadband  # 缺省死区
+        self.type_deadbands = dict(type_deadbands or {})  # 类型标识 -> 死区
+        self.states = {}  # 类型族名 -> _SubscriptionState
+        self.reported = 0  # 已上报的信息点数
+
+
+    def _state(self, family: Family) -> _SubscriptionState:
+        state = self.states.get(family.name)
+        if state is None:
+            state = self.states[family.name] = _SubscriptionState()
+        state.grow(len(family))
+        return state
+
+
+    def set_deadband(self, common_addr: int, addr: int, type_id: int, deadband: Deadband) -> None:
+        """设置单个信息点的死区, 优先于类型死区"""
+        family = self.image.families[POINT_TYPES[type_id][0]]
+        slot = self.image.slot(family, ProcessImage.key(common_addr, addr))
+        state = self._state(family)
+        state.absolute[slot], state.percent[slot] = deadband
+
+
+    def wants(self, type_id: int, common_addr: int) -> bool:
+        return ((self.type_ids is None or type_id in self.type_ids)
+                and (self.common_addrs is None or common_addr in self.common_addrs))
+
+
+    def check(self, family: Family, type_id: int, common_addr: int, slots) -> list:
+        """比较已更新的槽位, 上报超出死区的变化, 返回上报的变化"""
+        state = self._state(family)
+        absolute, percent = self.type_deadbands.get(type_id, self.deadband)
+        if numpy is not None:
+            changed = self._changed_numpy(family, state, slots, absolute, percent)
+        else:
+            changed = self._changed(family, state, slots, absolute, percent)
+        if not changed:
+            return changed
+        values, quality, times, keys = family.values, family.quality, family.times, family.keys
+        reported, reported_quality = state.reported, state.reported_quality
+        changes = []
+        for slot in changed:
+            value = values[slot]
+            reported[slot] = value
+            reported_quality[slot] = quality[slot]
+            changes.append(Change(common_addr, keys[slot] & 0xffffff, value, quality[slot], times[slot]))
+        self.reported += len(changes)
+        self.callback(type_id, changes)
+        return changes
+
+
+    @staticmethod
+    def _changed(family: Family, state: _SubscriptionState, slots, absolute: float, percent: float) -> list:
+        values, quality = family.values, family.quality
+        reported, reported_quality = state.reported, state.reported_quality
+        point_absolute, point_percent = state.absolute, state.percent
+        changed = []
+        for slot in slots:
+            old = reported[slot]
+            delta = abs(values[slot] - old)
+            if quality[slot] != reported_quality[slot]:
+                changed.append(slot)
+                continue
+            a, p = point_absolute[slot], point_percent[slot]
+            if isnan(a):
+                a, p = absolute, percent
+            if delta > a and delta > p / 100 * abs(old):
+                changed.append(slot)
+        return changed
+
+
+    @staticmethod
+    def _changed_numpy(family: Family, state: _SubscriptionState, slots, absolute: float, percent: float) -> list:
+        index = numpy.asarray(slots, dtype=numpy.intp)
+        new = numpy.frombuffer(family.values, dtype=family.values.typecode)[index].astype(numpy.float64)
+        old = numpy.frombuffer(state.reported, dtype=numpy.float64)[index]
+        point_absolute = numpy.frombuffer(state.absolute, dtype=numpy.float64)[index]
+        point_percent = numpy.frombuffer(state.percent, dtype=numpy.float64)[index]
+        default = numpy.isnan(point_absolute)
+        a = numpy.where(default, absolute, point_absolute)
+        p = numpy.where(default, percent, point_percent)
+        delta = numpy.abs(new - old)
+        changed = ((numpy.frombuffer(family.quality, dtype=numpy.uint8)[index] != numpy.frombuffer(state.reported_quality, dtype=numpy.int16)[index])
+                   | ((delta > a) & (delta > p / 100 * numpy.abs(old))))
+        return index[changed].tolist()
+
+
+class ProcessImage:
+    """过程映像
+
+    信息点键为 公共地址 << 24 | 信息对象地址, 由字典映射至(类型族, 槽位)。
+    信息点首次出现时分配槽位, 此后的更新只写入数组, 不再分配对象。
+    读取可直接访问各类型族的数组, 或由snapshot()取得一致的副本。
+    """
+    def __init__(self) -> None:
+        self.families = {name: Family(name, typecode) for name, typecode in FAMILIES.items()}
+        self.index = {}  # 信息点键 -> (类型族, 槽位)
+        self._sq_slots = {}  # (类型族, 公共地址, 基地址, 个数) -> 按列更新时各信息对象的槽位
+        self.updates = 0  # 已更新的信息点数
+        self.invalid_times = 0  # 时标无效而以接收时间代替的信息点数
+        self.subscriptions = []
+
+
+    def subscribe(self, callback, type_ids=None, common_addrs=None, deadband: Deadband = Deadband(), type_deadbands: dict = None) -> Subscription:
+        """订阅信息点的显著变化, 参数见Subscription"""
+        subscription = Subscription(self, callback, type_ids, common_addrs, deadband, type_deadbands)
+        self.subscriptions.append(subscription)
+        return subscription
+
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.remove(subscription)
+
+
+    @staticmethod
+    def key(common_addr: int, addr: int) -> int:
+        return common_addr << 24 | addr
+
+
+    def slot(self, family: Family, key: int) -> int:
+        """信息点在family中的槽位, 不存在或类型族改变时分配"""
+        entry = self.index.get(key)
+        if entry is not None and entry[0] is family:
+            return entry[1]
+        slot = family.allocate(key)
+        self.index[key] = (family, slot)
+        return slot
+
+
+    def define(self, common_addr: int, addr: int, type_id: int) -> None:
+        """预先登记信息点"""
+        self.slot(self.families[POINT_TYPES[type_id][0]], self.key(common_addr, addr))
+
+
+    def update(self, asdu: ASDU, now: int = None) -> int:
+        """以'raw'模式的ASDU更新过程映像, 返回更新的信息点数; 非监视方向的过程信息被忽略"""
+        point_type = POINT_TYPES.get(asdu.type_id)
+        if point_type is None:
+            return 0
+        if asdu.mode != 'raw':
+            raise ValueError("仅支持'raw'模式的ASDU")
+        name, value_of, quality_of, tag = point_type
+        family = self.families[name]
+        values, quality, times = family.values, family.quality, family.times
+        if now is None:
+            now = time.time_ns() // 1000000
+        common_addr = asdu.common_addr
+        info_objs = asdu.info_objs
+        if isinstance(info_objs, InfoObjColumns):
+            slots = self._update_columns(family, common_addr, info_objs, now)
+        else:
+            base = common_addr << 24
+            index, slot_of = self.index, self.slot
+            slots = []
+            for addr, fields in info_objs:
+                entry = index.get(base | addr)
+                slot = entry[1] if entry is not None and entry[0] is family else slot_of(family, base | addr)
+                values[slot] = value_of(fields)
+                quality[slot] = quality_of(fields)
+                if tag is None:
+                    times[slot] = now
+                else:
+                    try:
+                        times[slot] = CP56Time2a_to_ms(fields[tag])
+                    except ValueError:  # 时标无效(如月份为0)时以接收时间代替
+                        times[slot] = now
+                        self.invalid_times += 1
+                slots.append(slot)
+        self.updates += len(slots)
+        for subscription in self.subscriptions:
+            if subscription.wants(asdu.type_id, common_addr):
+                subscription.check(family, asdu.type_id, common_addr, slots)
+        return len(slots)
+
+
+    def _update_columns(self, family: Family, common_addr: int, columns: InfoObjColumns, now: int) -> array:
+        """按列更新测量值序列, 同一序列的槽位只解析一次, 返回各信息对象的槽位"""
+        count = len(columns)
+        cache_key = (family.name, common_addr, columns.addr, count)
+        slots = self._sq_slots.get(cache_key)
+        if slots is None:
+            base = common_addr << 24
+            slots = self._sq_slots[cache_key] = array('L', [self.slot(family, base | (columns.addr + i)) for i in range(count)])
+        values, quality, times = family.values, family.quality, family.times
+        for slot, value, qds in zip(slots, columns.values, columns.quality):
+            values[slot] = value
+            quality[slot] = qds
+            times[slot] = now
+        return slots
+
+
+    def get(self, common_addr: int, addr: int) -> tuple:
+        """信息点的(值, 品质描述词, 时间), 不存在时引发KeyError"""
+        family, slot = self.index[common_addr << 24 | addr]
+        return family.values[slot], family.quality[slot], family.times[slot]
+
+
+    def __contains__(self, point: tuple) -> bool:
+        return self.key(*point) in self.index
+
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+    def snapshot(self) -> dict:
+        """各类型族数组的副本, 类型族 -> Family"""
+        return {name: family.snapshot() for name, family in self.families.items()}
@@ -0,0 +1,181 @@
+# 本模块由报文推断连接的系统参数(传送原因、公共地址及信息对象地址的字节数)
+# 对每个I格式报文, 由APCI的长度字节、可变结构限定词中的信息对象个数及信息元素集的字节数,
+# 排除与报文长度不符的候选参数; 剩余多个候选时按公共地址的合理性及常用程度取舍。
+from data import *
+from iec_types import *
+from unpack import INFO_ELEM_LAYOUTS
+
+
+"""候选系统参数(传送原因, 公共地址, 信息对象地址的字节数), 按常用程度排列"""
+CANDIDATES = tuple(LinkProfile(*sizes) for sizes in (
+    (2, 2, 3),  # IEC 60870-5-104 标准配置
+    (1, 1, 2),  # IEC 60870-5-101 常用配置
+    (1, 2, 2),
+    (2, 2, 2),
+    (1, 2, 3),
+    (2, 1, 3),
+    (1, 1, 3),
+    (2, 1, 2),
+    (1, 1, 1),
+    (1, 2, 1),
+    (2, 1, 1),
+    (2, 2, 1),
+))
+_ALL = (1 << len(CANDIDATES)) - 1
+
+# 信息元素集的字节数, 长度可变的类型不参与推断
+_ELEM_SIZES = {type_id: layout.size for type_id, layout in INFO_ELEM_LAYOUTS.items() if layout.size is not None}
+
+# 信息对象序列: 报文长度只确定 传送原因 + 公共地址 + 信息对象地址 的总字节数
+_SQ_MASKS = {}
+# 信息对象集合: (信息对象地址的字节数, 传送原因 + 公共地址的字节数) -> 候选位图
+_SET_MASKS = {}
+for _i, _profile in enumerate(CANDIDATES):
+    _head = _profile.cot_size + _profile.ca_size
+    _SQ_MASKS[_head + _profile.ioa_size] = _SQ_MASKS.get(_head + _profile.ioa_size, 0) | (1 << _i)
+    _SET_MASKS[_profile.ioa_size, _head] = _SET_MASKS.get((_profile.ioa_size, _head), 0) | (1 << _i)
+
+
+def candidate_mask(data) -> int:
+    """一个ASDU(不含APCI)可能采用的候选系统参数位图, 无法判断时返回全部候选"""
+    elem_size = _ELEM_SIZES.get(data[0])
+    number = data[1] & 0b1111111
+    if elem_size is None or not number:
+        return _ALL
+    length = len(data) - 2  # 除去类型标识及可变结构限定词
+    if data[1] & 0b10000000:
+        return _SQ_MASKS.get(length - number * elem_size, 0)
+    return (_SET_MASKS.get((1, length - number * (1 + elem_size)), 0)
+            | _SET_MASKS.get((2, length - number * (2 + elem_size)), 0)
+            | _SET_MASKS.get((3, length - number * (3 + elem_size)), 0))
+
+
+def _suspicious(profile: LinkProfile, head: bytes) -> int:
+    """以profile解析出的公共地址是否可疑: 0为未用值, 两字节时低位为0多为错位"""
+    common_addr = int.from_bytes(head[2 + profile.cot_size:2 + profile.cot_size + profile.ca_size], 'little')
+    return common_addr == 0 or (profile.ca_size == 2 and not common_addr & 0xFF)
+
+
+class LinkAnalyzer:
+    """一条连接的系统参数推断器
+
+    每帧仅做几次字典查找与位运算。已判定后继续检查每一帧,
+    与判定结果不符的帧计入mismatches, 可用于发现参数漂移或配置变更。
+    """
+    def __init__(self, frames: int = 16, samples: int = 16) -> None:
+        self.frames = frames  # 判定所需的有效帧数
+        self.samples = samples  # 保留用于取舍的报文头个数
+        self.seen = 0  # 参与推断的帧数
+        self.rejected = 0  # 与全部候选均不符而被忽略的帧数
+        self.mismatches = 0  # 判定后与判定结果不符的帧数
+        self._mask = _ALL
+        self._heads = []  # 数据单元标识符样本
+        self._profile = None
+        self._bit = 0
+
+
+    def feed_asdu(self, data) -> bool:
+        """输入一个ASDU(不含APCI), 返回其是否与当前推断结果相符"""
+        mask = candidate_mask(data)
+        if self._profile is not None:
+            if mask & self._bit:
+                return True
+            self.mismatches += 1
+            return False
+        if mask == _ALL:
+            return True
+        if not mask & self._mask:
+            self.rejected += 1
+            return False
+        self._mask &= mask
+        self.seen += 1
+        if len(self._heads) < self.samples:
+            self._heads.append(bytes(data[:7]))
+        if self.seen >= self.frames:
+            self._profile = self.best()
+            self._bit = 1 << CANDIDATES.index(self._profile)
+        return True
+
+
+    def feed(self, data) -> None:
+        """输入一段完整报文组成的比特流, 其中的I格式报文参与推断"""
+        view = memoryview(data)
+        end = len(view)
+        offset = 0
+        while offset + APCI_SIZE <= end:
+            if view[offset] != 0x68:
+                offset += 1
+                continue
+            pack_end = offset + view[offset + 1] + 2
+            if pack_end > end:
+                break
+            if not view[offset + 2] & 0b1 and pack_end > offset + APCI_SIZE:
+                self.feed_asdu(view[offset + APCI_SIZE:pack_end])
+            offset = pack_end
+
+
+    @property
+    def candidates(self) -> list:
+        """与全部有效帧相符的候选系统参数"""
+        return [profile for i, profile in enumerate(CANDIDATES) if self._mask >> i & 1]
+
+
+    def best(self):
+        """当前最可能的系统参数, 尚无相符的候选时返回None"""
+        candidates = self.candidates
+        if not candidates:
+            return None
+        return min(candidates, key=lambda profile: (
+            sum(_suspicious(profile, head) for head in self._heads),
+            len({head[2 + profile.cot_size:2 + profile.cot_size + profile.ca_size] for head in self._heads}),
+            CANDIDATES.index(profile)))
+
+
+    @property
+    def profile(self):
+        """已判定的系统参数, 有效帧数不足时为None"""
+        return self._profile
+
+
+    @property
+    def ambiguous(self) -> bool:
+        """剩余多个候选, 判定结果依赖取舍规则"""
+        return self._mask & (self._mask - 1) != 0
+
+
+class ProfileCache:
+    """按对端缓存推断出的系统参数"""
+    def __init__(self, frames: int = 16) -> None:
+        self.frames = frames
+        self.analyzers = {}  # 对端 -> LinkAnalyzer
+
+
+    def analyzer(self, peer) -> LinkAnalyzer:
+        analyzer = self.analyzers.get(peer)
+        if analyzer is None:
+            analyzer = self.analyzers[peer] = LinkAnalyzer(self.frames)
+        return analyzer
+
+
+    def feed(self, peer, data) -> None:
+        self.analyzer(peer).feed(data)
+
+
+    def get(self, peer, default: LinkProfile = DEFAULT_PROFILE) -> LinkProfile:
+        """对端的系统参数, 尚未判定时返回default"""
+        analyzer = self.analyzers.get(peer)
+        if analyzer is None or analyzer.profile is None:
+            return default
+        return analyzer.profile
+
+
+    def drifted(self) -> dict:
+        """判定后出现不符帧的对端 -> 不符帧数"""
+        return {peer: analyzer.mismatches for peer, analyzer in self.analyzers.items() if analyzer.mismatches}
+
+
+def infer_profile(data, frames: int = 16):
+    """由一段录波数据推断系统参数, 有效帧不足frames个时按已有帧取舍, 无相符候选时返回None"""
+    analyzer = LinkAnalyzer(frames)
+    analyzer.feed(data)
+    return analyzer.profile or analyzer.best()
@@ -0,0 +1,200 @@
+# 本模块为运行指标: 按类型标识统计帧数、信息点数及解析耗时直方图,
+# 按连接统计收发字节数、帧数、解析耗时及顺序错误次数, 通过可替换的输出端导出。
+# 分帧器及站的metrics属性缺省为None, 未启用时每帧只多一次是否为None的检查。
+import os
+import socket
+from array import array
+from bisect import bisect_left
+
+from iec_types import *
+
+
+"""解析耗时直方图的桶上限(纳秒), 最后一个桶为+Inf"""
+DECODE_BUCKETS = (1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000, 500000, 1000000)
+
+
+class TypeMetrics:
+    """一个类型标识的计数"""
+    __slots__ = ('frames', 'points', 'decode_ns', 'buckets')
+
+    def __init__(self, buckets: int) -> None:
+        self.frames = 0
+        self.points = 0
+        self.decode_ns = 0
+        self.buckets = array('Q', bytes(8 * buckets))  # 各桶的计数(非累计)
+
+
+class ConnectionMetrics:
+    """一个连接的计数, 由Metrics.connection()创建, 传递给站或分帧器"""
+    __slots__ = ('name', 'registry', 'bytes_in', 'bytes_out', 'frames_in', 'frames_out', 'decode_ns', 'seq_errors')
+
+    def __init__(self, name, registry: 'Metrics') -> None:
+        self.name = name
+        self.registry = registry
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.frames_in = 0
+        self.frames_out = 0
+        self.decode_ns = 0
+        self.seq_errors = 0  # 接收或确认序号错误的次数
+
+
+    def observe(self, apdu: APDU, ns: int) -> None:
+        """记录解析完成的一帧及其解析耗时"""
+        self.frames_in += 1
+        self.decode_ns += ns
+        if apdu.asdu is not None:
+            self.registry.observe(apdu.asdu, ns)
+
+
+    def sent(self, size: int) -> None:
+        self.frames_out += 1
+        self.bytes_out += size
+
+
+    def as_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.__slots__[2:]}
+
+
+class Metrics:
+    """运行指标的登记处
+
+    snapshot()返回全部计数的副本, export()将其交给各输出端(sinks)。
+    """
+    def __init__(self, buckets: tuple = DECODE_BUCKETS, sinks: list = None) -> None:
+        self.bucket_bounds = tuple(buckets)
+        self.types = {}  # 类型标识 -> TypeMetrics
+        self.connections = {}  # 连接名 -> ConnectionMetrics
+        self.sinks = list(sinks or [])
+
+
+    def connection(self, name) -> ConnectionMetrics:
+        """名为name的连接的计数, 重连时沿用同一对象"""
+        metrics = self.connections.get(name)
+        if metrics is None:
+            metrics = self.connections[name] = ConnectionMetrics(name, self)
+        return metrics
+
+
+    def observe(self, asdu: ASDU, ns: int) -> None:
+        stats = self.types.get(asdu.type_id)
+        if stats is None:
+            stats = self.types[asdu.type_id] = TypeMetrics(len(self.bucket_bounds) + 1)
+        stats.frames += 1
+        stats.points += asdu.vsq.info_objs_total_number
+        stats.decode_ns += ns
+        stats.buckets[bisect_left(self.bucket_bounds, ns)] += 1
+
+
+    def snapshot(self) -> dict:
+        """全部计数的副本: {'types': {类型标识: {...}}, 'connections': {连接名: {...}}, 'buckets': 桶上限}"""
+        return {
+            'buckets': self.bucket_bounds,
+            'types': {type_id: {
+                'frames': stats.frames,
+                'points': stats.points,
+                'decode_ns': stats.decode_ns,
+                'buckets': list(stats.buckets),
+            } for type_id, stats in self.types.items()},
+            'connections': {name: metrics.as_dict() for name, metrics in self.connections.items()},
+        }
+
+
+    def export(self) -> dict:
+        """将快照交给全部输出端, 返回快照"""
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink.emit(snapshot)
+        return snapshot
+
+
+################################ 输出端 ################################
+class PrometheusSink:
+    """Prometheus文本格式, path非空时写入文件(供node_exporter的textfile收集器读取), 最近一次的文本保存于text"""
+    def __init__(self, path: str = None, prefix: str = 'iec104') -> None:
+        self.path = path
+        self.prefix = prefix
+        self.text = ''
+
+
+    def emit(self, snapshot: dict) -> str:
+        p = self.prefix
+        lines = []
+        for name, help_text in (('frames', '接收的I格式报文数'), ('points', '接收的信息对象数')):
+            lines.append('# HELP %s_%s_total %s' % (p, name, help_text))
+            lines.append('# TYPE %s_%s_total counter' % (p, name))
+            for type_id, stats in sorted(snapshot['types'].items()):
+                lines.append('%s_%s_total{type_id="%d"} %d' % (p, name, type_id, stats[name]))
+        lines.append('# HELP %s_decode_seconds 报文解析耗时' % p)
+        lines.append('# TYPE %s_decode_seconds histogram' % p)
+        bounds = ['%g' % (bound / 1e9) for bound in snapshot['buckets']] + ['+Inf']
+        for type_id, stats in sorted(snapshot['types'].items()):
+            count = 0
+            for bound, n in zip(bounds, stats['buckets']):
+                count += n
+                lines.append('%s_decode_seconds_bucket{type_id="%d",le="%s"} %d' % (p, type_id, bound, count))
+            lines.append('%s_decode_seconds_sum{type_id="%d"} %g' % (p, type_id, stats['decode_ns'] / 1e9))
+            lines.append('%s_decode_seconds_count{type_id="%d"} %d' % (p, type_id, count))
+        for key in ('bytes_in', 'bytes_out', 'frames_in', 'frames_out', 'seq_errors'):
+            lines.append('# TYPE %s_connection_%s_total counter' % (p, key))
+            for name, metrics in snapshot['connections'].items():
+                lines.append('%s_connection_%s_total{connection="%s"} %d' % (p, key, _label(name), metrics[key]))
+        lines.append('# TYPE %s_connection_decode_seconds_total counter' % p)
+        for name, metrics in snapshot['connections'].items():
+            lines.append('%s_connection_decode_seconds_total{connection="%s"} %g' % (p, _label(name), metrics['decode_ns'] / 1e9))
+        self.text = '\n'.join(lines) + '\n'
+        if self.path:
+            # 先写临时文件再改名, 收集器不会读到写了一半的文件
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(self.text)
+            os.replace(self.path + '.tmp', self.path)
+        return self.text
+
+
+def _label(name) -> str:
+    if isinstance(name, tuple):
+        name = ':'.join(map(str, name))  # (主机, 端口)
+    return str(name).replace('\\', '\\\\').replace('"', '\\"')
+
+
+class StatsdSink:
+    """statsd协议(UDP), 计数以两次导出之间的增量发送"""
+    def __init__(self, host: str = '127.0.0.1', port: int = 8125, prefix: str = 'iec104', packet_size: int = 1400) -> None:
+        self.address = (host, port)
+        self.prefix = prefix
+        self.packet_size = packet_size
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._last = {}  # 指标名 -> 上次导出的值
+
+
+    def emit(self, snapshot: dict) -> list:
+        """发送增量不为0的计数, 返回发送的行"""
+        p = self.prefix
+        values = {}
+        for type_id, stats in snapshot['types'].items():
+            values['%s.type.%d.frames' % (p, type_id)] = stats['frames']
+            values['%s.type.%d.points' % (p, type_id)] = stats['points']
+            values['%s.type.%d.decode_us' % (p, type_id)] = stats['decode_ns'] // 1000
+        for name, metrics in snapshot['connections'].items():
+            label = _label(name).replace('.', '_').replace(':', '_')
+            for key in ('bytes_in', 'bytes_out', 'frames_in', 'frames_out', 'seq_errors'):
+                values['%s.connection.%s.%s' % (p, label, key)] = metrics[key]
+        lines = []
+        for name, value in values.items():
+            delta = value - self._last.get(name, 0)
+            if delta:
+                lines.append('%s:%d|c' % (name, delta))
+        self._last = values
+        packet = ''
+        for line in lines:
+            if packet and len(packet) + len(line) + 1 > self.packet_size:
+                self.sock.sendto(packet.encode(), self.address)
+                packet = ''
+            packet = packet + '\n' + line if packet else line
+        if packet:
+            self.sock.sendto(packet.encode(), self.address)
+        return lines
+
+
+    def close(self) -> None:
+        self.sock.close()
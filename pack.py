@@ -0,0 +1,127 @@
+# 本模块将结构化数据打包为二进制数据包, 与unpack模块互逆
+# 信息元素须为'raw'模式下的原始数值元组, 打包时直接写入预先分配的bytearray
+from struct import Struct
+
+from data import *
+from iec_types import *
+from unpack import COLUMNAR_LAYOUTS, INFO_ELEM_LAYOUTS, SEGMENT_HEAD
+
+
+_APCI = Struct('<BBHH')  # 起始字符, 长度, 控制域
+
+
+################################ 数值打包 ################################
+# 7.2.6.18
+def pack_CP56Time2a(dt) -> bytes:
+    """打包 七个八位位组二进制时间, dt为datetime"""
+    return bytes((
+        *(dt.second * 1000 + dt.microsecond // 1000).to_bytes(2, 'little'),
+        dt.minute,
+        dt.hour,
+        dt.day | (dt.isoweekday() << 5),
+        dt.month,
+        dt.year % 100,
+    ))
+
+
+################################ 结构打包 ################################
+def pack_addr_into(buf: bytearray, offset: int, addr: int, size: int) -> int:
+    """写入一或多个字节的小端地址, 返回写入后的偏移量"""
+    end = offset + size
+    buf[offset:end] = addr.to_bytes(size, 'little')
+    return end
+
+
+def pack_info_elems_into(buf: bytearray, offset: int, type_id: int, fields: tuple) -> int:
+    """写入一个类型标识为type_id的信息元素集, 返回写入后的偏移量"""
+    layout = INFO_ELEM_LAYOUTS[type_id]
+    if layout.struct is None:
+        # 7.3.6.6 段, 长度可变
+        nof, nos, los, segment = fields
+        SEGMENT_HEAD.pack_into(buf, offset, nof, nos, los)
+        offset += SEGMENT_HEAD.size
+        end = offset + len(segment)
+        buf[offset:end] = segment
+        return end
+    layout.struct.pack_into(buf, offset, *fields)
+    return offset + layout.size
+
+
+def pack_info_obj_columns_into(buf: bytearray, offset: int, type_id: int, columns: InfoObjColumns, profile: LinkProfile = DEFAULT_PROFILE) -> int:
+    """写入按列存储的测量值序列, 返回写入后的偏移量"""
+    scale = COLUMNAR_LAYOUTS[type_id][3]
+    layout = COLUMNAR_LAYOUTS[type_id][2]
+    offset = pack_addr_into(buf, offset, columns.addr, profile.ioa_size)
+    for value, quality in zip(columns.values, columns.quality):
+        layout.pack_into(buf, offset, round(value / scale) if scale else value, quality)
+        offset += layout.size
+    return offset
+
+
+def pack_info_objs_into(buf: bytearray, offset: int, type_id: int, is_sq: int, info_objs, profile: LinkProfile = DEFAULT_PROFILE) -> int:
+    """写入信息对象集合或序列, 返回写入后的偏移量"""
+    ioa_size = profile.ioa_size
+    if isinstance(info_objs, InfoObjColumns):
+        return pack_info_obj_columns_into(buf, offset, type_id, info_objs, profile)
+    if is_sq:
+        # 序列仅写入首个信息对象的地址作为基地址
+        if info_objs:
+            offset = pack_addr_into(buf, offset, info_objs[0].addr, ioa_size)
+        for obj in info_objs:
+            offset = pack_info_elems_into(buf, offset, type_id, obj.elems)
+    else:
+        for obj in info_objs:
+            offset = pack_addr_into(buf, offset, obj.addr, ioa_size)
+            offset = pack_info_elems_into(buf, offset, type_id, obj.elems)
+    return offset
+
+
+def pack_asdu_into(buf: bytearray, offset: int, asdu: ASDU, profile: LinkProfile = DEFAULT_PROFILE) -> int:
+    """将ASDU写入buf的offset处, 返回写入后的偏移量"""
+    if asdu.mode != 'raw':
+        raise ValueError("仅支持打包'raw'模式的信息元素")
+    vsq, cot = asdu.vsq, asdu.trans_cause
+    offset = profile.pack_header_into(
+        buf, offset,
+        asdu.type_id,
+        vsq.info_objs_total_number | (0b10000000 if vsq.is_sq else 0),
+        cot.cause | (cot.pn << 6) | (cot.t << 7),
+        cot.source_addr,
+        asdu.common_addr)
+    return pack_info_objs_into(buf, offset, asdu.type_id, vsq.is_sq, asdu.info_objs, profile)
+
+
+def pack_apci_into(buf: bytearray, offset: int, format: str, action: str = '', send: int = 0, recv: int = 0, length: int = 4) -> int:
+    """写入APCI, length为控制域与ASDU的总字节数, 返回写入后的偏移量"""
+    if format == 'I':
+        _APCI.pack_into(buf, offset, 0x68, length, send << 1, recv << 1)
+    elif format == 'S':
+        _APCI.pack_into(buf, offset, 0x68, 4, 0b01, recv << 1)
+    elif format == 'U':
+        _APCI.pack_into(buf, offset, 0x68, 4, (1 << (U_ACTIONS.index(action) + 2)) | 0b11, 0)
+    else:
+        raise ValueError('未知的帧格式: %s' % format)
+    return offset + APCI_SIZE
+
+
+def pack_apdu_into(buf: bytearray, offset: int, apdu: APDU, profile: LinkProfile = DEFAULT_PROFILE) -> int:
+    """将APDU写入buf的offset处, 返回写入后的偏移量"""
+    if apdu.format != 'I':
+        return pack_apci_into(buf, offset, apdu.format, apdu.action, apdu.send, apdu.recv)
+    # 先写入ASDU, 再根据其长度回填APCI
+    end = pack_asdu_into(buf, offset + APCI_SIZE, apdu.asdu, profile)
+    if end - offset - 2 > 253:
+        raise ValueError('APDU长度超过253字节')
+    pack_apci_into(buf, offset, 'I', send=apdu.send, recv=apdu.recv, length=end - offset - 2)
+    return end
+
+
+################################ 便捷接口 ################################
+def pack_asdu(asdu: ASDU, profile: LinkProfile = DEFAULT_PROFILE) -> bytes:
+    buf = bytearray(255)
+    return bytes(buf[:pack_asdu_into(buf, 0, asdu, profile)])
+
+
+def pack_apdu(apdu: APDU, profile: LinkProfile = DEFAULT_PROFILE) -> bytes:
+    buf = bytearray(255)
+    return bytes(buf[:pack_apdu_into(buf, 0, apdu, profile)])
@@ -0,0 +1,214 @@
+# 本模块回放录波装置保存的原始IEC104比特流(非pcap), 文件以mmap映射后就地分帧,
+# 不将整个文件读入内存。可生成稀疏的偏移量索引并保存为旁路文件(.idx),
+# 按帧序号或时间定位时先二分查找索引, 再从最近的索引点逐帧跳转。
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+from struct import Struct
+
+from data import *
+from iec_types import *
+from unpack import INFO_ELEM_LAYOUTS, CP56Time2a_to_ms, unpack_apdu
+
+
+STRIDE = 1024  # 每隔多少帧记录一个索引点
+NO_TIME = -(1 << 63)  # 尚未出现时标
+
+_INDEX_MAGIC = b'I104IDX1'
+_INDEX_HEAD = Struct('<8sQQQQ')  # 标志, 数据文件字节数, 数据文件修改时间(ns), 索引间隔, 总帧数
+
+# 信息元素集末尾带CP56Time2a时标的类型 -> 时标在信息元素集中的偏移量
+_TIME_TAGS = {
+    type_id: layout.size - 7
+    for type_id, layout in INFO_ELEM_LAYOUTS.items()
+    if layout.struct is not None and layout.struct.format.endswith('7s')
+}
+
+
+class DumpReader:
+    """原始比特流录波文件的回放器
+
+    报文在文件映射上就地解析, 延迟解析的ASDU引用映射内存,
+    因此须在释放全部解析结果后再调用close()。
+    帧时间取该帧或其之前最近一个I格式报文中首个信息对象的CP56Time2a时标。
+    """
+    def __init__(self, path: str, columnar: bool = False, lazy: bool = True, mode: str = 'raw',
+                 profile: LinkProfile = DEFAULT_PROFILE, stride: int = STRIDE) -> None:
+        self.path = path
+        self.columnar = columnar
+        self.lazy = lazy
+        self.mode = mode
+        self.profile = profile
+        self.stride = stride
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.view = memoryview(self._mmap)
+        # 稀疏索引: 第i个索引点为第i*stride帧的(偏移量, 该帧时间)
+        self.offsets = None
+        self.times = None
+        self.frames = None  # 总帧数
+
+
+    def close(self) -> None:
+        try:
+            self.view.release()
+            if self._mmap:
+                self._mmap.close()
+        except BufferError:
+            pass  # 仍有解析结果引用映射内存, 由垃圾回收释放
+        self._file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    ################################ 分帧 ################################
+    def spans(self, offset: int = 0) -> iter:
+        """从offset起逐个生成完整报文的(起始偏移量, 结束偏移量), 非起始字符被跳过"""
+        view = self.view
+        end = len(view)
+        while offset + 2 <= end:
+            if view[offset] != 0x68:
+                offset += 1
+                continue
+            pack_end = offset + view[offset + 1] + 2
+            if pack_end > end:
+                return
+            yield offset, pack_end
+            offset = pack_end
+
+
+    def frame_time(self, offset: int, end: int) -> int:
+        """报文的CP56Time2a时标(毫秒), 无时标或时标无效(如全为0)时返回None"""
+        view = self.view
+        if view[offset + 2] & 0b1 or end - offset <= APCI_SIZE:
+            return None
+        tag = _TIME_TAGS.get(view[offset + APCI_SIZE])
+        if tag is None:
+            return None
+        tag += offset + APCI_SIZE + self.profile.header.size + self.profile.ioa_size
+        if tag + 7 > end:
+            return None
+        try:
+            return CP56Time2a_to_ms(view, tag)
+        except ValueError:
+            return None
+
+
+    def _unpack(self, offset: int, end: int) -> APDU:
+        return unpack_apdu(self.view[offset:end], self.columnar, self.lazy, self.mode, self.profile)
+
+
+    def __iter__(self) -> iter:
+        for offset, end in self.spans():
+            yield self._unpack(offset, end)
+
+
+    ################################ 索引 ################################
+    @property
+    def index_path(self) -> str:
+        return self.path + '.idx'
+
+
+    def build_index(self, save: bool = True) -> None:
+        """遍历文件生成稀疏索引, save为真时写入旁路文件"""
+        stride = self.stride
+        offsets, times = array('q'), array('q')
+        last = NO_TIME
+        count = 0
+        frame_time = self.frame_time
+        for offset, end in self.spans():
+            ms = frame_time(offset, end)
+            if ms is not None and ms > last:
+                last = ms  # 索引中的时间取累计最大值, 以保证有序
+            if not count % stride:
+                offsets.append(offset)
+                times.append(last)
+            count += 1
+        self.offsets, self.times, self.frames = offsets, times, count
+        if save:
+            stat = os.stat(self.path)
+            with open(self.index_path, 'wb') as f:
+                f.write(_INDEX_HEAD.pack(_INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, stride, count))
+                offsets.tofile(f)
+                times.tofile(f)
+
+
+    def load_index(self) -> bool:
+        """读取旁路索引文件, 文件不存在或与数据文件不符时返回False"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                magic, size, mtime, stride, count = _INDEX_HEAD.unpack(f.read(_INDEX_HEAD.size))
+                stat = os.stat(self.path)
+                if magic != _INDEX_MAGIC or (size, mtime) != (stat.st_size, stat.st_mtime_ns):
+                    return False
+                points = (count + stride - 1) // stride
+                offsets, times = array('q'), array('q')
+                offsets.fromfile(f, points)
+                times.fromfile(f, points)
+        except (OSError, EOFError, ValueError):
+            return False
+        self.stride, self.offsets, self.times, self.frames = stride, offsets, times, count
+        return True
+
+
+    def index(self) -> None:
+        """读取旁路索引, 不可用时重新生成"""
+        if self.offsets is None and not self.load_index():
+            self.build_index()
+
+
+    def __len__(self) -> int:
+        self.index()
+        return self.frames
+
+
+    ################################ 定位 ################################
+    def seek_frame(self, number: int) -> int:
+        """第number帧的起始偏移量"""
+        self.index()
+        if not 0 <= number < self.frames:
+            raise IndexError('帧序号超出范围')
+        point = number // self.stride
+        skip = number - point * self.stride
+        for offset, _ in self.spans(self.offsets[point]):
+            if not skip:
+                return offset
+            skip -= 1
+
+
+    def __getitem__(self, number: int) -> APDU:
+        offset = self.seek_frame(number % len(self) if number < 0 else number)
+        return self._unpack(offset, offset + self.view[offset + 1] + 2)
+
+
+    def from_frame(self, number: int) -> iter:
+        """自第number帧起逐个生成APDU"""
+        for offset, end in self.spans(self.seek_frame(number)):
+            yield self._unpack(offset, end)
+
+
+    def between(self, start: int, stop: int = None) -> iter:
+        """逐个生成帧时间在[start, stop)毫秒之间的APDU, 帧时间须大致递增"""
+        self.index()
+        point = max(bisect_left(self.times, start) - 1, 0)
+        if point >= len(self.offsets):
+            return
+        last = self.times[point]
+        frame_time = self.frame_time
+        for offset, end in self.spans(self.offsets[point]):
+            ms = frame_time(offset, end)
+            if ms is not None and ms > last:
+                last = ms
+            if last < start:
+                continue
+            if stop is not None and last >= stop:
+                return
+            yield self._unpack(offset, end)
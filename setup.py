@@ -0,0 +1,22 @@
+# 将解析热点_speedups编译为扩展模块(可选), 在源码目录下运行:
+#   python setup.py build_ext --inplace
+# 需安装Cython或mypy(mypyc), 优先使用Cython; 设置环境变量IEC104_BUILD=mypyc时使用mypyc。
+# 生成的扩展模块与_speedups.py同目录, 导入时优先于纯Python源码被加载, 见unpack._load_speedups。
+import os
+
+from setuptools import Extension, setup
+
+
+def speedups_extensions() -> list:
+    if os.environ.get('IEC104_BUILD') == 'mypyc':
+        from mypyc.build import mypycify
+        return mypycify(['_speedups.py'])
+    try:
+        from Cython.Build import cythonize
+    except ImportError:
+        raise SystemExit('编译_speedups需安装Cython(pip install cython)或mypy(IEC104_BUILD=mypyc)')
+    # 源码目录含__init__.py, 须显式指定模块名, 否则被视为包内模块
+    return cythonize([Extension('_speedups', ['_speedups.py'])], language_level=3)
+
+
+setup(name='iec104-speedups', py_modules=[], ext_modules=speedups_extensions())
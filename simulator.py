@@ -0,0 +1,406 @@
+# 本模块为被控站(从站)模拟器, 用于主站的负载测试及基准测试, 可直接运行:
+#   python simulator.py --port 2404 --points 1000 --rate 13=20000 --rate 22=100
+# 监听端口并响应STARTDT/STOPDT/TESTFR、总召唤、计数量召唤、时钟同步、命令及文件传输,
+# 按各类型标识设定的速率(信息点/秒)随机改变信息点并以突发(自发)方式上送。
+import argparse
+import asyncio
+import random
+from bisect import bisect_right
+from datetime import datetime, timezone
+from itertools import accumulate
+
+from data import *
+from iec_types import *
+from aiostation import AsyncStation
+from filetransfer import FILE_TYPES, SECTION_SIZE, FileServer
+from image import POINT_TYPES
+from pack import pack_CP56Time2a
+from unpack import INFO_ELEM_LAYOUTS
+
+
+PORT = 2404
+TICK = 0.01  # 产生突发数据的周期(秒)
+QUEUE_LIMIT = 1024  # 每个连接排队待发送的ASDU上限, 超出时丢弃突发数据
+MAX_ASDU_SIZE = 249  # APDU最大长度253减去控制域
+
+COMMAND_TYPES = (C__SC__NA__1, C__DC__NA__1, C__RC__NA__1, C__SE__NA__1, C__SE__NB__1, C__SE__NC__1)
+
+
+################################ 信息元素 ################################
+def _time_tag(type_id: int) -> int:
+    """信息元素集末尾时标的字节数: 7为CP56Time2a, 3为CP24Time2a, 0为不带时标"""
+    fmt = INFO_ELEM_LAYOUTS[type_id].struct.format
+    return 7 if fmt.endswith('7s') else 3 if fmt.endswith('3s') else 0
+
+
+def _default_fields(type_id: int) -> tuple:
+    """信息点的初始值(不含时标)"""
+    fmt = INFO_ELEM_LAYOUTS[type_id].struct.format.lstrip('<')
+    if _time_tag(type_id):
+        fmt = fmt[:-2]
+    if POINT_TYPES.get(type_id, ('', ))[0] == 'DP' or type_id in (M__EP__TA__1, M__EP__TD__1):
+        return (0b01, ) + (0, ) * (len(fmt) - 1)  # 确定状态的开
+    return tuple(bytes(5) if code == '5' else 0.0 if code == 'f' else 0 for code in fmt.replace('5s', '5'))
+
+
+def _bcr_next(elems: tuple, rng) -> tuple:
+    counter = (int.from_bytes(elems[0][:4], 'little', signed=True) + rng.randrange(1, 100)) & 0xffffffff
+    return (counter.to_bytes(4, 'little') + bytes(((elems[0][4] + 1) & 0b11111, )), )
+
+
+def _nva_next(elems: tuple, rng) -> tuple:
+    return (max(-32768, min(32767, elems[0] + rng.randrange(-256, 257))), ) + elems[1:]
+
+
+"""类型族 -> 信息点变化后的值(不含时标), 由原值与随机数发生器求得"""
+_NEXT_FIELDS = {
+    'SP': lambda elems, rng: (elems[0] ^ 0b1, ),
+    'DP': lambda elems, rng: (elems[0] ^ 0b11, ),
+    'ST': lambda elems, rng: ((elems[0] + 1) & 0b111111, elems[1]),
+    'BO': lambda elems, rng: (rng.getrandbits(32), elems[1]),
+    'IT': _bcr_next,
+    'EP': lambda elems, rng: (elems[0] ^ 0b11, rng.randrange(60000)) if len(elems) == 2
+          else (rng.getrandbits(4), elems[1], rng.randrange(60000)),
+}
+
+
+def _next_fields(type_id: int):
+    family = POINT_TYPES[type_id][0] if type_id in POINT_TYPES else 'EP'
+    if family != 'ME':
+        return _NEXT_FIELDS[family]
+    if INFO_ELEM_LAYOUTS[type_id].struct.format.startswith('<f'):
+        return lambda elems, rng: (elems[0] + rng.gauss(0, 1), ) + elems[1:]
+    return _nva_next
+
+
+"""可模拟的监视方向类型标识"""
+MONITOR_TYPES = tuple(sorted(set(POINT_TYPES) | {
+    M__EP__TA__1, M__EP__TB__1, M__EP__TC__1, M__EP__TD__1, M__EP__TE__1, M__EP__TF__1}))
+
+
+################################ 信息点数据库 ################################
+class _Points:
+    """一个(公共地址, 类型标识)下的信息点, 地址与值(不含时标)按序号对应"""
+    __slots__ = ('addrs', 'fields', 'index')
+
+    def __init__(self) -> None:
+        self.addrs = []
+        self.fields = []
+        self.index = {}  # 信息对象地址 -> 序号
+
+
+class PointDatabase:
+    """被控站的信息点数据库
+
+    公共地址为None的信息点在任意公共地址下召唤时都会上送, 用于模拟多个相同的被控站;
+    其突发ASDU的公共地址亦为None, 由各连接以主站召唤过的公共地址分别上送。
+    """
+    def __init__(self, seed: int = 0, profile: LinkProfile = DEFAULT_PROFILE) -> None:
+        self.groups = {}  # (公共地址, 类型标识) -> _Points
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self._types = {}  # 类型标识 -> (各组, 各组信息点数的累计值), 用于随机选取信息点
+
+
+    def add(self, common_addr: int, type_id: int, addr: int, fields: tuple = None) -> None:
+        """添加或更新信息点, fields为'raw'模式的原始数值(不含时标)"""
+        if type_id not in MONITOR_TYPES:
+            raise ValueError('不支持模拟的类型标识: %s' % type_id)
+        points = self.groups.get((common_addr, type_id))
+        if points is None:
+            points = self.groups[common_addr, type_id] = _Points()
+        fields = _default_fields(type_id) if fields is None else tuple(fields)
+        i = points.index.get(addr)
+        if i is None:
+            points.index[addr] = len(points.addrs)
+            points.addrs.append(addr)
+            points.fields.append(fields)
+        else:
+            points.fields[i] = fields
+        self._types.pop(type_id, None)
+
+
+    def add_range(self, common_addr: int, type_id: int, start: int, count: int, fields: tuple = None) -> None:
+        """添加地址连续的count个信息点"""
+        for addr in range(start, start + count):
+            self.add(common_addr, type_id, addr, fields)
+
+
+    def get(self, common_addr: int, type_id: int, addr: int) -> tuple:
+        points = self.groups[common_addr, type_id]
+        return points.fields[points.index[addr]]
+
+
+    def __len__(self) -> int:
+        return sum(len(points.addrs) for points in self.groups.values())
+
+
+    def _max_objs(self, type_id: int, is_sq: int) -> int:
+        """一个ASDU可容纳的信息对象个数"""
+        space = MAX_ASDU_SIZE - self.profile.header.size
+        size = INFO_ELEM_LAYOUTS[type_id].size
+        if is_sq:
+            return min(127, (space - self.profile.ioa_size) // size)
+        return min(127, space // (self.profile.ioa_size + size))
+
+
+    def _asdus(self, type_id: int, cot: COT, common_addr: int, info_objs: list, is_sq: int = 0) -> list:
+        step = self._max_objs(type_id, is_sq)
+        return [ASDU(type_id, VSQ(len(chunk), is_sq), cot, common_addr, chunk, 'raw')
+                for chunk in (info_objs[i:i + step] for i in range(0, len(info_objs), step))]
+
+
+    def respond(self, common_addr: int, cot: COT, type_ids=None, time_tag: bytes = None) -> list:
+        """公共地址下全部(或type_ids中的)信息点当前值组成的ASDU, 地址连续的以序列上送"""
+        time_tag = time_tag or pack_CP56Time2a(datetime.now(timezone.utc))
+        asdus = []
+        for (ca, type_id), points in self.groups.items():
+            if ca not in (common_addr, None) or (type_ids is not None and type_id not in type_ids):
+                continue
+            tag = _time_tag(type_id)
+            suffix = (time_tag[:tag], ) if tag else ()
+            order = sorted(range(len(points.addrs)), key=points.addrs.__getitem__)
+            run, singles = [], []
+            for i in order:
+                obj = InfoObj(points.addrs[i], points.fields[i] + suffix)
+                if run and obj.addr != run[-1].addr + 1:
+                    if len(run) > 1:
+                        asdus += self._asdus(type_id, cot, common_addr, run, 1)
+                    else:
+                        singles += run
+                    run = []
+                run.append(obj)
+            if len(run) > 1:
+                asdus += self._asdus(type_id, cot, common_addr, run, 1)
+            else:
+                singles += run
+            asdus += self._asdus(type_id, cot, common_addr, singles)
+        return asdus
+
+
+    def change(self, type_id: int, count: int, time_tag: bytes = None) -> list:
+        """随机改变count个类型为type_id的信息点, 返回上送变化的突发ASDU, 任意公共地址的信息点其公共地址为None"""
+        selection = self._types.get(type_id)
+        if selection is None:
+            groups = [(ca, points) for (ca, t), points in self.groups.items() if t == type_id and points.addrs]
+            selection = self._types[type_id] = (groups, list(accumulate(len(points.addrs) for _, points in groups)))
+        groups, totals = selection
+        if not groups or count <= 0:
+            return []
+        rng, next_fields = self.rng, _next_fields(type_id)
+        tag = _time_tag(type_id)
+        suffix = ((time_tag or pack_CP56Time2a(datetime.now(timezone.utc)))[:tag], ) if tag else ()
+        changed = {}  # 公共地址 -> 信息对象
+        for n in rng.choices(range(totals[-1]), k=count):
+            g = bisect_right(totals, n)
+            ca, points = groups[g]
+            i = n - (totals[g - 1] if g else 0)
+            fields = points.fields[i] = next_fields(points.fields[i], rng)
+            changed.setdefault(ca, []).append(InfoObj(points.addrs[i], fields + suffix))
+        cot = COT(3, 0, 0, 0)
+        return [asdu for ca, info_objs in changed.items() for asdu in self._asdus(type_id, cot, ca, info_objs)]
+
+
+################################ 被控站 ################################
+class SimulatedStation(AsyncStation):
+    """被控站模拟器的一个连接, 应用功能由所属Simulator的信息点数据库实现"""
+    def __init__(self, simulator: 'Simulator', *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.simulator = simulator
+        self.started = False  # 是否已启动数据传输
+        self.dropped = 0  # 因发送队列已满而丢弃的突发ASDU数
+        self.common_addrs = set()  # 主站召唤过的公共地址, 任意公共地址的信息点以这些地址突发上送
+        self.files = FileServer(simulator.files, simulator.section_size, self.profile)
+
+
+    def connection_made(self, transport) -> None:
+        super().connection_made(transport)
+        self.simulator.stations.append(self)
+
+
+    def connection_lost(self, exc) -> None:
+        super().connection_lost(exc)
+        if self in self.simulator.stations:
+            self.simulator.stations.remove(self)
+
+
+    def apdu_received(self, apdu: APDU) -> None:
+        if apdu.action == 'STARTDT ACTIVATE':
+            self.started = True
+        elif apdu.action == 'STOPDT ACTIVATE':
+            self.started = False
+        super().apdu_received(apdu)
+
+
+    def send_spontaneous(self, asdus: list) -> None:
+        """发送突发ASDU, 未启动数据传输时忽略, 排队过多时丢弃
+
+        公共地址为None的ASDU以主站召唤过的各公共地址分别发送, 尚未召唤时不发送。
+        """
+        if not self.started or self.transport is None:
+            return
+        if len(self._pending) >= self.simulator.queue_limit:
+            self.dropped += len(asdus)
+            return
+        for asdu in asdus:
+            if asdu.common_addr is not None:
+                self.send_asdu(asdu)
+                continue
+            for ca in self.common_addrs:
+                self.send_asdu(ASDU(asdu.type_id, asdu.vsq, asdu.trans_cause, ca, asdu.info_objs, 'raw'))
+
+
+    def _reply(self, asdu: ASDU, cause: int, pn: int = 0) -> None:
+        """以原ASDU的信息对象回复镜像报文"""
+        self.send_asdu(ASDU(asdu.type_id, asdu.vsq, COT(cause, pn, 0, asdu.trans_cause.source_addr),
+                            asdu.common_addr, asdu.info_objs, 'raw'))
+
+
+    def asdu_received(self, asdu: ASDU) -> None:
+        database = self.simulator.database
+        type_id, ca = asdu.type_id, asdu.common_addr
+        if type_id in FILE_TYPES:
+            for response in self.files.asdu_received(asdu):
+                self.send_asdu(response)
+        elif asdu.trans_cause.cause not in (6, 8):
+            self._reply(asdu, 45, 1)  # 未知的传送原因
+        elif type_id == C__IC__NA__1:
+            qoi = asdu.info_objs[0].elems[0]
+            asdus = database.respond(ca, COT(qoi, 0, 0, 0)) if qoi == 20 else []
+            if qoi == 20 and not asdus and not any(key[0] in (ca, None) for key in database.groups):
+                self._reply(asdu, 46, 1)  # 未知的公共地址
+                return
+            self.common_addrs.add(ca)
+            self._reply(asdu, 7)
+            for response in asdus:
+                self.send_asdu(response)
+            self._reply(asdu, 10)
+        elif type_id == C__CI__NA__1:
+            self.common_addrs.add(ca)
+            self._reply(asdu, 7)
+            for response in database.respond(ca, COT(37, 0, 0, 0), (M__IT__NA__1, M__IT__TA__1, M__IT__TB__1)):
+                self.send_asdu(response)
+            self._reply(asdu, 10)
+        elif type_id == C_CS_NA_1 or type_id in COMMAND_TYPES:
+            self._reply(asdu, 7 if asdu.trans_cause.cause == 6 else 9)
+            if type_id in COMMAND_TYPES and asdu.trans_cause.cause == 6:
+                self._reply(asdu, 10)
+        else:
+            self._reply(asdu, 44, 1)  # 未知的类型标识
+
+
+class Simulator:
+    """被控站模拟器: 监听端口, 每个连接共用同一信息点数据库
+
+    rates为 类型标识 -> 每秒改变并上送的信息点数, 每个周期(tick秒)按速率累计后
+    改变相应个数的信息点, 所得突发ASDU发送给所有已启动数据传输的连接。
+    files为可召唤的文件 (信息对象地址, 文件名称) -> 文件路径或bytes, 见FileServer。
+    """
+    def __init__(self, database: PointDatabase, rates: dict = None, host: str = '127.0.0.1', port: int = 0,
+                 tick: float = TICK, queue_limit: int = QUEUE_LIMIT, files: dict = None, section_size: int = SECTION_SIZE,
+                 **station_kwargs) -> None:
+        self.database = database
+        self.files = dict(files or {})
+        self.section_size = section_size
+        self.rates = dict(rates or {})
+        self.host = host
+        self.port = port  # 为0时由系统分配, 启动后更新为实际端口
+        self.tick = tick
+        self.queue_limit = queue_limit
+        self.station_kwargs = station_kwargs  # 传递给SimulatedStation的参数, 如t1/t2/t3/k/w
+        self.station_kwargs.setdefault('profile', database.profile)
+        self.stations = []  # 已建立的连接
+        self.sent = 0  # 已产生的突发信息点数
+        self.server = None
+        self._task = None
+
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(lambda: SimulatedStation(self, **self.station_kwargs), self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        if self.rates:
+            self._task = asyncio.ensure_future(self._generate())
+
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for station in list(self.stations):
+            station.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+
+    async def _generate(self) -> None:
+        loop = asyncio.get_running_loop()
+        carry = dict.fromkeys(self.rates, 0.0)  # 各类型标识累计而尚未产生的信息点数
+        last = loop.time()
+        while True:
+            await asyncio.sleep(self.tick)
+            now = loop.time()
+            elapsed, last = now - last, now
+            if not any(station.started for station in self.stations):
+                continue
+            time_tag = pack_CP56Time2a(datetime.now(timezone.utc))
+            for type_id, rate in self.rates.items():
+                due = carry[type_id] + rate * elapsed
+                count = int(due)
+                carry[type_id] = due - count
+                asdus = self.database.change(type_id, count, time_tag)
+                self.sent += count
+                for station in self.stations:
+                    station.send_spontaneous(asdus)
+
+
+################################ 命令行 ################################
+def main(argv: list = None) -> None:
+    parser = argparse.ArgumentParser(description='IEC104被控站模拟器')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--common-addr', type=int, default=1, help='公共地址, 0为响应任意公共地址(突发数据以主站召唤过的公共地址上送)')
+    parser.add_argument('--points', type=int, default=1000, help='每个类型标识的信息点数')
+    parser.add_argument('--rate', action='append', default=[], metavar='TYPE=RATE', help='类型标识每秒突发的信息点数, 可重复')
+    parser.add_argument('--type', action='append', type=int, default=[], help='只召唤不突发的类型标识, 可重复')
+    parser.add_argument('--profile', default='2,2,3', help='系统参数"传送原因,公共地址,信息对象地址"的字节数')
+    parser.add_argument('--file', action='append', default=[], metavar='ADDR:NOF=PATH', help='可召唤的文件, 可重复')
+    args = parser.parse_args(argv)
+
+    rates = {int(type_id): float(rate) for type_id, rate in (item.split('=') for item in args.rate)}
+    database = PointDatabase(profile=LinkProfile(*map(int, args.profile.split(','))))
+    for i, type_id in enumerate(sorted(set(rates) | set(args.type) or {M__ME__NC__1})):
+        database.add_range(args.common_addr or None, type_id, 0x1001 + i * 0x10000, args.points)
+    files = {}
+    for item in args.file:
+        name, path = item.split('=', 1)
+        addr, nof = map(int, name.split(':'))
+        files[addr, nof] = path
+
+    async def serve():
+        simulator = Simulator(database, rates, args.host, args.port, files=files)
+        await simulator.start()
+        print('listening on %s:%d, %d points' % (args.host, simulator.port, len(database)))
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await simulator.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+# 本模块为事件顺序记录(SOE): 收集各被控站带CP56Time2a时标的信息对象,
+# 每个被控站一个队列(顺序到达的事件入环形缓冲, 乱序到达的入堆), 超出重排时限后
+# 将各队列多路归并为一个按时标排序的全局事件流。
+from collections import deque
+from heapq import heapify, heappop, heappush, heapreplace
+from operator import itemgetter
+from typing import NamedTuple
+
+from data import *
+from iec_types import *
+from image import POINT_TYPES
+from unpack import CP56Time2a_to_ms
+
+
+HORIZON = 2000  # 默认重排时限(毫秒)
+CAPACITY = 1 << 16  # 默认缓存的事件数上限
+
+
+class Event(NamedTuple):
+    """一条事件记录"""
+    time: int  # CP56Time2a时标(毫秒)
+    rtu: object  # 被控站标识
+    common_addr: int
+    addr: int
+    type_id: int
+    value: int
+    quality: int
+    elapsed: int = None  # 继电保护设备事件的CP16Time2a动作时间(毫秒)
+
+
+"""类型标识 -> (值, 品质描述词, 动作时间), 由'raw'模式的原始数值元组求得, 时标均为最后一个元素"""
+SOE_TYPES = {
+    type_id: (value_of, quality_of, None)
+    for type_id, (_, value_of, quality_of, tag) in POINT_TYPES.items()
+    if tag is not None
+}
+SOE_TYPES.update({
+    M__EP__TD__1: (lambda fields: fields[0] & 0b11, lambda fields: fields[0] & 0b11111000, lambda fields: fields[1]),
+    M__EP__TE__1: (lambda fields: fields[0], lambda fields: fields[1], lambda fields: fields[2]),
+    M__EP__TF__1: (lambda fields: fields[0], lambda fields: fields[1], lambda fields: fields[2]),
+})
+
+
+_time = itemgetter(0)
+
+
+class _Queue:
+    """一个被控站的待排序事件"""
+    __slots__ = ('ring', 'heap', 'seq')
+
+    def __init__(self) -> None:
+        self.ring = deque()  # 时标不减的事件
+        self.heap = []  # 早于环形缓冲末尾的乱序事件, 元素为(时标, 到达序号, 事件)
+        self.seq = 0
+
+
+    def extend(self, events: list) -> None:
+        """输入按时标排序的事件"""
+        ring = self.ring
+        if not ring or events[0].time >= ring[-1].time:
+            ring.extend(events)
+            return
+        heap = self.heap
+        for event in events:
+            if event.time >= ring[-1].time:
+                ring.append(event)
+            else:
+                heappush(heap, (event.time, self.seq, event))
+                self.seq += 1
+
+
+    def head(self) -> Event:
+        """最早的事件, 队列为空时返回None"""
+        ring, heap = self.ring, self.heap
+        if heap and (not ring or heap[0][0] < ring[0].time):
+            return heap[0][2]
+        return ring[0] if ring else None
+
+
+    def pop(self) -> Event:
+        ring, heap = self.ring, self.heap
+        if heap and (not ring or heap[0][0] < ring[0].time):
+            return heappop(heap)[2]
+        return ring.popleft()
+
+
+    def take(self, threshold: int, out: list) -> None:
+        """将时标不晚于threshold的事件按时标顺序移入out; threshold为None时全部移入"""
+        ring, heap = self.ring, self.heap
+        if heap:
+            # 乱序事件较少, 与环形缓冲中的事件逐个归并
+            while True:
+                event = self.head()
+                if event is None or (threshold is not None and event.time > threshold):
+                    return
+                out.append(self.pop())
+        if threshold is None or (ring and ring[-1].time <= threshold):
+            out.extend(ring)
+            ring.clear()
+        else:
+            while ring and ring[0].time <= threshold:
+                out.append(ring.popleft())
+
+
+    def __len__(self) -> int:
+        return len(self.ring) + len(self.heap)
+
+
+class SOEBuffer:
+    """跨被控站按时标排序的事件顺序记录
+
+    时标早于 已见到的最大时标 - horizon 的事件被释放, 各被控站的队列多路归并后
+    按时标(相同时同一被控站的按到达顺序)交给callback(events), 未指定callback时暂存于ready, 由drain()取出。
+    迟于horizon到达的事件仍会释放, 但已无法与之前释放的事件排序, 计入late。
+    缓存的事件超过capacity时提前释放最早的事件, 计入overflows。
+    时标无效(如月份为0)的事件无法排序, 被丢弃并计入invalid。
+    没有新事件时可由advance()以本地时钟推进释放, 或由flush()释放全部事件。
+    """
+    def __init__(self, horizon: int = HORIZON, capacity: int = CAPACITY, callback=None) -> None:
+        self.horizon = horizon
+        self.capacity = capacity
+        self.callback = callback
+        self.queues = {}  # 被控站标识 -> _Queue
+        self.ready = []  # 已释放但尚未取出的事件
+        self.watermark = None  # 已见到的最大时标
+        self.released = None  # 最后释放的事件的时标
+        self.pending = 0  # 缓存的事件数
+        self.events = 0  # 已接收的事件数
+        self.late = 0
+        self.overflows = 0
+        self.invalid = 0
+
+
+    def push(self, rtu, asdu: ASDU) -> int:
+        """以'raw'模式的ASDU输入事件, 返回其中有效的事件数; 不带CP56Time2a时标的类型被忽略"""
+        soe_type = SOE_TYPES.get(asdu.type_id)
+        if soe_type is None:
+            return 0
+        if asdu.mode != 'raw':
+            raise ValueError("仅支持'raw'模式的ASDU")
+        value_of, quality_of, elapsed_of = soe_type
+        queue = self.queues.get(rtu)
+        if queue is None:
+            queue = self.queues[rtu] = _Queue()
+        type_id, common_addr = asdu.type_id, asdu.common_addr
+        events = []
+        for addr, fields in asdu.info_objs:
+            try:
+                ms = CP56Time2a_to_ms(fields[-1])
+            except ValueError:
+                self.invalid += 1
+                continue
+            events.append(Event(ms, rtu, common_addr, addr, type_id, value_of(fields), quality_of(fields),
+                                None if elapsed_of is None else elapsed_of(fields)))
+        if not events:
+            return 0
+        events.sort(key=_time)
+        count = len(events)
+        self.events += count
+        self.pending += count
+        if self.released is not None and events[0].time < self.released:
+            self.late += sum(1 for event in events if event.time < self.released)
+        queue.extend(events)
+        watermark = self.watermark
+        if watermark is None or events[-1].time > watermark:
+            watermark = events[-1].time
+        self.watermark = watermark
+        self._release(watermark - self.horizon)
+        if self.pending > self.capacity:
+            self.overflows += self.pending - self.capacity
+            self._release(None, self.pending - self.capacity)
+        return count
+
+
+    def advance(self, now: int) -> None:
+        """以本地时钟now(毫秒)推进水位, 释放早于 now - horizon 的事件"""
+        if self.watermark is None or now > self.watermark:
+            self.watermark = now
+        self._release(self.watermark - self.horizon)
+
+
+    def flush(self) -> None:
+        """释放全部缓存的事件"""
+        self._release(None)
+
+
+    def drain(self) -> list:
+        """取出已释放的事件"""
+        ready, self.ready = self.ready, []
+        return ready
+
+
+    def _release(self, threshold: int = None, limit: int = None) -> None:
+        """释放时标不晚于threshold的事件, 至多limit个; threshold为None时不限时标"""
+        if limit is None:
+            # 各队列移出的部分均已有序, 拼接后稳定排序即按连续有序段归并
+            events = []
+            for queue in self.queues.values():
+                queue.take(threshold, events)
+            if not events:
+                return
+            events.sort(key=_time)
+        else:
+            events = self._merge(threshold, limit)
+            if not events:
+                return
+        self.pending -= len(events)
+        if self.released is None or events[-1].time > self.released:
+            self.released = events[-1].time
+        if self.callback is not None:
+            self.callback(events)
+        else:
+            self.ready.extend(events)
+
+
+    def _merge(self, threshold: int, limit: int) -> list:
+        """逐个多路归并各队列最早的事件, 至多limit个"""
+        heads = []
+        for i, queue in enumerate(self.queues.values()):
+            event = queue.head()
+            if event is not None and (threshold is None or event.time <= threshold):
+                heads.append((event.time, i, queue))
+        heapify(heads)
+        events = []
+        while heads and len(events) < limit:
+            _, i, queue = heads[0]
+            events.append(queue.pop())
+            event = queue.head()
+            if event is not None and (threshold is None or event.time <= threshold):
+                heapreplace(heads, (event.time, i, queue))
+            else:
+                heappop(heads)
+        return events
+
+
+    def __len__(self) -> int:
+        return self.pending
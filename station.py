@@ -1,76 +1,216 @@
+import logging
 import time
 import socket
-from struct import pack
+from collections import deque
 
 from iec_types import *
-from unpack import from_bytes_to_apdus
+from filetransfer import FILE_TYPES, FileTransfer, FileTransferError, FileTransfers
+from frametrace import FrameTrace, LazyFrame
+from metrics import ConnectionMetrics
+from image import Deadband, ProcessImage, Subscription
+from soe import SOEBuffer
+from pack import pack_apci_into, pack_asdu
+from unpack import APDUFramer
 
 
 RECV_SIZE = 1024*12
 
+SEQ_MODULO = 1 << 15  # 发送/接收序号为15位
+K = 12  # 未被确认的I格式报文的最大数目
+W = 8  # 最迟在接收w个I格式报文后确认
+T2 = 10  # 无数据报文时确认的超时(秒)
+
+"""报文日志, 报文的可读描述仅在DEBUG级别启用时才生成"""
+logger = logging.getLogger('iec104.station')
+
+
+class SequenceWindow:
+    """发送/接收序号的滑动窗口
+
+    发送方至多有k个未被确认的I格式报文, 达到k时须等待确认;
+    接收方累计接收w个I格式报文或t2超时后以S格式报文确认, 多个确认合并为一个。
+    """
+    def __init__(self, k: int = K, w: int = W) -> None:
+        assert 0 < w <= k < SEQ_MODULO
+        self.k = k
+        self.w = w
+        self.vs = 0  # 发送序号
+        self.vr = 0  # 接收序号
+        self.ack = 0  # 对方已确认的发送序号
+        self.unacked_recv = 0  # 已接收但尚未确认的I格式报文数
+
+
+    @property
+    def outstanding(self) -> int:
+        """已发送但尚未被确认的I格式报文数"""
+        return (self.vs - self.ack) % SEQ_MODULO
+
+
+    def can_send(self) -> bool:
+        return self.outstanding < self.k
+
+
+    def on_send(self) -> int:
+        """发送一个I格式报文, 返回其发送序号; 该报文同时确认了已接收的I格式报文"""
+        assert self.can_send()
+        send = self.vs
+        self.vs = (self.vs + 1) % SEQ_MODULO
+        self.unacked_recv = 0
+        return send
+
+
+    def on_ack(self, recv: int) -> bool:
+        """对方确认了recv之前的全部I格式报文, 确认序号不在窗口内时返回False"""
+        if (self.vs - recv) % SEQ_MODULO > self.outstanding:
+            return False
+        self.ack = recv
+        return True
+
+
+    def on_recv(self, send: int) -> bool:
+        """接收一个发送序号为send的I格式报文, 序号错误时返回False"""
+        if send != self.vr:
+            return False
+        self.vr = (self.vr + 1) % SEQ_MODULO
+        self.unacked_recv += 1
+        return True
+
+
+    def need_ack(self) -> bool:
+        """已接收w个I格式报文, 须立即确认"""
+        return self.unacked_recv >= self.w
+
+
+    def acked(self) -> None:
+        """已发送S格式报文确认全部接收的I格式报文"""
+        self.unacked_recv = 0
+
 
 class BaseStation:
-    def __init__(self, ip: str, port: int) -> None:
+    def __init__(self, ip: str, port: int, k: int = K, w: int = W, t2: float = T2, sock: socket.socket = None, profile: LinkProfile = DEFAULT_PROFILE,
+                 metrics: ConnectionMetrics = None, trace: FrameTrace = None) -> None:
         # 站状态信息初始化
         # 计数器
-        self.ack = 0
-        self.vs = 0
-        self.vr = 0
+        self.window = SequenceWindow(k, w)
+        self.t2 = t2
+        self._first_unacked = None  # 最早一个未确认的I格式报文的接收时间
+        self.profile = profile  # 连接的系统参数
+        self.metrics = metrics  # 连接的运行指标, 为None时不统计
+        self.trace = trace  # 收发报文的二进制记录, 为None时不记录
+        self.framer = APDUFramer(mode='raw', profile=profile, metrics=metrics, trace=trace)
         # 站连接初始化
-        self.tcp_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.tcp_sock.connect((ip, port))
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.connect((ip, port))
+        self.tcp_sock = sock
+        self._log_extra = {'station': (ip, port)}  # 日志记录的附加字段
+
+
+    @property
+    def vs(self) -> int:
+        return self.window.vs
+
+
+    @property
+    def vr(self) -> int:
+        return self.window.vr
+
+
+    @property
+    def ack(self) -> int:
+        return self.window.ack
 
 
     def recv(self) -> list:
-        """接收数据包"""
-        # 从缓存区读入比特流
-        data = self.tcp_sock.recv(RECV_SIZE)
+        """接收数据包
+
+        连接已关闭(含对端关闭)时引发ConnectionError; 报文顺序错误时主动关闭连接, 只返回此前已接受的报文
+        """
+        if self.tcp_sock.fileno() == -1:
+            raise ConnectionError('连接已关闭')
+        # 从缓存区读入比特流, 有未确认的I格式报文时至多等待至t2超时
+        timeout = self.tcp_sock.gettimeout()
+        if self._first_unacked is not None:
+            remaining = max(self.t2 - (time.monotonic() - self._first_unacked), 0)
+            self.tcp_sock.settimeout(remaining if timeout is None else min(remaining, timeout))
+        try:
+            data = self.tcp_sock.recv(RECV_SIZE)
+            if not data:
+                raise ConnectionError('连接已被对端关闭')
+        except socket.timeout:
+            if self._first_unacked is None or time.monotonic() - self._first_unacked < self.t2:
+                raise
+            data = b''  # t2超时, 下面发送S格式报文确认
+        finally:
+            self.tcp_sock.settimeout(timeout)
+        if self.metrics is not None:
+            self.metrics.bytes_in += len(data)
         # 解析比特流为apdu列表
-        apdus = from_bytes_to_apdus(data)
+        apdus = list(self.framer.feed(data))
         # 更新站状态信息
-        for apdu in apdus:
+        debug = logger.isEnabledFor(logging.DEBUG)
+        for i, apdu in enumerate(apdus):
             assert isinstance(apdu, APDU)
             if apdu.format == 'I':
-                if apdu.recv != self.vs or apdu.send != self.vr:
-                    print('顺序错误！主动关闭')
+                if not self.window.on_recv(apdu.send) or not self.window.on_ack(apdu.recv):
+                    if self.metrics is not None:
+                        self.metrics.seq_errors += 1
+                    logger.warning('I格式报文顺序错误, 主动关闭: send=%d recv=%d vr=%d vs=%d', apdu.send, apdu.recv,
+                                   self.vr, self.vs, extra=self._log_extra)
                     self.tcp_sock.close() # 主动关闭
+                    return apdus[:i]
                 else:
-                    print('接收成功！')
-                    print(apdu)
-                    self.ack = apdu.recv
-                    self.vr += 1
+                    if debug:
+                        logger.debug('接收: %s', apdu, extra=self._log_extra)
+                    if self._first_unacked is None:
+                        self._first_unacked = time.monotonic()
 
             elif apdu.format == 'S':
-                if apdu.recv != self.vs:
-                    print('顺序错误!')
+                if not self.window.on_ack(apdu.recv):
+                    if self.metrics is not None:
+                        self.metrics.seq_errors += 1
+                    logger.warning('S格式报文顺序错误, 主动关闭: recv=%d vs=%d', apdu.recv, self.vs, extra=self._log_extra)
                     self.tcp_sock.close() # 主动关闭
-                else:
-                    print('接收成功')
-                    self.ack = apdu.recv
-                    self.vr += 1
+                    return apdus[:i]
+                elif debug:
+                    logger.debug('接收: %s', apdu, extra=self._log_extra)
+
+            elif apdu.action == 'TESTFR ACTIVATE':
+                self.send('U', 'TESTFR ACK')
+
+        # 累计接收w个I格式报文或t2超时后, 合并为一个S格式报文确认
+        if self._first_unacked is not None and (
+                self.window.need_ack() or time.monotonic() - self._first_unacked >= self.t2):
+            self.send('S')
 
         return apdus
 
 
     def send(self, frame_format: str, frame_action: str = '', asdu_bytes: bytes = b'') -> None:
-        """发送数据包"""
+        """发送数据包, 未被确认的I格式报文达到k个时阻塞至收到确认"""
+        if frame_format == 'I':
+            while not self.window.can_send():
+                self.recv()
         # data中添加bytes格式的apdu报文
-        length = pack('B', len(asdu_bytes) + 4)
+        data = bytearray(APCI_SIZE + len(asdu_bytes))
+        pack_apci_into(data, 0, frame_format, frame_action, self.vs, self.vr, len(asdu_bytes) + 4)
+        data[APCI_SIZE:] = asdu_bytes
         if frame_format == 'I':
-            control_bytes = pack('<H', self.vs << 1)  + pack('<H', self.vr << 1)
-            self.vs += 1
+            self.window.on_send()
+            self._first_unacked = None
 
         elif frame_format == 'S':
-            control_bytes = pack('<H', 1) + pack('<H', self.vr << 1)
-            self.vs += 1
-
-        elif frame_format == 'U':
-            control_bytes = pack('<H', ((2**U_ACTIONS.index(frame_action))<<2)+0b11) + b'\x00\x00'
+            self.window.acked()
+            self._first_unacked = None
 
-        data = b'h%s%s%s' % (length, control_bytes, asdu_bytes)
         # 发送数据
-        print('发送：', from_bytes_to_apdus(data)[0])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('发送: %s', LazyFrame(data, self.profile), extra=self._log_extra)
         self.tcp_sock.send(data)
+        if self.trace is not None:
+            self.trace.sent(data)
+        if self.metrics is not None:
+            self.metrics.sent(len(data))
 
 
 class ControlStation(BaseStation):
@@ -78,6 +218,51 @@ class ControlStation(BaseStation):
     
     对于每一个基本应用功能，主站和从站具有不同的行为，分别定义如下：
     """
+    def __init__(self, *args, image: ProcessImage = None, soe: SOEBuffer = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.image = ProcessImage() if image is None else image  # 过程映像, 可由多个站共用
+        self.soe = soe  # 事件顺序记录, 可由多个站共用
+        self.soe_key = self.tcp_sock.getpeername()  # 本站在事件顺序记录中的标识, 默认为对端地址
+        self.files = FileTransfers()  # 正在进行的文件传输
+        self._outgoing = deque()  # 待发送的文件传输应答
+        self._sending = False  # 是否正在发送待发送的应答
+
+
+    def recv(self) -> list:
+        """接收数据包, 并以其中的ASDU更新过程映像及事件顺序记录, 文件传输的ASDU交由文件传输处理"""
+        apdus = super().recv()
+        for apdu in apdus:
+            if apdu.asdu is not None:
+                if apdu.asdu.type_id in FILE_TYPES:
+                    self._outgoing.extend(self.files.asdu_received(apdu.asdu))
+                    continue
+                self.image.update(apdu.asdu)
+                if self.soe is not None:
+                    self.soe.push(self.soe_key, apdu.asdu)
+        if not self._sending:
+            self._send_outgoing()
+        return apdus
+
+
+    def _send_outgoing(self) -> None:
+        """按顺序发送待发送的应答; 发送窗口已满时send()内接收的报文所产生的应答排在其后, 由本次一并发送"""
+        self._sending = True
+        try:
+            while self._outgoing:
+                self.send('I', asdu_bytes=pack_asdu(self._outgoing.popleft(), self.profile))
+        finally:
+            self._sending = False
+
+
+    def subscribe(self, callback, type_ids=None, common_addrs=None, deadband: Deadband = Deadband(), type_deadbands: dict = None) -> Subscription:
+        """订阅信息点的显著变化, 见ProcessImage.subscribe"""
+        return self.image.subscribe(callback, type_ids, common_addrs, deadband, type_deadbands)
+
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.image.unsubscribe(subscription)
+
+
     def init(self):
         """站初始化"""
         pass
@@ -100,11 +285,12 @@ class ControlStation(BaseStation):
 
     def total_call(self):
         """总召唤"""
-        print(f'self.vs  = {self.vs}, self.vr = {self.vr}')
+        logger.debug('总召唤: vs=%d vr=%d', self.vs, self.vr, extra=self._log_extra)
         self.send('U', 'STARTDT ACTIVATE')
         time.sleep(1)
         self.recv()
-        self.send('I', asdu_bytes=bytes.fromhex('64010600010000000014'))
+        self.send('I', asdu_bytes=pack_asdu(ASDU(
+            C__IC__NA__1, VSQ(1, 0), COT(6, 0, 0, 0), 1, [InfoObj(0, (20, ))], 'raw'), self.profile))  # 激活站召唤
         time.sleep(1)
         self.recv()
         return
@@ -135,9 +321,32 @@ class ControlStation(BaseStation):
         pass
 
 
-    def transmit_file(self):
-        """文件传输"""
-        pass
+    def transmit_file(self, common_addr: int, addr: int, nof: int, sink, timeout: float = None) -> FileTransfer:
+        """文件传输: 召唤文件并写入sink(见FileTransfer), 阻塞至传输结束, 返回完成的传输
+
+        timeout为接收的超时, 超时或传输失败时中止传输并引发异常
+        """
+        transfer = FileTransfer(common_addr, addr, nof, sink)
+        self._outgoing.extend(self.files.start(transfer))
+        previous = self.tcp_sock.gettimeout()
+        self.tcp_sock.settimeout(timeout)
+        try:
+            self._send_outgoing()
+            while not transfer.finished:
+                self.recv()
+        except BaseException:
+            # 停止激活文件; 连接已关闭或发送窗口已满时不再等待
+            for asdu in self.files.abort(transfer, '传输中止'):
+                if self.tcp_sock.fileno() == -1 or not self.window.can_send() or self._sending:
+                    break
+                self.send('I', asdu_bytes=pack_asdu(asdu, self.profile))
+            raise
+        finally:
+            if self.tcp_sock.fileno() != -1:
+                self.tcp_sock.settimeout(previous)
+        if transfer.error is not None:
+            raise FileTransferError(transfer.error)
+        return transfer
 
 
     def collect_transmission_delay(self):
@@ -149,6 +358,7 @@ class ControledStation(BaseStation):
     """被控站，又称从站
     
     对于每一个基本应用功能，主站和从站具有不同的行为，分别定义如下：
+    可运行的被控站模拟器见simulator.Simulator
     """
     def init(self):
         """站初始化"""
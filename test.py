@@ -11,6 +11,1010 @@ def test_from_bytes_to_apdus():
         print(packet)
 
 
+def test_framer():
+    msg1 = b'h\x04\x0b\x00\x00\x00'
+    msg2 = b'h\x0e\x14\x00\x02\x00d\x01\n\x00\x01\x00\x00\x00\x00\x14'
+    msg = msg1 + msg2 + msg1
+    from unpack import APDUFramer
+    framer = APDUFramer()
+    # 逐字节输入, 模拟任意的TCP分段边界
+    apdus = [apdu for i in range(len(msg)) for apdu in framer.feed(msg[i:i+1])]
+    assert [apdu.format for apdu in apdus] == ['U', 'I', 'U']
+    assert framer.pending == 0
+    # 结尾不完整的报文被保留至下一次输入
+    assert list(framer.feed(msg2[:5])) == []
+    assert framer.pending == 5
+    assert [apdu.format for apdu in framer.feed(msg2[5:])] == ['I']
+
+
+def test_columnar():
+    # 规一化值序列: 基地址0x4001, 三个元素 -0.5, 0.5(IV), 0
+    msg = b'h\x16\x00\x00\x00\x00\t\x83\x14\x00\x01\x00\x01@\x00\x00\xc0\x00\x00@\x80\x00\x00\x00'
+    from unpack import unpack_apdu
+    rows = unpack_apdu(msg).asdu.info_objs
+    columns = unpack_apdu(msg, columnar=True).asdu.info_objs
+    assert columns.addr == rows[0].addr == 0x4001
+    assert list(columns.values) == [obj.elems[0] for obj in rows] == [-0.5, 0.5, 0]
+    assert list(columns.quality) == [0, 0x80, 0]
+
+
+def test_compact_types():
+    # 单点信息集合: 地址1 合(IV|NT), 地址2 开
+    msg = b'h\x12\x00\x00\x00\x00\x01\x02\x03\x00\x01\x00\x01\x00\x00\xc1\x02\x00\x00\x00'
+    from unpack import unpack_apdu
+    from iec_types import SIQ
+    asdu = unpack_apdu(msg).asdu
+    assert asdu.vsq == (2, 0)
+    assert asdu.trans_cause.cause == 3 and asdu.trans_cause.desc == '突发（自发）'
+    assert [obj.addr for obj in asdu.info_objs] == [1, 2]
+    assert asdu.info_objs[0].elems == SIQ.SPI | SIQ.NT | SIQ.IV == 0xc1
+    assert asdu.info_objs[1].elems == 0
+    assert not hasattr(asdu, '__dict__')
+
+
+def test_lazy_asdu():
+    # 单点信息集合与规一化值序列
+    msg1 = b'h\x12\x00\x00\x00\x00\x01\x02\x03\x00\x01\x00\x01\x00\x00\xc1\x02\x00\x00\x00'
+    msg2 = b'h\x16\x00\x00\x00\x00\t\x83\x14\x00\x01\x00\x01@\x00\x00\xc0\x00\x00@\x80\x00\x00\x00'
+    from unpack import unpack_apdu
+    for msg in (msg1, msg2):
+        eager = unpack_apdu(msg).asdu
+        lazy = unpack_apdu(msg, lazy=True).asdu
+        assert lazy.common_addr == eager.common_addr and lazy.trans_cause == eager.trans_cause
+        assert lazy[-1] == eager.info_objs[-1]
+        assert list(lazy) == eager.info_objs
+        assert lazy.info_objs == eager.info_objs
+
+
+def test_raw_mode():
+    from unpack import INFO_ELEM_LAYOUTS, describe_info_elems, unpack_info_elems
+    data = bytes(range(1, 40))
+    for type_id in INFO_ELEM_LAYOUTS:
+        raw = unpack_info_elems(type_id, data, mode='raw')
+        assert isinstance(raw, tuple)
+        assert describe_info_elems(type_id, raw) == unpack_info_elems(type_id, data)
+
+
+def _random_fields(rng, type_id):
+    """按信息元素集的结构格式随机生成原始数值"""
+    import re
+    from struct import pack, unpack
+    from unpack import INFO_ELEM_LAYOUTS, F_SG_NA_1
+    if type_id == F_SG_NA_1:
+        segment = bytes(rng.randrange(256) for _ in range(rng.randrange(1, 20)))
+        return (rng.randrange(1 << 16), rng.randrange(256), len(segment), segment)
+    fields = []
+    for count, code in re.findall(r'(\d*)([a-zA-Z])', INFO_ELEM_LAYOUTS[type_id].struct.format):
+        if code == 's':
+            fields.append(bytes(rng.randrange(256) for _ in range(int(count))))
+        elif code == 'f':
+            fields.append(unpack('<f', pack('<f', rng.uniform(-1e6, 1e6)))[0])
+        else:
+            bits = {'B': 8, 'H': 16, 'h': 16, 'I': 32}[code]
+            val = rng.randrange(1 << bits)
+            fields.append(val - (1 << bits) * (val >> (bits - 1)) if code.islower() else val)
+    return tuple(fields)
+
+
+def test_pack_round_trip():
+    import random
+    from iec_types import APDU, ASDU, COT, InfoObj, VSQ
+    from pack import pack_apdu
+    from unpack import INFO_ELEM_LAYOUTS, F_SG_NA_1, unpack_apdu
+    rng = random.Random(104)
+    for type_id, layout in INFO_ELEM_LAYOUTS.items():
+        for _ in range(20):
+            is_sq = rng.randrange(2) if type_id != F_SG_NA_1 else 0
+            max_number = 1 if layout.size is None else min(127, (240 - 3) // (layout.size + 3))
+            number = rng.randrange(1, max_number + 1)
+            base = rng.randrange(1 << 16)
+            info_objs = [
+                InfoObj(base + i if is_sq else rng.randrange(1 << 24), _random_fields(rng, type_id))
+                for i in range(number)]
+            asdu = ASDU(type_id, VSQ(number, is_sq), COT(rng.randrange(64), rng.randrange(2), rng.randrange(2), rng.randrange(256)), 
+                        rng.randrange(1 << 16), info_objs, 'raw')
+            apdu = APDU('I', 'TRANSMIT', rng.randrange(1 << 15), rng.randrange(1 << 15), asdu)
+            decoded = unpack_apdu(pack_apdu(apdu), mode='raw')
+            assert (decoded.send, decoded.recv) == (apdu.send, apdu.recv)
+            assert decoded.asdu.type_id == type_id and decoded.asdu.vsq == asdu.vsq
+            assert decoded.asdu.trans_cause == asdu.trans_cause and decoded.asdu.common_addr == asdu.common_addr
+            assert decoded.asdu.info_objs == info_objs
+    for action in ('STARTDT ACTIVATE', 'STARTDT ACK', 'TESTFR ACK'):
+        assert unpack_apdu(pack_apdu(APDU('U', action))).action == action
+    assert unpack_apdu(pack_apdu(APDU('S', 'MONITOR', recv=1234))).recv == 1234
+
+
+def test_link_profile():
+    from iec_types import APDU, ASDU, COT, InfoObj, LinkProfile, VSQ
+    from pack import pack_apdu
+    from unpack import APDUFramer, unpack_apdu
+    small = LinkProfile(cot_size=1, ca_size=1, ioa_size=2)
+    # 一个字节的传送原因和公共地址, 两个字节的信息对象地址
+    apdu = unpack_apdu(b'\x68\x0e\x00\x00\x00\x00\x0d\x01\x03\x07\x01\x40\x00\x00\x80\x3f\x00', mode='raw', profile=small)
+    assert apdu.asdu.trans_cause == COT(3, 0, 0, None) and apdu.asdu.common_addr == 7
+    assert apdu.asdu.info_objs == [InfoObj(0x4001, (1.0, 0))]
+    asdu = ASDU(13, VSQ(2, 1), COT(3, 0, 0, 5), 200, [InfoObj(0x4001, (1.0, 0)), InfoObj(0x4002, (2.0, 0))], 'raw')
+    for profile in (small, LinkProfile(1, 2, 3), LinkProfile(2, 1, 2), LinkProfile()):
+        data = pack_apdu(APDU('I', 'TRANSMIT', 1, 2, asdu), profile)
+        assert len(data) == 6 + 2 + profile.cot_size + profile.ca_size + profile.ioa_size + 2 * 5
+        for lazy in (False, True):
+            decoded = next(APDUFramer(lazy=lazy, mode='raw', profile=profile).feed(data)).asdu
+            assert decoded.common_addr == 200
+            assert decoded.trans_cause.source_addr == (5 if profile.cot_size == 2 else None)
+            assert list(decoded.info_objs) == asdu.info_objs
+
+
+def _profile_capture(profile, is_sq: int = 0, common_addr: int = 1) -> bytes:
+    """以给定系统参数打包的单点信息、短浮点数及规一化值报文"""
+    from iec_types import APDU, ASDU, COT, InfoObj, VSQ
+    from pack import pack_apdu
+    frames = []
+    for n in range(12):
+        type_id, elems = ((1, (1, )), (13, (0.5, 0)), (9, (100, 0)))[n % 3]
+        number = 2 + n % 3
+        asdu = ASDU(type_id, VSQ(number, is_sq), COT(3, 0, 0, 0), common_addr, [InfoObj(i + 1, elems) for i in range(number)], 'raw')
+        frames.append(pack_apdu(APDU('I', 'TRANSMIT', n, 0, asdu), profile))
+    return b''.join(frames)
+
+
+def test_infer_profile():
+    from iec_types import LinkProfile
+    from infer import CANDIDATES, LinkAnalyzer, ProfileCache, infer_profile
+    for profile in CANDIDATES:
+        assert infer_profile(_profile_capture(profile), frames=12) == profile
+    # 序列仅确定三者字节数之和, 按常用程度取舍
+    assert infer_profile(_profile_capture(LinkProfile(2, 2, 3), is_sq=1)) == LinkProfile(2, 2, 3)
+    assert infer_profile(_profile_capture(LinkProfile(1, 1, 2), is_sq=1)) == LinkProfile(1, 1, 2)
+    cache = ProfileCache(frames=12)
+    cache.feed(('10.0.0.1', 2404), _profile_capture(LinkProfile(1, 1, 2)))
+    cache.feed(('10.0.0.2', 2404), _profile_capture(LinkProfile()))
+    assert cache.get(('10.0.0.1', 2404)) == LinkProfile(1, 1, 2)
+    assert cache.get(('10.0.0.2', 2404)) == LinkProfile()
+    assert cache.get(('10.0.0.3', 2404)) == LinkProfile()
+    # 判定后参数变更
+    cache.feed(('10.0.0.1', 2404), _profile_capture(LinkProfile(2, 2, 3)))
+    assert cache.drifted() == {('10.0.0.1', 2404): 12}
+    analyzer = LinkAnalyzer()
+    analyzer.feed(b'\x68\x04\x07\x00\x00\x00')  # U格式报文不参与推断
+    assert analyzer.seen == 0 and analyzer.profile is None
+
+
+def test_capture(tmp_path):
+    import io
+    import json
+    from bench import _capture, _capture_packets, _tcp_packet, _write_pcap
+    from capture import decode_capture, decode_chunk, main
+    packets = _capture_packets(connections=3, frames=40, segment=500)
+    # 乱序及重传的分段
+    packets[5], packets[6] = packets[6], packets[5]
+    packets.insert(9, packets[8])
+    # 另一端口的连接不参与解析
+    packets.append((packets[-1][0] + 1, _tcp_packet('10.0.0.9', 80, '10.0.0.1', 50000, 0, _capture(2))))
+    expected = []
+    for ng in (False, True):
+        path = tmp_path / ('test.pcapng' if ng else 'test.pcap')
+        with open(path, 'wb') as f:
+            _write_pcap(f, packets, ng)
+        for workers in (0, 2):
+            out = io.StringIO()
+            size, frames = decode_capture(str(path), out, workers=workers, chunk_size=2000)
+            records = [json.loads(line) for line in out.getvalue().splitlines()]
+            assert frames == len(records) == 3 * 40
+            for n in range(3):
+                stream = [record for record in records if record['src'] == '10.0.1.%d:2404' % (n + 1)]
+                assert [record['send'] for record in stream] == list(range(40))
+                assert stream[1]['type_id'] == 13 and stream[1]['objs'][0] == [0x4001, [0.0, 128]]
+                assert all(a['ts'] <= b['ts'] for a, b in zip(stream, stream[1:]))
+            expected.append([{k: v for k, v in record.items() if k != 'ts'} for record in records])
+    assert all(records == expected[0] for records in expected)
+    main([str(path), '-o', str(tmp_path / 'out.jsonl'), '-j', '0', '--profile', '2,2,3'])
+    assert len((tmp_path / 'out.jsonl').read_text(encoding='utf-8').splitlines()) == 3 * 40
+    # 无法解析的报文记为malformed记录, 其后的报文照常解析
+    data = bytes.fromhex('68 06 00 00 00 00 0d 01' '68 04 03 00 00 00' '68 04 01 00 02 00')
+    frames, records = decode_chunk(('a', 'b', (2, 2, 3), data, [0], [1.0], 'records'))
+    assert frames == 1 and [record['format'] for record in records] == ['malformed', 'malformed', 'S']
+    assert records[0]['raw'] == '680600000000' + '0d01' and records[1]['error'].startswith('ValueError') and records[2]['recv'] == 1
+
+
+def _dump(frames: int, start) -> bytes:
+    """每秒一个带CP56Time2a时标的单点信息, 其间夹杂S格式报文"""
+    from datetime import timedelta
+    from data import M__SP__TB__1
+    from iec_types import APDU, ASDU, COT, InfoObj, VSQ
+    from pack import pack_apdu, pack_CP56Time2a
+    chunks = []
+    for n in range(frames):
+        if n % 3 == 2:
+            chunks.append(pack_apdu(APDU('S', 'MONITOR', recv=n)))
+        else:
+            time_tag = pack_CP56Time2a(start + timedelta(seconds=n))
+            chunks.append(pack_apdu(APDU('I', 'TRANSMIT', n, 0, ASDU(M__SP__TB__1, VSQ(1, 0), COT(3, 0, 0, 0), 1, [InfoObj(n, (1, time_tag))], 'raw'))))
+    return b''.join(chunks)
+
+
+def test_replay(tmp_path):
+    import os
+    from datetime import datetime, timezone
+    from data import M__SP__TB__1
+    from iec_types import APDU, ASDU, COT, InfoObj, VSQ
+    from pack import pack_apdu
+    from replay import DumpReader
+    start = datetime(2024, 2, 28, 23, 59, tzinfo=timezone.utc)
+    start_ms = int(start.timestamp() * 1000)
+    path = str(tmp_path / 'dump.bin')
+    with open(path, 'wb') as f:
+        f.write(b'\x00\x01' + _dump(1000, start) + b'\x68\x0e\x00')  # 首尾的残缺数据被跳过
+    with DumpReader(path, stride=16) as reader:
+        assert not os.path.exists(reader.index_path)
+        assert len(reader) == 1000 and os.path.exists(reader.index_path)
+        assert [apdu.recv if apdu.format == 'S' else apdu.send for apdu in reader.from_frame(995)] == list(range(995, 1000))
+        assert reader[501].asdu.info_objs[0].addr == 501 and reader[-1].send == 999
+        assert reader.frame_time(*next(reader.spans(reader.seek_frame(123)))) == start_ms + 123 * 1000
+        # 时间范围内的I格式报文及其间的S格式报文
+        frames = list(reader.between(start_ms + 100 * 1000, start_ms + 200 * 1000))
+        assert frames[0].send == 100 and len(frames) == 101 and frames[-1].recv == 200
+        assert list(reader.between(start_ms + 2000 * 1000)) == []
+        assert sum(1 for _ in reader) == 1000
+        del frames
+    with DumpReader(path) as reader:
+        assert reader.load_index() and reader.stride == 16 and reader.frames == 1000
+    with open(path, 'ab') as f:
+        f.write(_dump(3, start))
+    with DumpReader(path) as reader:
+        assert not reader.load_index()  # 数据文件已变化
+        assert len(reader) == 1003
+    # 时标全为0的报文视为无时标
+    zero = pack_apdu(APDU('I', 'TRANSMIT', 0, 0, ASDU(M__SP__TB__1, VSQ(1, 0), COT(3, 0, 0, 0), 1, [InfoObj(1, (1, bytes(7)))], 'raw')))
+    with open(path, 'ab') as f:
+        f.write(zero)
+    with DumpReader(path) as reader:
+        assert len(reader) == 1004 and reader.frame_time(*next(reader.spans(reader.seek_frame(1003)))) is None
+        frames = list(reader.between(start_ms + 999 * 1000))  # 时间取此前的最大值
+        assert frames[0].send == 999 and len(frames) == 5 and frames[-1].asdu.info_objs[0].elems[1] == bytes(7)
+
+
+def test_cp56time2a_to_ms():
+    import random
+    from datetime import datetime, timedelta, timezone
+    from pack import pack_CP56Time2a
+    from unpack import CP56Time2a_to_ms, CP56Time2a_to_ms_array, unpack_CP56Time2a
+    rng = random.Random(0)
+    dts = [datetime(2024, 2, 29, 23, 59, 59, 999000), datetime(2024, 3, 1), datetime(2023, 12, 31, 23, 59, 59, 999000),
+           datetime(2000, 1, 1), datetime(2099, 12, 31, 23, 59)]
+    dts += [datetime(2000, 1, 1) + timedelta(milliseconds=rng.randrange(100 * 365 * 86400000)) for _ in range(1000)]
+    for dt in dts:
+        ms = round(dt.replace(tzinfo=timezone.utc).timestamp() * 1000)
+        assert CP56Time2a_to_ms(pack_CP56Time2a(dt)) == ms
+        assert CP56Time2a_to_ms(b'\xff' + pack_CP56Time2a(dt), 1) == ms
+    cp56time = unpack_CP56Time2a(pack_CP56Time2a(datetime(2024, 1, 7)))
+    assert cp56time['weekday'] == 7 and cp56time['st'] is False  # 星期日
+    assert unpack_CP56Time2a(bytes((0, 0, 0, 0x81, 0x21, 1, 24)))['st'] is True
+    # 批量转换与逐个转换结果一致, 时标间隔排列
+    data = b''.join(b'\x00' * 3 + pack_CP56Time2a(dt) for dt in dts)
+    assert list(CP56Time2a_to_ms_array(data, 3, 10)) == [CP56Time2a_to_ms(data, 3 + i * 10) for i in range(len(dts))]
+    try:
+        CP56Time2a_to_ms(bytes(7))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('月份为0应引发ValueError')
+
+
+def test_process_image():
+    from datetime import datetime, timezone
+    from data import M__ME__NC__1, M__ME__NA__1, M__SP__TB__1, M__DP__NA__1, M__IT__NA__1, M__ST__NA__1
+    from image import ProcessImage
+    from iec_types import ASDU, COT, InfoObj, VSQ
+    from pack import pack_asdu, pack_CP56Time2a
+    from unpack import unpack_asdu
+    image = ProcessImage()
+    cot = COT(3, 0, 0, 0)
+    time_tag = pack_CP56Time2a(datetime(2024, 1, 2, 3, 4, 5, 678000))
+    asdus = [
+        ASDU(M__SP__TB__1, VSQ(2, 0), cot, 1, [InfoObj(1, (0x81, time_tag)), InfoObj(2, (0x00, time_tag))], 'raw'), 
+        ASDU(M__DP__NA__1, VSQ(1, 0), cot, 1, [InfoObj(3, (0x12, ))], 'raw'), 
+        ASDU(M__ST__NA__1, VSQ(1, 0), cot, 1, [InfoObj(4, (0xff, 0x01))], 'raw'), 
+        ASDU(M__ME__NA__1, VSQ(2, 1), cot, 2, [InfoObj(10, (16384, 0)), InfoObj(11, (-32768, 0x80))], 'raw'), 
+        ASDU(M__IT__NA__1, VSQ(1, 0), cot, 2, [InfoObj(20, ((-5).to_bytes(4, 'little', signed=True) + b'\x83', ))], 'raw'), 
+    ]
+    assert sum(image.update(asdu, now=1000) for asdu in asdus) == 7
+    ms = int(datetime(2024, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc).timestamp() * 1000)
+    assert image.get(1, 1) == (1, 0x80, ms) and image.get(1, 2) == (0, 0, ms)
+    assert image.get(1, 3) == (2, 0x10, 1000)
+    assert image.get(1, 4) == (-1, 0x03, 1000)  # 瞬变状态记入第2位
+    assert image.get(2, 10) == (0.5, 0, 1000) and image.get(2, 11) == (-1.0, 0x80, 1000)
+    assert image.get(2, 20) == (-5, 0x80, 1000)  # 品质不含顺序号
+    assert (2, 20) in image and (1, 20) not in image and len(image) == 7
+    # 按列解析的序列与逐个解析的结果一致, 且更新不再分配槽位
+    data = pack_asdu(ASDU(M__ME__NC__1, VSQ(3, 1), cot, 3, [InfoObj(100 + i, (i * 1.5, 0)) for i in range(3)], 'raw'))
+    image.update(unpack_asdu(data, columnar=True, mode='raw'), now=2000)
+    snapshot = image.snapshot()
+    image.update(unpack_asdu(data, mode='raw'), now=3000)
+    assert image.get(3, 102) == (3.0, 0, 3000) and len(image.families['ME']) == 5
+    assert snapshot['ME'].times[-1] == 2000
+    assert image.update(ASDU(100, VSQ(1, 0), COT(6, 0, 0, 0), 1, [InfoObj(0, (20, ))], 'raw')) == 0
+    # 时标无效时以接收时间代替, 不中断更新
+    assert image.update(ASDU(M__SP__TB__1, VSQ(1, 0), cot, 1, [InfoObj(5, (1, bytes(7)))], 'raw'), now=4000) == 1
+    assert image.get(1, 5) == (1, 0, 4000) and image.invalid_times == 1
+
+
+def test_subscription():
+    from data import M__IT__NA__1, M__ME__NC__1, M_SP_NA_1
+    from image import Change, Deadband, ProcessImage
+    from iec_types import ASDU, COT, InfoObj, VSQ
+    from pack import pack_asdu
+    from unpack import unpack_asdu
+    image = ProcessImage()
+    received = []
+    measured = image.subscribe(lambda type_id, changes: received.append(changes), type_ids=[M__ME__NC__1], 
+                               deadband=Deadband(absolute=1.0))
+    events = []
+    image.subscribe(lambda type_id, changes: events.extend(changes), common_addrs=[1], type_deadbands={M__ME__NC__1: Deadband(percent=50)})
+    measured.set_deadband(1, 102, M__ME__NC__1, Deadband(absolute=10.0))
+
+    def measure(values, quality=0, columnar=False):
+        data = pack_asdu(ASDU(M__ME__NC__1, VSQ(len(values), 1), COT(3, 0, 0, 0), 1, [InfoObj(100 + i, (v, quality)) for i, v in enumerate(values)], 'raw'))
+        image.update(unpack_asdu(data, columnar=columnar, mode='raw'), now=0)
+
+    measure([10.0, 20.0, 30.0])
+    assert [change.addr for change in received.pop()] == [100, 101, 102]  # 首次全部上报
+    measure([10.5, 21.5, 35.0], columnar=True)
+    assert received.pop() == [Change(1, 101, 21.5, 0, 0)]  # 102的逐点死区为10
+    measure([10.5, 21.5, 35.0])
+    assert received == []  # 无变化时不回调
+    measure([10.5, 21.5, 35.0], quality=0x80)
+    assert [change.addr for change in received.pop()] == [100, 101, 102]  # 品质描述词变化
+    # 百分比死区相对上次上报值
+    assert [change.addr for change in events] == [100, 101, 102, 100, 101, 102]
+    image.update(ASDU(M_SP_NA_1, VSQ(1, 0), COT(3, 0, 0, 0), 1, [InfoObj(1, (1, ))], 'raw'))
+    image.update(ASDU(M_SP_NA_1, VSQ(1, 0), COT(3, 0, 0, 0), 2, [InfoObj(1, (1, ))], 'raw'))
+    assert received == [] and events[-1].addr == 1 and len(events) == 7
+    # 计数量读数的顺序号变化不视为品质变化
+    counters = []
+    image.subscribe(lambda type_id, changes: counters.extend(changes), type_ids=[M__IT__NA__1], deadband=Deadband(absolute=1000))
+    for sq in range(4):
+        image.update(ASDU(M__IT__NA__1, VSQ(1, 0), COT(37, 0, 0, 0), 1, [InfoObj(1, ((500).to_bytes(4, 'little') + bytes((sq, )), ))], 'raw'))
+    assert len(counters) == 1
+    image.unsubscribe(measured)
+    measure([100.0, 100.0, 100.0])
+    assert received == []
+
+
+def test_numpy_paths(monkeypatch):
+    # 按列解析、批量时标转换及死区比较的numpy实现须与退化实现结果一致, 数据长度不足时同样引发ValueError
+    import random
+    from datetime import datetime, timedelta
+    import pytest
+    numpy = pytest.importorskip('numpy')
+    import image
+    import unpack
+    from data import M__ME__NA__1, M__ME__NB__1, M__ME__NC__1
+    from image import Deadband, ProcessImage
+    from iec_types import ASDU, COT, InfoObj, VSQ
+    from pack import pack_asdu, pack_CP56Time2a
+
+    def both(call):
+        result = call()
+        with monkeypatch.context() as m:
+            m.setattr(unpack, 'numpy', None)
+            m.setattr(image, 'numpy', None)
+            return result, call()
+
+    rng = random.Random(16)
+    for type_id, value in ((M__ME__NA__1, lambda: rng.randrange(-32768, 32768)), (M__ME__NB__1, lambda: rng.randrange(-32768, 32768)), 
+                           (M__ME__NC__1, lambda: rng.uniform(-1e6, 1e6))):
+        asdu = ASDU(type_id, VSQ(20, 1), COT(3, 0, 0, 0), 1, [InfoObj(100 + i, (value(), rng.choice((0, 0x80)))) for i in range(20)], 'raw')
+        body = pack_asdu(asdu)[6:]
+        columns, fallback = both(lambda: unpack.unpack_info_obj_columns(type_id, 20, body))
+        assert isinstance(columns.values, numpy.ndarray) and columns.addr == fallback.addr == 100
+        assert columns.values.tolist() == list(fallback.values) and columns.quality.tolist() == list(fallback.quality)
+        for short in (body[:-1], body[:3]):
+            for numpy_module in (numpy, None):
+                monkeypatch.setattr(unpack, 'numpy', numpy_module)
+                with pytest.raises(ValueError):
+                    unpack.unpack_info_obj_columns(type_id, 20, short)
+        monkeypatch.setattr(unpack, 'numpy', numpy)
+
+    start = datetime(2023, 12, 31, 23, 59, 59)
+    data = b'\xff' * 3 + b''.join(pack_CP56Time2a(start + timedelta(seconds=rng.randrange(10 ** 6))) + b'\x00' * 3 for _ in range(50))
+    times, fallback = both(lambda: unpack.CP56Time2a_to_ms_array(data, 3, 10))
+    assert isinstance(times, numpy.ndarray) and times.tolist() == list(fallback) and len(fallback) == 50
+    for numpy_module in (numpy, None):
+        monkeypatch.setattr(unpack, 'numpy', numpy_module)
+        with pytest.raises(ValueError):
+            unpack.CP56Time2a_to_ms_array(data, 3, 10, count=51)
+    monkeypatch.setattr(unpack, 'numpy', numpy)
+
+    def subscribe():
+        process_image = ProcessImage()
+        changes = []
+        subscription = process_image.subscribe(lambda type_id, batch: changes.extend(batch), deadband=Deadband(absolute=5, percent=10),
+                                               type_deadbands={M__ME__NB__1: Deadband(absolute=100)})
+        subscription.set_deadband(1, 3, M__ME__NC__1, Deadband(absolute=0.5))
+        updates = random.Random(17)
+        for _ in range(30):
+            for type_id in (M__ME__NB__1, M__ME__NC__1):
+                info_objs = [InfoObj(i, (updates.randrange(-300, 300), updates.choice((0, 0, 0, 0x80)))) for i in range(8)]
+                process_image.update(ASDU(type_id, VSQ(8, 0), COT(3, 0, 0, 0), 1, info_objs, 'raw'), now=0)
+        return changes
+    changes, fallback = both(subscribe)
+    assert changes == fallback and 8 * 2 < len(changes) < 30 * 8 * 2
+
+
+def test_soe():
+    import socket
+    from datetime import datetime, timedelta
+    from data import M__EP__TD__1, M__ME__NC__1, M__SP__TB__1
+    from iec_types import APDU, ASDU, COT, InfoObj, VSQ
+    from pack import pack_apdu, pack_CP56Time2a
+    from soe import Event, SOEBuffer
+    from station import ControlStation
+    from unpack import CP56Time2a_to_ms
+    start = datetime(2024, 5, 6, 7, 8, 9)
+    base = CP56Time2a_to_ms(pack_CP56Time2a(start))
+
+    def events(*offsets, type_id=M__SP__TB__1):
+        info_objs = [InfoObj(offset, (0x01, pack_CP56Time2a(start + timedelta(milliseconds=offset)))) for offset in offsets]
+        return ASDU(type_id, VSQ(len(info_objs), 0), COT(3, 0, 0, 0), 1, info_objs, 'raw')
+
+    soe = SOEBuffer(horizon=100)
+    assert soe.push('a', events(10, 0, 30)) == 3  # 同一被控站内乱序
+    assert soe.push('b', events(5, 20)) == 2
+    assert soe.push('a', ASDU(M__ME__NC__1, VSQ(1, 0), COT(3, 0, 0, 0), 1, [InfoObj(1, (1.0, 0))], 'raw')) == 0
+    assert soe.drain() == [] and len(soe) == 5
+    soe.push('b', events(125))  # 水位推进至125, 释放时标不晚于25的事件
+    assert [(event.time - base, event.rtu) for event in soe.drain()] == [(0, 'a'), (5, 'b'), (10, 'a'), (20, 'b')]
+    soe.push('a', events(15))  # 迟于重排时限到达
+    assert soe.late == 1
+    soe.advance(base + 1000)
+    assert [event.time - base for event in soe.drain()] == [15, 30, 125]
+    # 继电保护设备事件: 事件状态, 品质描述词及动作时间
+    soe.push('b', ASDU(M__EP__TD__1, VSQ(1, 0), COT(3, 0, 0, 0), 2, [InfoObj(7, (0x0a, 250, pack_CP56Time2a(start)))], 'raw'))
+    soe.flush()
+    assert soe.drain() == [Event(base, 'b', 2, 7, M__EP__TD__1, 2, 0x08, 250)]
+    # 超出容量时提前释放最早的事件
+    released = []
+    soe = SOEBuffer(horizon=10000, capacity=4, callback=released.extend)
+    soe.push('a', events(*range(6, 0, -1)))
+    assert [event.time - base for event in released] == [1, 2] and soe.overflows == 2
+    # 时标无效的事件被丢弃并计数, 同一ASDU中其他事件照常输入
+    info_objs = [InfoObj(1, (0x01, bytes(7))), InfoObj(2, (0x01, pack_CP56Time2a(start)))]
+    assert soe.push('b', ASDU(M__SP__TB__1, VSQ(2, 0), COT(3, 0, 0, 0), 1, info_objs, 'raw')) == 1 and soe.invalid == 1
+    # 主站接收的ASDU输入共用的事件顺序记录
+    master_sock, peer = socket.socketpair()
+    station = ControlStation(None, None, sock=master_sock, soe=SOEBuffer(horizon=0))
+    peer.sendall(pack_apdu(APDU('I', 'TRANSMIT', 0, 0, events(3, 1, 2))))
+    station.recv()
+    assert [event.addr for event in station.soe.drain()] == [1, 2, 3]
+    master_sock.close()
+    peer.close()
+
+
+def test_asyncio_station():
+    import asyncio
+    import io
+    import pytest
+    from aiostation import AsyncControlStation, connect
+    from bench import _bench_database
+    from simulator import Simulator
+
+    async def main():
+        simulator = Simulator(_bench_database())
+        await simulator.start()
+        master = await connect('127.0.0.1', simulator.port, t2=0.01)
+        await master.startdt()
+        responses = await master.interrogate(1, timeout=5)
+        assert [asdu.type_id for asdu in responses] == [13]
+        assert responses[0].info_objs[1] == (0x4002, (0.5, 0))
+        assert master.image.get(1, 0x4002)[:2] == (0.5, 0)
+        await asyncio.sleep(0.05)  # t2超时后以S格式报文确认
+        window = master.window
+        assert window.unacked_recv == 0 and window.ack == window.vs == 1 and window.vr == 3
+        # 控制站只支持原始数值解析, 在建立连接前即拒绝其他模式
+        with pytest.raises(ValueError):
+            await connect('127.0.0.1', simulator.port, mode='full')
+        with pytest.raises(ValueError):
+            AsyncControlStation(mode='full')
+        # STARTDT确认后t1停止计时, 无数据的连接超过t1仍保持
+        quiet = await connect('127.0.0.1', simulator.port, t1=0.2)
+        await quiet.startdt()
+        await asyncio.sleep(0.5)
+        assert quiet.transport is not None and quiet._t1_handle is None
+        quiet.close()
+        master.close()
+        await master.closed
+        # 连接关闭后发送引发ConnectionError
+        with pytest.raises(ConnectionError):
+            await master.interrogate(1, timeout=5)
+        with pytest.raises(ConnectionError):
+            await master.read_file(1, 1, 1, io.BytesIO())
+        assert all(future.done() for _, future in master._waiters) and not master.files.transfers
+        await simulator.stop()
+
+    asyncio.run(main())
+
+
+def test_asyncio_sequence_error():
+    import asyncio
+    import pytest
+    from aiostation import connect
+    from data import M__ME__NC__1
+    from iec_types import APDU, ASDU, COT, InfoObj, VSQ
+    from pack import pack_apdu
+
+    async def main():
+        asdu = ASDU(M__ME__NC__1, VSQ(1, 0), COT(3, 0, 0, 0), 1, [InfoObj(1, (1.0, 0))], 'raw')
+        async def outstation(reader, writer):
+            # 同一TCP分段中: 顺序错误的I格式报文, 其后为顺序正确的I格式报文
+            writer.write(pack_apdu(APDU('I', 'TRANSMIT', 5, 0, asdu)) + pack_apdu(APDU('I', 'TRANSMIT', 0, 0, asdu)))
+            await writer.drain()
+            await reader.read()
+            writer.close()
+        server = await asyncio.start_server(outstation, '127.0.0.1', 0)
+        master = await connect('127.0.0.1', server.sockets[0].getsockname()[1])
+        await asyncio.wait_for(master.closed, 5)
+        assert master.window.vr == 0 and len(master.image) == 0  # 顺序错误后的报文未被处理
+        with pytest.raises(ConnectionError):
+            master.send_asdu(asdu)
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(main())
+
+
+def test_station_pool():
+    import asyncio
+    from types import SimpleNamespace
+    from aiostation import RTU, StationPool
+    from bench import _bench_database
+    from simulator import Simulator
+
+    async def main():
+        simulator = Simulator(_bench_database())
+        await simulator.start()
+        pool = StationPool(backoff_min=0.01)
+        rtu = pool.add('rtu1', '127.0.0.1', simulator.port, common_addr=7, queue_size=2)
+        down = pool.add('down', '127.0.0.1', 1)  # 无法连接, 按退避重连
+        await pool.start()
+        received = [await asyncio.wait_for(rtu.get(), 5) for _ in range(3)]
+        assert [asdu.trans_cause.cause for asdu in received] == [7, 20, 10]
+        assert received[1].common_addr == 7
+        stats = pool.stats()
+        assert stats['rtu1']['connected'] and stats['rtu1']['points'] == 50
+        assert not stats['down']['connected'] and down.connects == 0
+        await pool.stop()
+        await simulator.stop()
+        # 重连时暂停状态随连接重置, 队列仍满时新连接同样暂停读取
+        class Transport:
+            paused = False
+            def pause_reading(self):
+                self.paused = True
+            def resume_reading(self):
+                assert self.paused
+                self.paused = False
+        rtu = RTU('rtu', '127.0.0.1', queue_size=2)
+        first, second = SimpleNamespace(transport=Transport()), SimpleNamespace(transport=Transport())
+        rtu.attach(first)
+        for asdu in received:
+            rtu.put(asdu)
+        assert rtu.paused and first.transport.paused
+        rtu.attach(None)
+        rtu.attach(second)
+        assert rtu.paused and second.transport.paused
+        await rtu.get()
+        await rtu.get()
+        assert not rtu.paused and not second.transport.paused
+
+    asyncio.run(main())
+
+
+def test_simulator():
+    import asyncio
+    from data import C__IC__NA__1, C__SC__NA__1, C_CS_NA_1, M__DP__TB__1, M__IT__NA__1, M__ME__NC__1, M_SP_NA_1
+    from aiostation import connect
+    from iec_types import ASDU, COT, InfoObj, VSQ
+    from simulator import PointDatabase, Simulator
+
+    async def main():
+        database = PointDatabase()
+        database.add_range(1, M__ME__NC__1, 100, 60, (1.5, 0))  # 一帧序列至多48个
+        database.add(1, M_SP_NA_1, 7)
+        database.add(1, M_SP_NA_1, 9, (1, ))
+        database.add_range(1, M__DP__TB__1, 200, 50)
+        database.add(2, M__IT__NA__1, 1)
+        async with Simulator(database, {M__DP__TB__1: 2000}) as simulator:
+            master = await connect('127.0.0.1', simulator.port, t2=0.01)
+            responses = await master.interrogate(1, timeout=5)
+            assert master.image.updates == 112  # 未启动数据传输时只有召唤响应
+            assert sorted((asdu.type_id, asdu.vsq) for asdu in responses) == [
+                (M_SP_NA_1, VSQ(2, 0)), (M__ME__NC__1, VSQ(12, 1)), (M__ME__NC__1, VSQ(48, 1)),
+                (M__DP__TB__1, VSQ(20, 1)), (M__DP__TB__1, VSQ(30, 1))]
+            assert master.image.get(1, 159)[:2] == (1.5, 0) and master.image.get(1, 9)[0] == 1
+            await master.startdt()
+            await asyncio.sleep(0.2)
+            assert 100 < master.image.updates - 112 <= 500 and simulator.sent >= 100
+            assert master.image.get(1, 200)[2] > 0  # 带CP56Time2a时标
+            assert (await master.command(1, C__SC__NA__1, 7, (1, ))).trans_cause.cause == 7
+            assert (await master.clock_sync(2)).trans_cause.cause == 7
+            counters = []
+            master._collectors.append(counters.append)
+            await master._activate(ASDU(101, VSQ(1, 0), COT(6, 0, 0, 0), 2, [InfoObj(0, (5, ))], 'raw'), 5, terminate=True)
+            assert [asdu.trans_cause.cause for asdu in counters if asdu.type_id == M__IT__NA__1] == [37]
+            unknown = master.expect(lambda apdu: apdu.format == 'I' and apdu.asdu.trans_cause.cause == 46)
+            master.send_asdu(ASDU(C__IC__NA__1, VSQ(1, 0), COT(6, 0, 0, 0), 3, [InfoObj(0, (20, ))], 'raw'))
+            assert (await asyncio.wait_for(unknown, 5)).asdu.trans_cause.pn == 1  # 未知的公共地址, 否定确认
+            master.close()
+        # 任意公共地址的信息点以主站召唤过的各公共地址突发上送
+        database = PointDatabase()
+        database.add_range(None, M__ME__NC__1, 100, 10)
+        async with Simulator(database, {M__ME__NC__1: 2000}) as simulator:
+            master = await connect('127.0.0.1', simulator.port, t2=0.01)
+            await master.startdt()
+            await asyncio.sleep(0.05)
+            assert master.image.updates == 0  # 尚未召唤时不上送
+            seen = set()
+            master.image.subscribe(lambda type_id, changes: seen.update(change.common_addr for change in changes))
+            for ca in (2, 5):
+                await master.interrogate(ca, timeout=5)
+            await asyncio.sleep(0.2)
+            assert master.image.updates > 20 + 100 and seen == {2, 5}
+            master.close()
+
+    asyncio.run(main())
+
+
+def test_bench_suite():
+    from data import TYPE_DESC
+    from bench import _sample_fields, compare, corpus, mixed_stream, suite
+    from unpack import from_bytes_to_apdus, unpack_apdu
+    for sq in (False, True):
+        frames = corpus(sq)
+        assert sorted(frame[6] for frame in frames) == sorted(TYPE_DESC)
+        for frame in frames:
+            asdu = unpack_apdu(frame, mode='raw').asdu
+            assert asdu.vsq.is_sq == sq
+            assert [tuple(obj.elems) for obj in asdu.info_objs] == [_sample_fields(asdu.type_id, i) for i in range(len(asdu.info_objs))]
+        assert [apdu.format for apdu in from_bytes_to_apdus(mixed_stream(frames[:8]), mode='raw')] == ['I'] * 4 + ['S'] + ['I'] * 4 + ['S', 'U', 'U']
+    results = suite(repeat=1, rounds=2)
+    assert {'from_bytes_to_apdus/raw/sq', 'unpack_asdu/full/set', 'pack_apdu_into/sq', 'station/interrogation'} <= set(results)
+    assert all(metrics['frames_per_s'] > 0 and metrics['p99_us'] > 0 for metrics in results.values())
+    assert compare(results, results) == []
+    slower = {name: dict(metrics, frames_per_s=metrics['frames_per_s'] * 2) for name, metrics in results.items()}
+    assert {name for name, key, _, _ in compare(results, slower)} == set(results)
+
+
+def test_metrics():
+    import asyncio
+    import socket
+    from data import M__ME__NC__1, M_SP_NA_1
+    from aiostation import StationPool
+    from bench import _bench_database, _capture
+    from metrics import Metrics, PrometheusSink, StatsdSink
+    from simulator import Simulator
+    from unpack import APDUFramer
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    prometheus, statsd = PrometheusSink(), StatsdSink(port=receiver.getsockname()[1])
+    metrics = Metrics(sinks=[prometheus, statsd])
+    framer = APDUFramer(mode='raw', metrics=metrics.connection('capture'))
+    assert len(list(framer.feed(_capture(10) + b'h\x04\x01\x00\x02\x00'))) == 11
+    snapshot = metrics.export()
+    assert snapshot['types'][M__ME__NC__1]['frames'] == 5 and snapshot['types'][M__ME__NC__1]['points'] == 240
+    assert snapshot['types'][M_SP_NA_1]['points'] == 300 and sum(snapshot['types'][M_SP_NA_1]['buckets']) == 5
+    assert snapshot['connections']['capture']['frames_in'] == 11
+    assert 'iec104_points_total{type_id="13"} 240' in prometheus.text
+    assert 'iec104_decode_seconds_count{type_id="1"} 5' in prometheus.text
+    assert set(receiver.recv(2048).decode().split('\n')) >= {'iec104.type.13.frames:5|c', 'iec104.connection.capture.frames_in:11|c'}
+    list(framer.feed(_capture(2)))
+    assert 'iec104.type.13.frames:1|c' in statsd.emit(metrics.snapshot())  # 增量
+    statsd.close()
+    receiver.close()
+
+    async def main():
+        simulator = Simulator(_bench_database())
+        await simulator.start()
+        pool = StationPool(backoff_min=0.01, metrics=metrics)
+        rtu = pool.add('rtu1', '127.0.0.1', simulator.port)
+        await pool.start()
+        [await asyncio.wait_for(rtu.get(), 5) for _ in range(3)]
+        await pool.stop()
+        await simulator.stop()
+
+    asyncio.run(main())
+    connection = metrics.snapshot()['connections']['rtu1']
+    assert connection['frames_in'] == 4 and connection['frames_out'] == 2  # STARTDT及总召唤的往返
+    assert connection['bytes_out'] == 6 + 16 and connection['bytes_in'] == 6 + 16 * 2 + 6 + 6 + 3 + 48 * 5
+    assert connection['seq_errors'] == 0
+
+
+def test_frametrace(tmp_path, caplog):
+    import logging
+    import socket
+    from frametrace import IN, OUT, FrameTrace, LazyFrame, read_trace
+    from pack import pack_apdu
+    from iec_types import APDU, ASDU, COT, InfoObj, VSQ
+    from station import BaseStation
+    path = str(tmp_path / 'station.trace')
+    with FrameTrace(path, slots=4) as trace:
+        for i in range(6):
+            trace.write(i % 2, bytes([0x68, 4, i, 0, 0, 0]))
+    assert [(direction, frame[2]) for _, direction, frame in read_trace(path)] == [(0, 2), (1, 3), (0, 4), (1, 5)]
+    with FrameTrace(path, slots=4) as trace:  # 接续写入
+        assert trace.written == 6
+        trace.sent(b'h\x04\x43\x00\x00\x00')
+    records = list(read_trace(path))
+    assert len(records) == 4 and records[-1][1:] == (OUT, b'h\x04\x43\x00\x00\x00')
+    assert records[0][0] <= records[-1][0]
+    assert str(LazyFrame(b'h\x04\x43\x00\x00\x00')) == 'U(TESTFR ACTIVATE)'
+
+    master_sock, peer = socket.socketpair()
+    trace = FrameTrace(str(tmp_path / 'station2.trace'), slots=16)
+    station = BaseStation(None, None, w=1, sock=master_sock, trace=trace)
+    asdu = ASDU(1, VSQ(1, 0), COT(3, 0, 0, 0), 1, [InfoObj(1, (1, ))], 'raw')
+    caplog.set_level(logging.INFO, logger='iec104.station')
+    peer.sendall(pack_apdu(APDU('I', 'TRANSMIT', 0, 0, asdu)))
+    station.recv()
+    assert not caplog.records  # DEBUG未启用时不生成报文描述
+    caplog.set_level(logging.DEBUG, logger='iec104.station')
+    peer.sendall(pack_apdu(APDU('I', 'TRANSMIT', 1, 0, asdu)))
+    station.recv()
+    assert [record.getMessage()[:3] for record in caplog.records] == ['接收:', '发送:']
+    assert caplog.records[0].station == (None, None)
+    peer.sendall(pack_apdu(APDU('I', 'TRANSMIT', 5, 0, asdu)))
+    station.recv()
+    assert caplog.records[-1].levelno == logging.WARNING
+    trace.close()
+    assert [direction for _, direction, _ in read_trace(trace.path)] == [IN, OUT, IN, OUT, IN]
+    peer.close()
+
+
+def test_speedups():
+    # 编译后的扩展模块与纯Python实现在同一语料上的输出须一致, 纯Python实现与struct的解析结果一致
+    import random
+    from struct import unpack
+    import pytest
+    from bench import _S_FRAME, _U_FRAMES, corpus
+    from iec_types import DEFAULT_PROFILE, LinkProfile
+    import unpack as module
+    pure, selected = module._load_speedups(pure=True), module._speedups
+    assert not pure.COMPILED and selected.COMPILED == module.SPEEDUPS
+    frames = corpus() + corpus(sq=True) + [_S_FRAME, *_U_FRAMES, b'h\x04\x07\x00\x00\x00', b'h\x04\x0b\x00\x00\x00']
+    for frame in frames:
+        for view in (frame, memoryview(frame)):
+            assert selected.unpack_apci(view) == pure.unpack_apci(view)
+        apci = pure.unpack_apci(frame)
+        if apci[0] == 'I':
+            assert apci[2:] == (unpack('<H', frame[2:4])[0] >> 1, unpack('<H', frame[4:6])[0] >> 1)
+            for profile in (DEFAULT_PROFILE, LinkProfile(1, 1, 2)):
+                assert selected.unpack_asdu_header(frame[6:], profile) == pure.unpack_asdu_header(frame[6:], profile)
+            assert selected.unpack_info_obj_addr(frame[12:15]) == pure.unpack_info_obj_addr(frame[12:15])
+    assert [pure.unpack_apci(frame)[1] for frame in frames[-4:]] == ['TESTFR ACTIVATE', 'TESTFR ACK', 'STARTDT ACTIVATE', 'STARTDT ACK']
+    rng = random.Random(23)
+    for _ in range(2000):
+        data = bytes(rng.randrange(256) for _ in range(7))
+        assert str(selected.unpack_float32(data)) == str(pure.unpack_float32(data)) == str(unpack('<f', data[:4])[0])  # 含nan
+        assert selected.unpack_CP24Time2a(data) == pure.unpack_CP24Time2a(data)
+        assert selected.unpack_CP56Time2a(data) == pure.unpack_CP56Time2a(data)
+        assert pure.unpack_CP56Time2a(data)['seconds'] == unpack('<H', data[:2])[0] / 1000
+        data = data[:5] + bytes((rng.randrange(1, 13), data[6]))
+        assert selected.CP56Time2a_to_ms(data) == pure.CP56Time2a_to_ms(data)
+    if not selected.COMPILED:
+        pytest.skip('未编译_speedups扩展模块(python setup.py build_ext --inplace), 上述比较为纯Python实现与自身')
+
+
+def test_byte_tables():
+    import copy
+    import json
+    import pickle
+    import pytest
+    from unpack import BYTE_TABLES, FrozenDict, unpack_COI, unpack_QOC, unpack_SCO, unpack_SIQ, unpack_SPE
+    from iec_types import SIQ
+    assert all(len(table) == 256 for table in BYTE_TABLES.values()) and len(BYTE_TABLES) >= 28
+    assert unpack_SIQ(0xc1) == SIQ.SPI | SIQ.NT | SIQ.IV and unpack_SIQ(0xff) is unpack_SIQ(0xff)
+    sco = unpack_SCO(0x81)
+    assert sco is unpack_SCO(0x81) and sco['命令限定词'] is unpack_QOC(0x81)
+    assert sco == {'单命令状态': '合', '命令限定词': {'命令限定词': '无另外的定义', '选择/执行': '选择'}}
+    assert str(sco) == str(dict(sco)) and json.loads(json.dumps(sco)) == sco
+    with pytest.raises(TypeError):
+        sco['单命令状态'] = '开'
+    with pytest.raises(TypeError):
+        unpack_COI(0).update({})
+    for clone in (copy.copy(sco), copy.deepcopy(sco), pickle.loads(pickle.dumps(sco))):
+        assert clone == sco and isinstance(clone, FrozenDict)
+    assert len(unpack_SPE(0b111111)) == 6  # 各相的启动各为一项
+
+
+def test_file_transfer(tmp_path):
+    import asyncio
+    import io
+    import pytest
+    from aiostation import connect
+    from bench import _bench_database
+    from data import F_DR_TA_1, F_SG_NA_1
+    from filetransfer import DirectoryRequest, FileServer, FileTransfer, FileTransferError, FileTransfers, checksum
+    from iec_types import ASDU, COT, InfoObj, VSQ
+    from pack import pack_asdu
+    from simulator import Simulator
+    from station import ControlStation
+    from unpack import unpack_asdu
+    data = bytes(range(256)) * 1000
+    assert checksum(data) == checksum(data[1000:], checksum(data[:1000])) == sum(data) % 256
+
+    # 不经网络收发, 第一个段在第一次发送时被篡改
+    def run(transfer):
+        server = FileServer({(5, 1): data}, section_size=10000)
+        files = FileTransfers()
+        corrupted = False
+        pending = files.start(transfer)
+        while pending:
+            responses = []
+            for asdu in pending:
+                for response in server.asdu_received(unpack_asdu(pack_asdu(asdu), mode='raw')):
+                    frame = bytearray(pack_asdu(response))
+                    if response.type_id == F_SG_NA_1 and not corrupted:
+                        frame[-1] ^= 0xff
+                        corrupted = True
+                    responses += files.asdu_received(unpack_asdu(bytes(frame), mode='raw'))
+            pending = responses
+        assert not files.transfers and not server.readings
+        return transfer
+    # 输出端可定位时回退并重新召唤该节
+    sink = io.BytesIO()
+    transfer = run(FileTransfer(1, 5, 1, sink))
+    assert transfer.state == 'finished' and transfer.retries == 2
+    assert sink.getvalue() == data and len(transfer.sections) == 26
+    # 否则传输失败
+    transfer = run(FileTransfer(1, 5, 1, lambda segment: None))
+    assert transfer.state == 'failed' and transfer.error == '节1校验和错误' and transfer.received == 10000
+    # 目录项的时标无效时为None
+    directory = DirectoryRequest(1)
+    directory.asdu_received(ASDU(F_DR_TA_1, VSQ(1, 0), COT(5, 0, 0, 0), 1, [InfoObj(5, (1, b'\x10\x00\x00', 0x20, bytes(7)))], 'raw'))
+    assert directory.finished and directory.entries == [(5, 1, 16, 0x20, None)]
+
+    async def main():
+        path = tmp_path / 'record.dat'
+        path.write_bytes(data[:70000])
+        files = {(5, 1): data, (5, 2): str(path)}
+        async with Simulator(_bench_database(), files=files, section_size=30000, t2=0.01) as simulator:
+            master = await connect('127.0.0.1', simulator.port, t2=0.01)
+            entries = await master.read_directory(1, timeout=5)
+            assert [(entry.addr, entry.nof, entry.length) for entry in entries] == [(5, 1, 256000), (5, 2, 70000)]
+
+            async def collect():
+                chunks = []
+                async for segment in master.iter_file(1, 5, 2, timeout=5, limit=8):
+                    chunks.append(bytes(segment))
+                    await asyncio.sleep(0)
+                return b''.join(chunks)
+            output = tmp_path / 'copy.dat'
+            transfer, streamed = await asyncio.gather(master.read_file(1, 5, 1, str(output), timeout=5), collect())
+            assert output.read_bytes() == data and transfer.received == 256000 and len(transfer.sections) == 9
+            assert streamed == data[:70000]
+            with pytest.raises(FileTransferError, match='未准备就绪'):
+                await master.read_file(1, 5, 3, io.BytesIO(), timeout=5)
+            assert not master.files.transfers and not master.files.directories
+            master.close()
+            # 同步的主站, 发送窗口为1时应答在send()等待确认期间接收的报文之后依次发送
+            loop = asyncio.get_running_loop()
+            station = await loop.run_in_executor(None, lambda: ControlStation('127.0.0.1', simulator.port, k=1, w=1, t2=0.01))
+            sink = io.BytesIO()
+            transfer = await loop.run_in_executor(None, station.transmit_file, 1, 5, 2, sink, 5)
+            assert sink.getvalue() == data[:70000] and transfer.state == 'finished'
+            station.tcp_sock.close()
+
+    asyncio.run(main())
+
+
+def test_sequence_window():
+    import socket
+    from pack import pack_apdu
+    from iec_types import APDU, ASDU, COT, InfoObj, VSQ
+    from station import BaseStation
+    master_sock, peer = socket.socketpair()
+    station = BaseStation(None, None, k=12, w=8, t2=0.05, sock=master_sock)
+    asdu = ASDU(1, VSQ(1, 0), COT(3, 0, 0, 0), 1, [InfoObj(1, (1, ))], 'raw')
+    for i in range(20):
+        peer.sendall(pack_apdu(APDU('I', 'TRANSMIT', i, 0, asdu)))
+        station.recv()
+    # 每接收8个I格式报文合并确认一次, 余下的4个在t2超时后确认
+    assert peer.recv(1024) == b'h\x04\x01\x00\x10\x00' + b'h\x04\x01\x00\x20\x00'
+    assert station.window.unacked_recv == 4
+    station.recv()
+    assert peer.recv(1024) == b'h\x04\x01\x00\x28\x00'
+    assert station.window.unacked_recv == 0 and station.vs == 0
+    master_sock.close()
+    peer.close()
+
+
+def test_connection_closed():
+    import socket
+    import pytest
+    from pack import pack_apdu
+    from iec_types import APDU, ASDU, COT, InfoObj, VSQ
+    from station import BaseStation
+    asdu = ASDU(1, VSQ(1, 0), COT(3, 0, 0, 0), 1, [InfoObj(1, (1, ))], 'raw')
+    # 发送窗口已满时对端关闭, 不再无限等待确认
+    master_sock, peer = socket.socketpair()
+    station = BaseStation(None, None, k=1, w=1, sock=master_sock)
+    station.send('I', asdu_bytes=b'\x01\x01\x03\x00\x01\x00\x01\x00\x00\x01')
+    peer.close()
+    with pytest.raises(ConnectionError):
+        station.send('I', asdu_bytes=b'\x01\x01\x03\x00\x01\x00\x01\x00\x00\x01')
+    master_sock.close()
+    # 顺序错误时主动关闭, 只返回已接受的报文, 不再发送确认
+    master_sock, peer = socket.socketpair()
+    station = BaseStation(None, None, k=12, w=1, sock=master_sock)
+    peer.sendall(pack_apdu(APDU('I', 'TRANSMIT', 0, 0, asdu)) + pack_apdu(APDU('I', 'TRANSMIT', 5, 0, asdu)))
+    apdus = station.recv()
+    assert [apdu.send for apdu in apdus] == [0] and master_sock.fileno() == -1
+    with pytest.raises(ConnectionError):
+        station.recv()
+    peer.close()
+
+
+def test_window_over_delayed_link():
+    import asyncio
+    from aiostation import AsyncControlStation, AsyncStation, connect
+    from data import M_SP_NA_1
+    from iec_types import ASDU, COT, InfoObj, VSQ
+    frames, delay = 240, 0.005
+
+    async def pipe(reader, writer):
+        # 单向延时转发, 模拟链路时延
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                loop.call_later(delay, writer.write, data)
+        finally:
+            loop.call_later(delay, writer.close)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        class CountingMaster(AsyncControlStation):
+            received = s_frames = 0
+            def asdu_received(self, asdu):
+                self.received += 1
+                if self.received == frames:
+                    done.set_result(None)
+            def send_s(self):
+                self.s_frames += 1
+                super().send_s()
+
+        outstations = []
+        def outstation():
+            outstations.append(AsyncStation(k=12, w=8))
+            return outstations[-1]
+
+        server = await loop.create_server(outstation, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+
+        async def handle(reader, writer):
+            upstream_reader, upstream_writer = await asyncio.open_connection('127.0.0.1', port)
+            await asyncio.gather(pipe(reader, upstream_writer), pipe(upstream_reader, writer), return_exceptions=True)
+
+        proxy = await asyncio.start_server(handle, '127.0.0.1', 0)
+        master = await connect('127.0.0.1', proxy.sockets[0].getsockname()[1], station_class=CountingMaster, k=12, w=8)
+        await master.startdt()
+        asdu = ASDU(M_SP_NA_1, VSQ(1, 0), COT(3, 0, 0, 0), 1, [InfoObj(1, (1, ))], 'raw')
+        for _ in range(frames):
+            outstations[0].send_asdu(asdu)
+        await asyncio.wait_for(done, 60)
+        master.close()
+        await asyncio.sleep(delay * 4 + 0.01)  # 等待代理两侧依次关闭
+        proxy.close()
+        server.close()
+        return master
+
+    master = asyncio.run(main())
+    assert master.received == frames
+    assert master.s_frames == frames // 8  # 确认合并, 每8帧一个S格式报文
+
+
 def test_station():
     from station import ControlStation
     s = ControlStation(ip='192.168.0.42', port=2404)
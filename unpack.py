@@ -2,105 +2,136 @@
 # 参考协议：
 # 1. `IEC 60870-5-101` (传输规约基本远动任务配套标准)
 # 2. `GB/T 18657.4-2002` (应用信息元素的定义和编码)
-from math import log2
-from struct import unpack
+import importlib.util
+import os
+from array import array
+from struct import Struct, unpack
+from time import perf_counter_ns
+from typing import NamedTuple
+
+try:
+    import numpy
+except ImportError:  # numpy为可选依赖, 缺失时按列解析退化为array实现
+    numpy = None
 
 from data import *
-from iec_types import APDU, ASDU
+from iec_types import *
+
+
+def _load_speedups(pure: bool = False):
+    """加载_speedups: 已编译为扩展模块时优先加载扩展模块, pure为真时强制加载纯Python源码"""
+    if not pure:
+        import _speedups
+        return _speedups
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '_speedups.py')
+    spec = importlib.util.spec_from_file_location('_speedups_pure', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+_speedups = _load_speedups(os.environ.get('IEC104_PURE_PYTHON') == '1')
+SPEEDUPS = _speedups.COMPILED  # 是否使用编译后的解析热点
 
 
 ################################ 数值解析 ################################
-def unpack_info_obj_addr(data: bytes):
-    """解析 地址信息"""
-    return unpack('<I', data + (4 - len(data)) * b'\x00')[0]
+unpack_info_obj_addr = _speedups.unpack_info_obj_addr  # 解析 地址信息
+
+
+class FrozenDict(dict):
+    """只读的dict, 比较、输出及JSON序列化与dict相同"""
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('解析结果在各次调用间共享, 不可修改, 请先复制为dict')
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _readonly
+
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self), )
 
 
-def unpack_Q(data: int):
-    """品质描述词公有信息"""
-    qual = []
-    if data & 0b10000:
-        qual.append('BL')
-    if data & 0b100000:
-        qual.append('SB')
-    if data & 0b1000000:
-        qual.append('NT')
-    if data & 0b10000000:
-        qual.append('IV')
-    return qual
+def _freeze(result):
+    """将解析结果中的dict及list转换为不可变对象"""
+    if isinstance(result, FrozenDict):
+        return result  # 其他解析表中的共享结果
+    if isinstance(result, dict):
+        return FrozenDict({key: _freeze(val) for key, val in result.items()})
+    if isinstance(result, list):
+        return tuple([_freeze(val) for val in result])
+    return result
+
+
+"""单字节解析函数名 -> 全部256个取值的解析结果"""
+BYTE_TABLES = {}
+
+
+def _byte_table(decode):
+    """单字节解析函数的装饰器
+
+    导入时对全部256个取值预先解析并冻结, 解析函数替换为结果表的索引,
+    解析时不再重复位运算及构造dict, 相同取值的结果为同一个共享对象
+    """
+    table = BYTE_TABLES[decode.__name__] = tuple([_freeze(decode(i)) for i in range(256)])
+    return table.__getitem__
 
 
 # 7.2.6.1
-def unpack_SIQ(data: int):
+@_byte_table
+def unpack_SIQ(data: int) -> SIQ:
     """解析 带品质描述词的单点信息"""
-    SIQ = unpack_Q(data)
-    if data & 0b1:
-        SIQ.append('SPI')
-    return SIQ
+    return SIQ(data & 0b11110001)
 
 
 # 7.2.6.2
-def unpack_DIQ(data: int):
+@_byte_table
+def unpack_DIQ(data: int) -> DIQ:
     """解析 带品质描述词的双点信息"""
-    DIQ = unpack_Q(data)
-    DIQ.append(('不确定或中间状态', '确定状态开', '确定状态合', '不确定')[data & 0b11])
-    return DIQ
+    return DIQ(data & 0b11110011)
 
 
 # 7.2.6.3
-def unpack_QDS(data: int):
+@_byte_table
+def unpack_QDS(data: int) -> QDS:
     """解析 品质描述词"""
-    QDS = unpack_Q(data)
-    if data & 0b1:
-        QDS.append('OV')
-    return QDS
+    return QDS(data & 0b11110001)
 
 
 # 7.2.6.4
-def unpack_QDP(data: int):
+@_byte_table
+def unpack_QDP(data: int) -> QDP:
     """解析 继电保护设备事件的品质描述词"""
-    QDP = unpack_Q(data)
-    if data & 0b1:
-        QDP.append('EI')
-    return QDP
+    return QDP(data & 0b11111000)
 
 
 # 7.2.6.5
+@_byte_table
 def unpack_VTI(data: int):
     """解析 带瞬变状态指示的值"""
     val = data & 0b1111111  # 取后七位
-    val <<= 1  # 左移一位
-    val = unpack('b', val)[0]  # 以有符号单字节整型解析
-    val >>= 1  # 右移一位
+    if val & 0b1000000:
+        val -= 0b10000000  # 七位有符号整型
     return {
         '值': val, 
-        '瞬变状态': '设备处于瞬变状态' if data & 0b1 else '设备未在瞬变状态', 
+        '瞬变状态': '设备处于瞬变状态' if data & 0b10000000 else '设备未在瞬变状态', 
     }
 
 
 # 7.2.6.6
 def unpack_NVA(data: bytes):
     """解析 规一化值"""
-    if data[0] & 0b10000000 == 0b10000000:
-        # 标志位为1时
-        if data[0] == 0b10000000 and data[1] == 0b0:
-            return -1
-        else:
-            return unpack('>H', data) / 32768
-    else:
-        # 标志位为0时
-        return unpack('>H', data) / 32768
+    return unpack('<h', data)[0] / 32768  # 以-1为下限的定点小数
 
 
 # 7.2.6.7
 def unpack_SVA(data: bytes):
     """解析 标度化值"""
-    return unpack('>h', data)[0]
+    return unpack('<h', data)[0]
 
 
 # 7.2.6.8
-def unpack_float32(data: bytes):
-    """解析 短浮点数 (短浮点数定义于IEEE 754)"""
-    return unpack('<f', data)[0]  # 标准定义直接解析即可
+unpack_float32 = _speedups.unpack_float32
 
 
 # 7.2.6.9
@@ -109,8 +140,8 @@ def unpack_BCR(data: bytes):
     I32 = data[:4]
     CP8 = data[4]
     return {
-        '计数器读数': unpack('<i', I32), 
-        '顺序号': unpack('B', CP8 & 0b11111), 
+        '计数器读数': unpack('<i', I32)[0], 
+        '顺序号': CP8 & 0b11111, 
         '进位': '计数器溢出' if CP8 & 0b100000 else '计数器未溢出', 
         '计数量是否被调整': '计数器被调整' if CP8 & 0b1000000 else '计数器未被调整', 
         '有无效': '无效' if CP8 & 0b10000000 else '有效', 
@@ -118,29 +149,28 @@ def unpack_BCR(data: bytes):
 
 
 # 7.2.6.10
-def unpack_SEP(data: int):
+@_byte_table
+def unpack_SEP(data: int) -> SEP:
     """解析 继电保护设备单个事件"""
-    SEP = unpack_Q(data)
-    SEP.append(('不确定或中间状态', '确定状态开', '确定状态合', '不确定')[data & 0b11])
-    if data & 0b1000:
-        SEP.append('EI')
-    return SEP
+    return SEP(data & 0b11111011)
 
 
 # 7.2.6.11
+@_byte_table
 def unpack_SPE(data: int):
     """解析 继电保护设备启动事件"""
     return {
         '总启动': '总启动' if data & 0b1 else '无总启动', 
-        '总启动': 'A相保护启动' if data & 0b10 else 'A相保护未启动', 
-        '总启动': 'B相保护启动' if data & 0b100 else 'B相保护未启动', 
-        '总启动': 'C相保护启动' if data & 0b1000 else 'C相保护未启动', 
-        '总启动': '接地电流保护启动' if data & 0b10000 else '接地电流保护未启动', 
-        '总启动': '反向保护启动' if data & 0b100000 else '反向保护未启动', 
+        'A相保护启动': 'A相保护启动' if data & 0b10 else 'A相保护未启动', 
+        'B相保护启动': 'B相保护启动' if data & 0b100 else 'B相保护未启动', 
+        'C相保护启动': 'C相保护启动' if data & 0b1000 else 'C相保护未启动', 
+        '接地电流保护启动': '接地电流保护启动' if data & 0b10000 else '接地电流保护未启动', 
+        '反向保护启动': '反向保护启动' if data & 0b100000 else '反向保护未启动', 
     }
 
 
 # 7.2.6.12
+@_byte_table
 def unpack_OCI(data: int):
     """解析 继电保护设备输出电路信息"""
     return {
@@ -154,7 +184,7 @@ def unpack_OCI(data: int):
 # 7.2.6.13
 def unpack_BSI(data: bytes):
     """解析 二进制状态信息"""
-    return ''.join([bin(data[i]).strip('0b') for i in range(4)])
+    return ''.join([format(data[i], '08b') for i in range(4)])
 
 
 # 7.2.6.14
@@ -163,7 +193,30 @@ def unpack_FBP(data: bytes):
     return unpack('<H', data)[0]
 
 
+# 7.2.6.26 (单命令、双命令及步调节命令的解析表由其生成, 故先于7.2.6.15定义)
+@_byte_table
+def unpack_QOC(data: int):
+    """解析 命令限定词"""
+    QU = (data & 0b01111100) >> 2
+    if QU == 0:
+        qu = '无另外的定义'
+    elif QU == 1:
+        qu = '短脉冲持续时间，持续由被控站内系统参数所确定'
+    elif QU == 2:
+        qu = '长脉冲持续时间，持续由被控站内系统参数所确定'
+    elif QU == 3:
+        qu = '持续输出'
+    elif 4 <= QU <= 8:
+        qu = '标准定义%s(兼容)' % QU
+    elif 9 <= QU <= 15:
+        qu = '预定义功能%s' % QU
+    elif 16 <= QU <= 31:
+        qu = '特定功能%s(专用)' % QU
+    return {'命令限定词': qu, '选择/执行': '选择' if data & 0b10000000 else '执行'}
+
+
 # 7.2.6.15
+@_byte_table
 def unpack_SCO(data: int):
     """解析 单命令"""
     return {
@@ -173,6 +226,7 @@ def unpack_SCO(data: int):
 
 
 # 7.2.6.16
+@_byte_table
 def unpack_DCO(data: int):
     """解析 双命令"""
     return {
@@ -182,6 +236,7 @@ def unpack_DCO(data: int):
 
 
 # 7.2.6.17
+@_byte_table
 def unpack_RCO(data: int):
     """解析 步调节命令"""
     return {
@@ -191,26 +246,40 @@ def unpack_RCO(data: int):
 
 
 # 7.2.6.18
-def unpack_CP56Time2a(data: bytes):
-    """解析 七个八位位组二进制时间 该时间为增量时间信息，其增量的参考日期协商确定"""
-    cp56time = unpack_CP24Time2a(data[:3])
-    cp56time['hour'] = data[3] & 0b11111
-    cp56time['st'] = data[3] & 0b10000000
-    cp56time['day'] = data[4] & 0b11111
-    cp56time['weekday'] = data[4] & 0b11100000
-    cp56time['month'] = data[5] & 0b1111
-    cp56time['year'] = data[6] & 0b1111111
-    return cp56time
+unpack_CP56Time2a = _speedups.unpack_CP56Time2a
+_MONTH_BASE = _speedups.MONTH_BASE  # (年, 月) -> 该月1日0时的毫秒时间戳
+_month_base = _speedups.month_base
+CP56Time2a_to_ms = _speedups.CP56Time2a_to_ms  # 七个八位位组二进制时间对应的毫秒时间戳
+
+
+def CP56Time2a_to_ms_array(data: bytes, offset: int = 0, stride: int = 7, count: int = None):
+    """批量转换等间隔排列的CP56Time2a, 第i个时标位于offset + i * stride
+
+    安装numpy时以数组运算完成并返回int64数组, 否则返回array('q'); 数据长度不足count个时标时引发ValueError
+    """
+    if count is None:
+        count = (len(data) - offset - 7) // stride + 1 if len(data) - offset >= 7 else 0
+    elif count and offset + (count - 1) * stride + 7 > len(data):
+        raise ValueError('数据长度不足: %d个时标需要%d字节, 实际%d字节' % (count, offset + (count - 1) * stride + 7, len(data)))
+    if numpy is None or not count:
+        return array('q', [CP56Time2a_to_ms(data, offset + i * stride) for i in range(count)])
+    rows = numpy.lib.stride_tricks.as_strided(
+        numpy.frombuffer(data, dtype=numpy.uint8, count=(count - 1) * stride + 7, offset=offset),
+        shape=(count, 7), strides=(stride, 1)).astype(numpy.int64)
+    year_month = (rows[:, 6] & 0b1111111) << 4 | (rows[:, 5] & 0b1111)
+    keys, inverse = numpy.unique(year_month, return_inverse=True)
+    bases = numpy.array([
+        _MONTH_BASE.get((key >> 4, key & 0b1111)) or _month_base(key >> 4, key & 0b1111) for key in keys.tolist()],
+        dtype=numpy.int64)
+    return (bases[inverse]
+            + ((rows[:, 4] & 0b11111) - 1) * 86400000
+            + (rows[:, 3] & 0b11111) * 3600000
+            + (rows[:, 2] & 0b111111) * 60000
+            + (rows[:, 0] | rows[:, 1] << 8))
 
 
 # 7.2.6.19
-def unpack_CP24Time2a(data: bytes):
-    """解析 三个八位位组二进制时间 该时间为增量时间信息，其增量的参考日期协商确定"""
-    return {
-        'seconds': unpack_CP16Time2a(data), 
-        'minutes': data[2] & 0b111111, 
-        'IV': True if data[2] & 0b10000000 else False,  # 有效无效
-    }
+unpack_CP24Time2a = _speedups.unpack_CP24Time2a
 
 
 # 7.2.6.20
@@ -220,6 +289,7 @@ def unpack_CP16Time2a(data: bytes):
 
 
 # 7.2.6.21
+@_byte_table
 def unpack_COI(data: int):
     """解析 初始化原因"""
     UI7 = data & 0b1111111
@@ -241,6 +311,7 @@ def unpack_COI(data: int):
 
 
 # 7.2.6.22
+@_byte_table
 def unpack_QOI(data: int):
     """解析 召唤限定词"""
     UI8 = data
@@ -259,6 +330,7 @@ def unpack_QOI(data: int):
 
 
 # 7.2.6.23
+@_byte_table
 def unpack_QCC(data: int):
     """解析 计数量召唤命令限定词"""
     RQT = data & 0b111111
@@ -279,6 +351,7 @@ def unpack_QCC(data: int):
 
 
 # 7.2.6.24
+@_byte_table
 def unpack_QPM(data: int):
     """解析 测量值参数限定词"""
     KPA = data & 0b111111
@@ -306,6 +379,7 @@ def unpack_QPM(data: int):
 
 
 # 7.2.6.25
+@_byte_table
 def unpack_QPA(data: int):
     """解析 参数激活限定词"""
     QPA = data
@@ -323,28 +397,8 @@ def unpack_QPA(data: int):
         return '特定参数激活限定词%s' % QPA
 
 
-# 7.2.6.26
-def unpack_QOC(data: int):
-    """解析 命令限定词"""
-    QU = (data & 0b01111100) >> 2
-    if QU == 0:
-        qu = '无另外的定义'
-    elif QU == 1:
-        qu = '短脉冲持续时间，持续由被控站内系统参数所确定'
-    elif QU == 2:
-        qu = '长脉冲持续时间，持续由被控站内系统参数所确定'
-    elif QU == 3:
-        qu = '持续输出'
-    elif 4 <= QU <= 8:
-        qu = '标准定义%s(兼容)' % QU
-    elif 9 <= QU <= 15:
-        qu = '预定义功能%s' % QU
-    elif 16 <= QU <= 31:
-        qu = '特定功能%s(专用)' % QU
-    return {'命令限定词': qu, '选择/执行': '选择' if data & 0b10000000 else '执行'}
-
-
 # 7.2.6.27
+@_byte_table
 def unpack_QRP(data: int):
     """解析 复位进程命令限定词"""
     QRP = data
@@ -361,6 +415,7 @@ def unpack_QRP(data: int):
 
 
 # 7.2.6.28
+@_byte_table
 def unpack_FRQ(data: int):
     """解析 文件准备就绪限定词"""
     FRQ = data & 0b1111111
@@ -378,6 +433,7 @@ def unpack_FRQ(data: int):
 
 
 # 7.2.6.29
+@_byte_table
 def unpack_SRQ(data: int):
     """解析 节准备就绪限定词"""
     SRQ = data & 0b1111111
@@ -395,6 +451,7 @@ def unpack_SRQ(data: int):
 
 
 # 7.2.6.30
+@_byte_table
 def unpack_SCQ(data: int):
     """解析 选择和召唤限定词"""
     Word = data & 0b1111
@@ -440,6 +497,7 @@ def unpack_SCQ(data: int):
 
 
 # 7.2.6.31
+@_byte_table
 def unpack_LSQ(data: int):
     """解析 最后的节和段的限定词"""
     LSQ = data
@@ -460,6 +518,7 @@ def unpack_LSQ(data: int):
 
 
 # 7.2.6.32
+@_byte_table
 def unpack_AFQ(data: int):
     """解析 文件认可或节认可限定词"""
     Word = data & 0b1111
@@ -500,11 +559,12 @@ def unpack_AFQ(data: int):
 
 # 7.2.6.33
 def unpack_NOF(data: int):
-    """解析 文件名称"""
+    """解析 文件名称, 两个八位位组"""
     return data if data else '缺省'
 
 
 # 7.2.6.34
+@_byte_table
 def unpack_NOS(data: int):
     """解析 节名称"""
     return data if data else '缺省'
@@ -512,23 +572,26 @@ def unpack_NOS(data: int):
 
 # 7.2.6.35
 def unpack_LOF(data: bytes):
-    """解析 文件或节的长度"""
-    return unpack('<I', data)[0]
+    """解析 文件或节的长度, 三个八位位组"""
+    return int.from_bytes(data, 'little')
 
 
 # 7.2.6.36
+@_byte_table
 def unpack_LOS(data: int):
     """解析 段的长度"""
     return data
 
 
 # 7.2.6.37
+@_byte_table
 def unpack_CHS(data: int):
     """解析 校验和"""
     return data
 
 
 # 7.2.6.38
+@_byte_table
 def unpack_SOF(data: int):
     """解析 文件状态"""
     STATUS = data & 0b11111
@@ -550,6 +613,7 @@ def unpack_SOF(data: int):
 
 
 # 7.2.6.39
+@_byte_table
 def unpack_QOS(data: int):
     """解析 设定命令限定词"""
     QL = data & 0b1111111
@@ -569,369 +633,455 @@ def unpack_QOS(data: int):
 def unpack_SCD(data: bytes):
     """解析 状态和状态变位检出"""
     return  {
-        '开(0)/合(1)': bin(data[1]).strip('0b') + bin(data[0]).strip('0b'), 
-        '上次报告后未检出(0)/至少检出一次(1)到的状态变化': bin(data[3]).strip('0b') + bin(data[2]).strip('0b'), 
+        '开(0)/合(1)': format(data[1], '08b') + format(data[0], '08b'), 
+        '上次报告后未检出(0)/至少检出一次(1)到的状态变化': format(data[3], '08b') + format(data[2], '08b'), 
     }
 
 
 ################################ 基于类型标识的应用数据单元解析 ################################
-def unpack_info_elems(type_id: int, data: bytes):
-    """解析一个类型标识为type_id的信息元素集"""
-    ############## 在监视方向过程信息的应用服务数据单元 ##############
-    if type_id == M_SP_NA_1:
-        # 7.3.1.1 单点信息
-        return unpack_SIQ(data[0])
+class ElemLayout(NamedTuple):
+    """信息元素集的解析布局"""
+    struct: Struct  # 预编译结构, 长度可变时为None
+    size: int  # 信息元素集字节数, 长度可变时为None
+    decode: object  # decode(data, offset) -> 可读的信息元素集
+    raw: object  # raw(data, offset) -> 原始数值元组
+    describe: object  # describe(原始数值元组) -> 可读的信息元素集
 
-    elif type_id == M__SP__TA__1:
-        # 7.3.1.2 带时标的单点信息
-        return unpack_SIQ(data[0]), unpack_CP24Time2a(data[1:4])
 
-    elif type_id == M__DP__NA__1:
-        # 7.3.1.3 不带时标的双点信息
-        return unpack_DIQ(data[0])
+def _same(data):
+    """不需要进一步解析的信息元素"""
+    return data
 
-    elif type_id == M__DP__TA__1:
-        # # 7.3.1.4 带时标的双点信息
-        return unpack_DIQ(data[0]), unpack_CP24Time2a(data[1:4])
 
-    elif type_id == M__ST__NA__1:
-        # 7.3.1.5 不带时标的步位置信息
-        return unpack_VTI(data[0]), unpack_QDS(data[1])
+def _NVA(data: int):
+    """规一化值(原始数值)"""
+    return data / 32768
 
-    elif type_id == M__ST__TA__1:
-        # 7.3.1.6 带时标的步位置信息
-        return unpack_VTI(data[0]), unpack_QDS(data[1]), unpack_CP24Time2a(data[2:5])
 
-    elif type_id == M__BO__NA__1:
-        # 7.3.1.7 32比特串
-        return unpack_BSI(data[0:4]), unpack_QDS(data[4])
-    
-    elif type_id == M__BO__TA__1:
-        # 7.3.1.8 带时标的32比特串
-        return unpack_BSI(data[0:4]), unpack_QDS(data[4]), unpack_CP24Time2a(data[5:8])
-    
-    elif type_id == M__ME__NA__1:
-        # 7.3.1.9 测量值，规一化值
-        return unpack_NVA(data[0:2]), unpack_QDS(data[2])
-    
-    elif type_id == M__ME__TA__1:
-        # 7.3.1.10 测量值，带时标的规一化值
-        return unpack_NVA(data[0:2]), unpack_QDS(data[2]), unpack_CP24Time2a(data[3:6])
-    
-    elif type_id == M__ME__NB__1:
-        # 7.3.1.11 测量值，标度化值
-        return unpack_SVA(data[0:2]), unpack_QDS(data[2])
-    
-    elif type_id == M__ME__TB__1:
-        # 7.3.1.12 测量值，带时标的标度化值
-        return unpack_SVA(data[0:2]), unpack_QDS(data[2]), unpack_CP24Time2a(data[3:6])
+def _CP16Time2a(data: int):
+    """二个八位位组二进制时间(原始数值), 单位：秒(s)"""
+    return data / 1000
 
-    elif type_id == M__ME__NC__1:
-        # 7.3.1.13 测量值，短浮点数
-        return unpack_float32(data[:4]), unpack_QDS(data[4])
-    
-    elif type_id == M__ME__TC__1:
-        # 7.3.1.14 测量值，带时标短浮点数
-        return unpack_float32(data[:4]), unpack_QDS(data[4]), unpack_CP24Time2a(data[5:8])
-    
-    elif type_id == M__IT__NA__1:
-        # 7.3.1.15 累计量
-        return unpack_BCR(data[:5])
-    
-    elif type_id == M__IT__TA__1:
-        # 7.3.1.16 带时标的累计量
-        return unpack_BCR(data[:5]), unpack_CP24Time2a(data[5:8])
-    
-    elif type_id == M__EP__TA__1:
-        # 7.3.1.17 带时标的继电保护设备事件
-        return unpack_SEP(data[0]), unpack_CP16Time2a(data[1:3]), unpack_CP24Time2a(data[3:6])
-    
-    elif type_id == M__EP__TB__1:
-        # 7.3.1.18 带时标的继电保护设备成组启动事件
-        return unpack_SPE(data[0]), unpack_QDP(data[1]), unpack_CP16Time2a(data[2:4]), unpack_CP24Time2a(data[4:7])
-    
-    elif type_id == M__EP__TC__1:
-        # 7.3.1.19 带时标的继电保护设备成组输出电路信息
-        return unpack_OCI(data[0]), unpack_QDP(data[1]), unpack_CP16Time2a(data[2:4]), unpack_CP24Time2a(data[4:7])
-    
-    elif type_id == M__PS__NA__1:
-        # 7.3.1.20 带变位检出的成组单点信息
-        return unpack_SCD(data[0:4]), unpack_QDS(data[4])
-    
-    elif type_id == M__ME__ND__1:
-        # 7.3.1.21 测量值，不带品质描述词的规一化值
-        return unpack_NVA(data[0:2])
-    
-    elif type_id == M__SP__TB__1:
-        # 7.3.1.22 带时标CP56Time2a的单点信息
-        return unpack_SIQ(data[0]), unpack_CP56Time2a(data[1:8])
-    
-    elif type_id == M__DP__TB__1:
-        # 7.3.1.23 带时标CP56Time2a的双点信息
-        return unpack_DIQ(data[0]), unpack_CP56Time2a(data[1:8])
-    
-    elif type_id == M__ST__TB__1:
-        # 7.3.1.24 带时标的步位置信息
-        return unpack_VTI(data[0]), unpack_QDS(data[1]), unpack_CP56Time2a(data[2:9])
-    
-    elif type_id == M__BO__TB__1:
-        # 7.3.1.25 带时标CP56Time2a的32比特串
-        return unpack_BSI(data[0:4]), unpack_QDS(data[4]), unpack_CP56Time2a(data[5:12])
-    
-    elif type_id == M__ME__TD__1:
-        # 7.3.1.26 测量值，带时标CP56Time2a的规一化值
-        return unpack_NVA(data[0:2]), unpack_QDS(data[2]), unpack_CP56Time2a(data[3:10])
-    
-    elif type_id == M__ME__TE__1:
-        # 7.3.1.27 测量值，带时标CP56Time2a的标度化值
-        return unpack_SVA(data[0:2]), unpack_QDS(data[2]), unpack_CP56Time2a(data[3:10])
-    
-    elif type_id == M__ME__TF__1:
-        # 7.3.1.28 测量值，带时标CP56Time2a的短浮点数
-        return unpack_float32(data[0:4]), unpack_QDS(data[4]), unpack_CP56Time2a(data[5:12])
-    
-    elif type_id == M__IT__TB__1:
-        # 7.3.1.29 带时标CP56Time2a的累计量
-        return unpack_BCR(data[0:5]), unpack_CP56Time2a(data[5:12])
-    
-    elif type_id == M__EP__TD__1:
-        # 7.3.1.30 带时标CP56Time2a的继电保护设备事件
-        return unpack_SEP(data[0]), unpack_CP16Time2a(data[1:3]), unpack_CP56Time2a(data[3:10])
-    
-    elif type_id == M__EP__TE__1:
-        # 7.3.1.31 带时标CP56Time2a的继电保护设备成组启动事件
-        return unpack_SPE(data[0]), unpack_QDP(data[1]), unpack_CP16Time2a(data[2:4]), unpack_CP56Time2a(data[4:11])
-    
-    elif type_id == M__EP__TF__1:
-        # 7.3.1.32 带时标CP56Time2a的继电保护设备成组输出电路信息
-        return unpack_OCI(data[0]), unpack_QDP(data[1]), unpack_CP16Time2a(data[2:4]), unpack_CP56Time2a(data[4:11])
-    
-    ############## 在控制方向过程信息的应用服务数据单元 ##############
-    elif type_id == C__SC__NA__1:
-        # 7.3.2.1 单命令
-        return unpack_SCO(data[0])
 
-    elif type_id == C__DC__NA__1:
-        # 7.3.2.2 双命令
-        return unpack_DCO(data[0])
-    
-    elif type_id == C__RC__NA__1:
-        # 7.3.2.3 步调节命令
-        return unpack_RCO(data[0])
-    
-    elif type_id == C__SE__NA__1:
-        # 7.3.2.4 设定命令，规一化值
-        return unpack_NVA(data[0:2]), unpack_QOS(data[2])
-    
-    elif type_id == C__SE__NB__1:
-        # 7.3.2.5 设定命令，标度化值
-        return unpack_SVA(data[0:2]), unpack_QOS(data[2])
-    
-    elif type_id == C__SE__NC__1:
-        # 7.3.2.6 设定命令，短浮点数
-        return unpack_float32(data[0:4]), unpack_QOS(data[4])
-    
-    elif type_id == C__BO__NA__1:
-        # 7.3.2.7 32比特串
-        return unpack_BSI(data[0:4])
+def _BSI(data: int):
+    """二进制状态信息(原始数值)"""
+    return unpack_BSI(data.to_bytes(4, 'little'))
+
+
+def _SCD(data: int):
+    """状态和状态变位检出(原始数值)"""
+    return unpack_SCD(data.to_bytes(4, 'little'))
+
+
+def _layout(fmt: str, *decoders) -> ElemLayout:
+    """生成信息元素集的解析布局
+
+    fmt为各信息元素的struct格式, decoders与各信息元素一一对应,
+    将结构解出的原始数值转换为可读的信息元素
+    """
+    layout = Struct('<' + fmt)
+    unpack_from = layout.unpack_from
+    if not decoders:
+        decode = lambda data, offset: None
+        describe = lambda fields: None
+    elif fmt == 'B':
+        # 单字节信息元素直接索引, 无需经过预编译结构
+        d0, = decoders
+        decode = lambda data, offset: d0(data[offset])
+        describe = lambda fields: d0(fields[0])
+    elif len(decoders) == 1:
+        d0, = decoders
+        decode = lambda data, offset: d0(unpack_from(data, offset)[0])
+        describe = lambda fields: d0(fields[0])
+    elif len(decoders) == 2:
+        d0, d1 = decoders
+        def decode(data, offset):
+            f0, f1 = unpack_from(data, offset)
+            return d0(f0), d1(f1)
+        describe = lambda fields: (d0(fields[0]), d1(fields[1]))
+    elif len(decoders) == 3:
+        d0, d1, d2 = decoders
+        def decode(data, offset):
+            f0, f1, f2 = unpack_from(data, offset)
+            return d0(f0), d1(f1), d2(f2)
+        describe = lambda fields: (d0(fields[0]), d1(fields[1]), d2(fields[2]))
+    elif len(decoders) == 4:
+        d0, d1, d2, d3 = decoders
+        def decode(data, offset):
+            f0, f1, f2, f3 = unpack_from(data, offset)
+            return d0(f0), d1(f1), d2(f2), d3(f3)
+        describe = lambda fields: (d0(fields[0]), d1(fields[1]), d2(fields[2]), d3(fields[3]))
+    else:
+        describe = lambda fields: tuple([d(f) for d, f in zip(decoders, fields)])
+        decode = lambda data, offset: describe(unpack_from(data, offset))
+    return ElemLayout(layout, layout.size, decode, unpack_from, describe)
+
+
+"""段的头部: 文件名称, 节名称, 段的长度"""
+SEGMENT_HEAD = Struct('<HBB')
+
+
+def _unpack_F_SG_NA_1(data: bytes, offset: int):
+    """7.3.6.6 段, 段的长度可变, 无法使用预编译结构"""
+    nof, nos, los, segment = _raw_F_SG_NA_1(data, offset)
+    return unpack_NOF(nof), unpack_NOS(nos), unpack_LOS(los), segment
+
+
+def _raw_F_SG_NA_1(data: bytes, offset: int):
+    """7.3.6.6 段(原始数值)"""
+    nof, nos, los = SEGMENT_HEAD.unpack_from(data, offset)
+    offset += SEGMENT_HEAD.size
+    return nof, nos, los, bytes(data[offset:offset+los])
+
+
+def _describe_F_SG_NA_1(fields: tuple):
+    nof, nos, los, segment = fields
+    return unpack_NOF(nof), unpack_NOS(nos), unpack_LOS(los), segment
+
+
+"""类型标识 -> 信息元素集的解析布局, 导入时一次性生成"""
+INFO_ELEM_LAYOUTS = {
+    ############## 在监视方向过程信息的应用服务数据单元 ##############
+    M_SP_NA_1: _layout('B', unpack_SIQ),  # 7.3.1.1 单点信息
+    M__SP__TA__1: _layout('B3s', unpack_SIQ, unpack_CP24Time2a),  # 7.3.1.2 带时标的单点信息
+    M__DP__NA__1: _layout('B', unpack_DIQ),  # 7.3.1.3 不带时标的双点信息
+    M__DP__TA__1: _layout('B3s', unpack_DIQ, unpack_CP24Time2a),  # 7.3.1.4 带时标的双点信息
+    M__ST__NA__1: _layout('BB', unpack_VTI, unpack_QDS),  # 7.3.1.5 不带时标的步位置信息
+    M__ST__TA__1: _layout('BB3s', unpack_VTI, unpack_QDS, unpack_CP24Time2a),  # 7.3.1.6 带时标的步位置信息
+    M__BO__NA__1: _layout('IB', _BSI, unpack_QDS),  # 7.3.1.7 32比特串
+    M__BO__TA__1: _layout('IB3s', _BSI, unpack_QDS, unpack_CP24Time2a),  # 7.3.1.8 带时标的32比特串
+    M__ME__NA__1: _layout('hB', _NVA, unpack_QDS),  # 7.3.1.9 测量值，规一化值
+    M__ME__TA__1: _layout('hB3s', _NVA, unpack_QDS, unpack_CP24Time2a),  # 7.3.1.10 测量值，带时标的规一化值
+    M__ME__NB__1: _layout('hB', _same, unpack_QDS),  # 7.3.1.11 测量值，标度化值
+    M__ME__TB__1: _layout('hB3s', _same, unpack_QDS, unpack_CP24Time2a),  # 7.3.1.12 测量值，带时标的标度化值
+    M__ME__NC__1: _layout('fB', _same, unpack_QDS),  # 7.3.1.13 测量值，短浮点数
+    M__ME__TC__1: _layout('fB3s', _same, unpack_QDS, unpack_CP24Time2a),  # 7.3.1.14 测量值，带时标短浮点数
+    M__IT__NA__1: _layout('5s', unpack_BCR),  # 7.3.1.15 累计量
+    M__IT__TA__1: _layout('5s3s', unpack_BCR, unpack_CP24Time2a),  # 7.3.1.16 带时标的累计量
+    M__EP__TA__1: _layout('BH3s', unpack_SEP, _CP16Time2a, unpack_CP24Time2a),  # 7.3.1.17 带时标的继电保护设备事件
+    M__EP__TB__1: _layout('BBH3s', unpack_SPE, unpack_QDP, _CP16Time2a, unpack_CP24Time2a),  # 7.3.1.18 带时标的继电保护设备成组启动事件
+    M__EP__TC__1: _layout('BBH3s', unpack_OCI, unpack_QDP, _CP16Time2a, unpack_CP24Time2a),  # 7.3.1.19 带时标的继电保护设备成组输出电路信息
+    M__PS__NA__1: _layout('IB', _SCD, unpack_QDS),  # 7.3.1.20 带变位检出的成组单点信息
+    M__ME__ND__1: _layout('h', _NVA),  # 7.3.1.21 测量值，不带品质描述词的规一化值
+    M__SP__TB__1: _layout('B7s', unpack_SIQ, unpack_CP56Time2a),  # 7.3.1.22 带时标CP56Time2a的单点信息
+    M__DP__TB__1: _layout('B7s', unpack_DIQ, unpack_CP56Time2a),  # 7.3.1.23 带时标CP56Time2a的双点信息
+    M__ST__TB__1: _layout('BB7s', unpack_VTI, unpack_QDS, unpack_CP56Time2a),  # 7.3.1.24 带时标的步位置信息
+    M__BO__TB__1: _layout('IB7s', _BSI, unpack_QDS, unpack_CP56Time2a),  # 7.3.1.25 带时标CP56Time2a的32比特串
+    M__ME__TD__1: _layout('hB7s', _NVA, unpack_QDS, unpack_CP56Time2a),  # 7.3.1.26 测量值，带时标CP56Time2a的规一化值
+    M__ME__TE__1: _layout('hB7s', _same, unpack_QDS, unpack_CP56Time2a),  # 7.3.1.27 测量值，带时标CP56Time2a的标度化值
+    M__ME__TF__1: _layout('fB7s', _same, unpack_QDS, unpack_CP56Time2a),  # 7.3.1.28 测量值，带时标CP56Time2a的短浮点数
+    M__IT__TB__1: _layout('5s7s', unpack_BCR, unpack_CP56Time2a),  # 7.3.1.29 带时标CP56Time2a的累计量
+    M__EP__TD__1: _layout('BH7s', unpack_SEP, _CP16Time2a, unpack_CP56Time2a),  # 7.3.1.30 带时标CP56Time2a的继电保护设备事件
+    M__EP__TE__1: _layout('BBH7s', unpack_SPE, unpack_QDP, _CP16Time2a, unpack_CP56Time2a),  # 7.3.1.31 带时标CP56Time2a的继电保护设备成组启动事件
+    M__EP__TF__1: _layout('BBH7s', unpack_OCI, unpack_QDP, _CP16Time2a, unpack_CP56Time2a),  # 7.3.1.32 带时标CP56Time2a的继电保护设备成组输出电路信息
 
     ############## 在控制方向过程信息的应用服务数据单元 ##############
-    elif type_id == M__EI__NA__1:
-        # 7.3.3 初始化结束
-        return unpack_COI(data[0])
+    C__SC__NA__1: _layout('B', unpack_SCO),  # 7.3.2.1 单命令
+    C__DC__NA__1: _layout('B', unpack_DCO),  # 7.3.2.2 双命令
+    C__RC__NA__1: _layout('B', unpack_RCO),  # 7.3.2.3 步调节命令
+    C__SE__NA__1: _layout('hB', _NVA, unpack_QOS),  # 7.3.2.4 设定命令，规一化值
+    C__SE__NB__1: _layout('hB', _same, unpack_QOS),  # 7.3.2.5 设定命令，标度化值
+    C__SE__NC__1: _layout('fB', _same, unpack_QOS),  # 7.3.2.6 设定命令，短浮点数
+    C__BO__NA__1: _layout('I', _BSI),  # 7.3.2.7 32比特串
+
+    ############## 在监视方向系统信息的应用服务数据单元 ##############
+    M__EI__NA__1: _layout('B', unpack_COI),  # 7.3.3 初始化结束
 
     ############## 在控制方向系统信息的应用服务数据单元 ##############
-    elif type_id == C__IC__NA__1:
-        # 7.3.4.1 召唤命令
-        return unpack_QOI(data[0])
-    
-    elif type_id == C__CI__NA__1:
-        # 7.3.4.2 计数量召唤命令
-        return unpack_QCC(data[0])
-    
-    elif type_id == C_RD_NA_1:
-        # 7.3.4.3 读命令
-        return
-    
-    elif type_id == C_CS_NA_1:
-        # 7.3.4.4 时钟同步命令
-        return unpack_CP56Time2a(data[0:7])
+    C__IC__NA__1: _layout('B', unpack_QOI),  # 7.3.4.1 召唤命令
+    C__CI__NA__1: _layout('B', unpack_QCC),  # 7.3.4.2 计数量召唤命令
+    C_RD_NA_1: _layout(''),  # 7.3.4.3 读命令
+    C_CS_NA_1: _layout('7s', unpack_CP56Time2a),  # 7.3.4.4 时钟同步命令
+    C_TS_NA_1: _layout('H', _same),  # 7.3.4.5 测试命令
+    C_RP_NA_1: _layout('B', unpack_QRP),  # 7.3.4.6 复位进程命令
+    C_CD_NA_1: _layout('H', _CP16Time2a),  # 7.3.4.7 延时获得命令
 
-    elif type_id == C_TS_NA_1:
-        # 7.3.4.5 测试命令
-        return unpack_FBP(data[0:2])
-    
-    elif type_id == C_RP_NA_1:
-        # 7.3.4.6 复位进程命令
-        return unpack_QRP(data[0])
-    
-    elif type_id == C_CD_NA_1:
-        # 7.3.4.7 延时获得命令
-        return unpack_CP16Time2a(data[0:2])
-    
     ############## 在控制方向参数的应用服务数据单元 ##############
-    elif type_id == P_ME_NA_1:
-        # 7.3.5.1 测量值参数，规一化值
-        return unpack_NVA(data[0:2]), unpack_QPM(data[2])
+    P_ME_NA_1: _layout('hB', _NVA, unpack_QPM),  # 7.3.5.1 测量值参数，规一化值
+    P_ME_NB_1: _layout('hB', _same, unpack_QPM),  # 7.3.5.2 测试值参数，标度化值
+    P_ME_NC_1: _layout('fB', _same, unpack_QPM),  # 7.3.5.3 测量值参数，短浮点数
+    P_AC_NA_1: _layout('B', unpack_QPA),  # 7.3.5.4 参数激活
 
-    elif type_id == P_ME_NB_1:
-        # 7.3.5.2 测试值参数，标度化值
-        return unpack_SVA(data[0:2]), unpack_QPM(data[2])
+    ############## 文件传输的应用服务数据单元 ##############
+    # 文件名称(NOF)为两个八位位组, 文件或节的长度(LOF)为三个八位位组, 原始数值为bytes
+    F_FR_NA_1: _layout('H3sB', unpack_NOF, unpack_LOF, unpack_FRQ),  # 7.3.6.1 文件准备就绪
+    F_SR_NA_1: _layout('HB3sB', unpack_NOF, unpack_NOS, unpack_LOF, unpack_SRQ),  # 7.3.6.2 节准备就绪
+    F_SC_NA_1: _layout('HBB', unpack_NOF, unpack_NOS, unpack_SCQ),  # 7.3.6.3 召唤目录，选择文件，召唤文件，召唤节
+    F_LS_NA_1: _layout('HBBB', unpack_NOF, unpack_NOS, unpack_LSQ, unpack_CHS),  # 7.3.6.4 最后的节，最后的段
+    F_AF_NA_1: _layout('HBB', unpack_NOF, unpack_NOS, unpack_AFQ),  # 7.3.6.5 认可文件，认可节
+    F_SG_NA_1: ElemLayout(None, None, _unpack_F_SG_NA_1, _raw_F_SG_NA_1, _describe_F_SG_NA_1),  # 7.3.6.6 段
+    F_DR_TA_1: _layout('H3sB7s', unpack_NOF, unpack_LOF, unpack_SOF, unpack_CP56Time2a),  # 7.3.6.7 目录
+}
 
-    elif type_id == P_ME_NC_1:
-        # 7.3.5.3 测量值参数，短浮点数
-        return unpack_float32(data[0:4]), unpack_QPM(data[4])
-    
-    elif type_id == P_AC_NA_1:
-        # 7.3.5.4 参数激活
-        return unpack_QPA(data[0])
+_UNKNOWN_LAYOUT = ElemLayout(None, None, lambda data, offset: None, lambda data, offset: None, lambda fields: None)
 
-    elif type_id == F_FR_NA_1:
-        # 7.3.6.1 文件准备就绪
-        return unpack_NOF(data[0]), unpack_LOF(data[1]), unpack_FRQ(data[2])
 
-    elif type_id == F_SR_NA_1:
-        # 7.3.6.2 节准备就绪
-        return unpack_NOF(data[0]), unpack_NOS(data[1]), unpack_LOS(data[2]), unpack_SRQ(data[3])
+def _elem_decoder(type_id: int, mode: str) -> tuple:
+    """返回类型标识为type_id的信息元素集的(字节数, 解析函数)"""
+    layout = INFO_ELEM_LAYOUTS.get(type_id, _UNKNOWN_LAYOUT)
+    return layout.size, layout.raw if mode == 'raw' else layout.decode
 
-    elif type_id == F_SC_NA_1:
-        # 7.3.6.3 召唤目录，选择文件，召唤文件，召唤节
-        return unpack_NOF(data[0]), unpack_NOS(data[1]), unpack_SCQ(data[2])
-    
-    elif type_id == F_LS_NA_1:
-        # 7.3.6.4 最后的节，最后的段
-        return unpack_NOF(data[0]), unpack_NOS(data[1]), unpack_LSQ(data[2]), unpack_CHS(data[3])
 
-    elif type_id == F_AF_NA_1:
-        # 7.3.6.5 认可文件，认可节
-        return unpack_NOF(data[0]), unpack_NOS(data[1]), unpack_AFQ(data[2])
+def unpack_info_elems(type_id: int, data: bytes, offset: int = 0, mode: str = 'full'):
+    """解析一个类型标识为type_id的信息元素集
 
-    elif type_id == F_SG_NA_1:
-        # 7.3.6.6 段
-        return unpack_NOF(data[0]), unpack_NOS(data[1]), unpack_LOS(data[2]), data[3:]
+    mode为'full'时解析为可读的信息元素, 为'raw'时仅返回原始数值元组
+    """
+    return _elem_decoder(type_id, mode)[1](data, offset)
 
-    elif type_id == F_DR_TA_1:
-        # 7.3.6.7 目录
-        return unpack_NOF(data[0]), unpack_LOF(data[1]), unpack_SOF(data[2]), unpack_CP56Time2a(data[3:10])
+
+def describe_info_elems(type_id: int, fields: tuple):
+    """将'raw'模式解析出的原始数值元组转换为可读的信息元素集"""
+    return INFO_ELEM_LAYOUTS.get(type_id, _UNKNOWN_LAYOUT).describe(fields)
 
 
 ################################ 结构解析 ################################
-def unpack_info_obj_set(type_id: int, info_objs_total_number: int, data: bytes) -> list:
+def unpack_info_obj_set(type_id: int, info_objs_total_number: int, data: bytes, mode: str = 'full', profile: LinkProfile = DEFAULT_PROFILE) -> list:
     """解析信息对象集合：
         信息对象地址1 信息元素集1
         ......
         信息对象地址1 信息元素集n
     """
     info_objs = []
-    info_obj_size = int(len(data) / info_objs_total_number)
-
-    if info_obj_size == 0:
+    if not info_objs_total_number:
         return info_objs
 
-    for i in range(0, len(data), info_obj_size):
-        info_objs.append({
-            'addr': unpack_info_obj_addr(data[i:INFO_ADDR_SIZE]), 
-            'elems': unpack_info_elems(type_id, data[i+INFO_ADDR_SIZE:i+info_obj_size]), 
-        })
+    ioa_size = profile.ioa_size
+    elem_size, decode = _elem_decoder(type_id, mode)
+    if elem_size is None:
+        # 长度可变或未知的信息元素集, 按信息对象个数均分
+        elem_size = len(data) // info_objs_total_number - ioa_size
+    info_obj_size = ioa_size + elem_size
+
+    for i in range(0, info_objs_total_number * info_obj_size, info_obj_size):
+        elem_offset = i + ioa_size
+        info_objs.append(InfoObj(unpack_info_obj_addr(data[i:elem_offset]), decode(data, elem_offset)))
 
     return info_objs
 
 
-def unpack_info_obj_sq(type_id: int, info_objs_total_number: int, data: bytes) -> list:
+def unpack_info_obj_sq(type_id: int, info_objs_total_number: int, data: bytes, mode: str = 'full', profile: LinkProfile = DEFAULT_PROFILE) -> list:
     """解析信息对象序列：
         信息对象地址（基地址）
         信息元素集1
         ......
         信息元素集n
     """
-    info_objs, counter = [], 0
-    info_obj_addr_base = unpack_info_obj_addr(data[:INFO_ADDR_SIZE])
-    elem_size = int((len(data) - INFO_ADDR_SIZE) / info_objs_total_number)
-    for i in range(INFO_ADDR_SIZE, len(data), elem_size):
-        info_objs.append({
-            'addr': info_obj_addr_base + counter, 
-            'elems': unpack_info_elems(type_id, data[i:i+elem_size]), 
-        })
-        counter += 1
-    return info_objs
+    info_objs = []
+    if not info_objs_total_number:
+        return info_objs
 
+    ioa_size = profile.ioa_size
+    info_obj_addr_base = unpack_info_obj_addr(data[:ioa_size])
+    elem_size, decode = _elem_decoder(type_id, mode)
+    if elem_size is None:
+        elem_size = (len(data) - ioa_size) // info_objs_total_number
 
-def unpack_asdu(data: bytes):
-    """解析数据单元标识符"""
-    # 类型标识，定义了信息对象的结构和类型
-    type_id = data[0]
+    for i in range(info_objs_total_number):
+        info_objs.append(InfoObj(info_obj_addr_base + i, decode(data, ioa_size + i * elem_size)))
+    return info_objs
 
-    # 可变结构限定词，描述了信息对象的个数，信息对象是否为一个序列（即同一个信息对像类型的数组）
-    vsq = {
-        'info_objs_total_number': data[1] & 0b1111111, 
-        'is_sq': (data[1] & 0b10000000) >> 7
-    }
 
-    # 传送原因：原因, P/N, T, (源发者地址，根据系统参数设置决定是否包含该字段)
-    trans_cause = {
-        'cause': TRANS_CAUSE_DESC.get(data[2] & 0b111111, ''),   # 第三个字节前六位表传送原因
-        'P/N': (data[2] & 0b1000000) >> 6,  # 第三个字节第七位表肯定确认或否定确认(P/N)
-        'T': (data[2] & 0b10000000) >> 7,  # 第三个字节第八位表实验/未实验(T)
-    }
-    if TRANS_CAUSE_SIZE == 2:
-        trans_cause['source_addr'] = data[3]  # 第四个字节若被传送原因采用，则表源发者地址
+"""可按列批量解析的测量值类型 -> (值的dtype, 值的array类型码, 元素的预编译结构, 比例系数)"""
+COLUMNAR_LAYOUTS = {
+    M__ME__NA__1: ('<i2', 'h', Struct('<hB'), 1 / 32768),  # 规一化值
+    M__ME__NB__1: ('<i2', 'h', Struct('<hB'), None),  # 标度化值
+    M__ME__NC__1: ('<f4', 'f', Struct('<fB'), None),  # 短浮点数
+}
+
+
+def unpack_info_obj_columns(type_id: int, info_objs_total_number: int, data: bytes, profile: LinkProfile = DEFAULT_PROFILE) -> InfoObjColumns:
+    """按列解析信息对象序列(值 + QDS), 一次性得到连续的值数组与品质描述词数组, 数据长度不足时引发ValueError"""
+    ioa_size = profile.ioa_size
+    dtype, typecode, layout, scale = COLUMNAR_LAYOUTS[type_id]
+    elem_size = layout.size
+    if len(data) < ioa_size + info_objs_total_number * elem_size:
+        raise ValueError('信息对象序列长度不足: %d个信息对象需要%d字节, 实际%d字节' % (
+            info_objs_total_number, ioa_size + info_objs_total_number * elem_size, len(data)))
+    info_obj_addr_base = unpack_info_obj_addr(data[:ioa_size])
+    if numpy is not None:
+        rows = numpy.frombuffer(
+            data, 
+            dtype=numpy.dtype([('value', dtype), ('quality', 'u1')]), 
+            count=info_objs_total_number, 
+            offset=ioa_size)
+        values = rows['value'] * scale if scale else numpy.ascontiguousarray(rows['value'])
+        quality = numpy.ascontiguousarray(rows['quality'])
+    else:
+        body = memoryview(data)[ioa_size:ioa_size + info_objs_total_number * elem_size]
+        if scale:
+            values = array('d', [val * scale for val, _ in layout.iter_unpack(body)])
+        else:
+            values = array(typecode, [val for val, _ in layout.iter_unpack(body)])
+        quality = array('B', body[elem_size-1::elem_size].tobytes())
+    return InfoObjColumns(info_obj_addr_base, values, quality)
 
-    # 公共地址：一或两个字节（根据系统参数决定）
-    common_addr_bytes = data[2 + TRANS_CAUSE_SIZE:2 + TRANS_CAUSE_SIZE + COMMON_ADDR_SIZE]
-    common_addr = unpack('<H', common_addr_bytes)[0]
 
-    # 信息对象：分为集合和序列两种结构
-    info_objs_bytes = data[2 + TRANS_CAUSE_SIZE + COMMON_ADDR_SIZE:]
-    if vsq['is_sq'] == True:
-        info_objs = unpack_info_obj_sq(type_id, vsq['info_objs_total_number'], info_objs_bytes)
+def unpack_info_objs(type_id: int, vsq: VSQ, data: bytes, columnar: bool = False, mode: str = 'full', profile: LinkProfile = DEFAULT_PROFILE):
+    """解析信息对象：分为集合和序列两种结构"""
+    if vsq.is_sq and columnar and type_id in COLUMNAR_LAYOUTS:
+        return unpack_info_obj_columns(type_id, vsq.info_objs_total_number, data, profile)
+    elif vsq.is_sq:
+        return unpack_info_obj_sq(type_id, vsq.info_objs_total_number, data, mode, profile)
+    else:
+        return unpack_info_obj_set(type_id, vsq.info_objs_total_number, data, mode, profile)
+
+
+def unpack_info_obj(type_id: int, vsq: VSQ, data: bytes, index: int, mode: str = 'full', profile: LinkProfile = DEFAULT_PROFILE) -> InfoObj:
+    """仅解析信息对象集合或序列中的第index个信息对象"""
+    info_objs_total_number = vsq.info_objs_total_number
+    if not -info_objs_total_number <= index < info_objs_total_number:
+        raise IndexError('信息对象序号超出范围')
+    index %= info_objs_total_number
+    ioa_size = profile.ioa_size
+    elem_size, decode = _elem_decoder(type_id, mode)
+    if vsq.is_sq:
+        if elem_size is None:
+            elem_size = (len(data) - ioa_size) // info_objs_total_number
+        addr = unpack_info_obj_addr(data[:ioa_size]) + index
+        return InfoObj(addr, decode(data, ioa_size + index * elem_size))
     else:
-        info_objs = unpack_info_obj_set(type_id, vsq['info_objs_total_number'], info_objs_bytes)
+        if elem_size is None:
+            elem_size = len(data) // info_objs_total_number - ioa_size
+        offset = index * (ioa_size + elem_size)
+        return InfoObj(unpack_info_obj_addr(data[offset:offset+ioa_size]), decode(data, offset + ioa_size))
 
-    return ASDU(type_id, vsq, trans_cause, common_addr, info_objs)
 
+class LazyASDU(ASDU):
+    """延迟解析的ASDU
 
-def unpack_apci(data: bytes) -> tuple:
-    """解析apci数据
-    APCI为应用协议控制信息, 表征着报文的作用, 不承载传输数据
-    第一个字节为0x68, 为IEC104报文的起始标志位, 标志着报文的开始
-    第二个字节表示了IEC104报文的长度, 即从第三个字节到结束共有多少字节
+    数据单元标识符立即解析, 信息对象保留为memoryview,
+    仅在遍历、索引或访问info_objs时才解析。
+    注意: 未解析前会持有原始数据的引用
     """
-    pdu_send, pdu_recv = 0, 0
-    if data[2] & 0b1 == 0b0:
-        '''第三个字节的第一位为0则该报文为I格式
-        对于I格式的报文, 有APCI和ASDU两个部分, ASDU承载了待传输的数据'''
-        pdu_format = 'I'
-        pdu_action = 'TRANSMIT'
-        pdu_send = unpack('<H', data[2:4])[0] >> 1
-        pdu_recv = unpack('<H', data[4:6])[0] >> 1
-    elif data[2] & 0b11 == 0b01:
-        '''第三个字节的第一位和第二位为01则表示该报文为S格式
-        S格式的报文仅用于监视而不传输数据'''
-        pdu_format = 'S'
-        pdu_action = 'MONITOR'
-        pdu_recv = unpack('<H', data[4:6])[0] >> 1
-    else:
-        '''第三个字节的第一位和第二位为11则表示该报文为U格式
-        U格式报文可看成一句指令, 此处第三个字节的第一位和第二位必为11, 逻辑判断省略'''
-        pdu_format = 'U'
-        pdu_action = U_ACTIONS[int(log2((data[2]-0b11)>>2))]  # 解析指令详情
+    __slots__ = ('_data', '_columnar', '_profile', '_info_objs')
+
+    def __init__(self, type_id: int, vsq: VSQ, trans_cause: COT, common_addr: int, data: memoryview, columnar: bool = False, mode: str = 'full', profile: LinkProfile = DEFAULT_PROFILE) -> None:
+        super().__init__(type_id, vsq, trans_cause, common_addr, None, mode)
+        self._data = data  # 信息对象的原始数据
+        self._columnar = columnar
+        self._profile = profile
+        self._info_objs = None
+
+
+    @property
+    def info_objs(self):
+        """全部信息对象, 首次访问时解析并缓存"""
+        if self._info_objs is None:
+            self._info_objs = unpack_info_objs(self.type_id, self.vsq, self._data, self._columnar, self.mode, self._profile)
+            self._data = None  # 解析后释放原始数据
+        return self._info_objs
+
+
+    @info_objs.setter
+    def info_objs(self, info_objs) -> None:
+        self._info_objs = info_objs
+
+
+    def __len__(self) -> int:
+        return self.vsq.info_objs_total_number
+
+
+    def __iter__(self):
+        if self._info_objs is not None:
+            return iter(self._info_objs)
+        return (unpack_info_obj(self.type_id, self.vsq, self._data, i, self.mode, self._profile) for i in range(len(self)))
 
-    return pdu_format, pdu_action, pdu_send, pdu_recv
 
+    def __getitem__(self, index: int) -> InfoObj:
+        """仅解析被索引的信息对象"""
+        if self._data is None:
+            return self._info_objs[index]
+        return unpack_info_obj(self.type_id, self.vsq, self._data, index, self.mode, self._profile)
 
-def unpack_apdu(data: bytes) -> APDU:
+
+def unpack_asdu(data: bytes, columnar: bool = False, lazy: bool = False, mode: str = 'full', profile: LinkProfile = DEFAULT_PROFILE):
+    """解析数据单元标识符
+
+    columnar为真时, 测量值的信息对象序列按列解析为InfoObjColumns;
+    lazy为真时返回LazyASDU, 信息对象在使用时才解析;
+    mode为'raw'时信息元素仅解析为原始数值元组, 可读描述由ASDU.describe()按需生成;
+    profile为该连接的系统参数, 决定传送原因、公共地址及信息对象地址的字节数
+    """
+    # 类型标识, 可变结构限定词, 传送原因, 公共地址
+    type_id, vsq, trans_cause, common_addr = unpack_asdu_header(data, profile)
+
+    # 信息对象
+    info_objs_bytes = data[profile.header.size:]
+    if lazy:
+        return LazyASDU(type_id, vsq, trans_cause, common_addr, memoryview(info_objs_bytes), columnar, mode, profile)
+    return ASDU(type_id, vsq, trans_cause, common_addr, unpack_info_objs(type_id, vsq, info_objs_bytes, columnar, mode, profile), mode)
+
+
+unpack_asdu_header = _speedups.unpack_asdu_header  # 解析数据单元标识符
+unpack_apci = _speedups.unpack_apci  # 解析apci数据, 返回(格式, 指令, 发送序号, 接收序号)
+
+
+def unpack_apdu(data: bytes, columnar: bool = False, lazy: bool = False, mode: str = 'full', profile: LinkProfile = DEFAULT_PROFILE) -> APDU:
     pdu_format, pdu_action, pdu_send, pdu_recv = unpack_apci(data[:APCI_SIZE])
     # 仅当apci格式为I格式时有asdu信息
     if pdu_format == 'I':
-        return APDU(pdu_format, pdu_action, pdu_send, pdu_recv, unpack_asdu(data[APCI_SIZE:]))
+        return APDU(pdu_format, pdu_action, pdu_send, pdu_recv, unpack_asdu(data[APCI_SIZE:], columnar, lazy, mode, profile))
     else:
         return APDU(pdu_format, pdu_action, pdu_send, pdu_recv,)
 
 
-def from_bytes_to_apdus(data: bytes) -> list:
-    if not data:
-        return []
+class APDUFramer:
+    """有状态的报文分帧器
 
-    if data[0] == 0x68:
-        pack_size = data[1] + 2
-        return [unpack_apdu(data[:pack_size]), ] + from_bytes_to_apdus(data[pack_size:])
+    以偏移量遍历输入数据的memoryview, 逐帧解析为APDU并以生成器形式返回,
+    结尾不完整的报文会被保留, 与下一次输入的数据拼接后继续解析,
+    因此TCP分段边界不会破坏报文解析。
+    """
+    def __init__(self, columnar: bool = False, lazy: bool = False, mode: str = 'full', profile: LinkProfile = DEFAULT_PROFILE, metrics=None,
+                 trace=None) -> None:
+        self.columnar = columnar  # 测量值序列是否按列解析
+        self.lazy = lazy  # 信息对象是否延迟解析
+        self.mode = mode  # 信息元素解析模式: 'full' 或 'raw'
+        self.profile = profile  # 连接的系统参数
+        self.metrics = metrics  # metrics.ConnectionMetrics, 为None时不统计
+        self.trace = trace  # frametrace.FrameTrace, 为None时不记录
+        self._tail = b''  # 上一次输入结尾处不完整的报文
+
+
+    def feed(self, data: bytes):
+        """输入一段比特流, 逐个生成其中完整的APDU
+
+        注意: 生成器须迭代完毕, 结尾不完整的报文才会被保留
+        """
+        if self._tail:
+            data = self._tail + data  # 不完整报文最长不超过255字节
+        view = memoryview(data)
+        end = len(view)
+        offset = 0
+        metrics, trace = self.metrics, self.trace
+        while offset + 2 <= end:
+            if view[offset] != 0x68:
+                # 非起始字符, 跳过直至下一个0x68以重新同步
+                offset += 1
+                continue
+            pack_end = offset + view[offset + 1] + 2
+            if pack_end > end:
+                break
+            if trace is not None:
+                trace.received(view[offset:pack_end])
+            if metrics is None:
+                yield unpack_apdu(view[offset:pack_end], self.columnar, self.lazy, self.mode, self.profile)
+            else:
+                start = perf_counter_ns()
+                apdu = unpack_apdu(view[offset:pack_end], self.columnar, self.lazy, self.mode, self.profile)
+                metrics.observe(apdu, perf_counter_ns() - start)
+                yield apdu
+            offset = pack_end
+        self._tail = bytes(view[offset:])
+
+
+    @property
+    def pending(self) -> int:
+        """尚未解析的残余字节数"""
+        return len(self._tail)
+
+
+def from_bytes_to_apdus(data: bytes, columnar: bool = False, lazy: bool = False, mode: str = 'full', profile: LinkProfile = DEFAULT_PROFILE) -> list:
+    """将比特流解析为apdu列表, 结尾不完整的报文将被丢弃"""
+    return list(APDUFramer(columnar, lazy, mode, profile).feed(data))